@@ -166,7 +166,9 @@ class CryptocompareClient(PricesApiClient, TorApiClient):
 
     def get_price(self, coins, date_time, **kwargs):
         currency = kwargs["currency"]
-        prices = self.fetch_raw_prices(coins, date_time, currency)
+        prices = self._decode_coins(
+            self.fetch_raw_prices(coins, date_time, currency)
+        )
         return {
             coin: get_ratio(1, price) for coin, price in prices.items()
         }
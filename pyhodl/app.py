@@ -10,7 +10,7 @@ from hal.files.parsers import JSONParser
 from hal.files.save_as import write_dicts_to_json
 
 from .config import APP_FOLDER, API_FOLDER, DATA_FOLDER
-from .data.coins import CryptoCoin, CRYPTO_COINS
+from .data.coins import COINS_REGISTRY, is_crypto
 
 
 class ConfigManager:
@@ -91,7 +91,6 @@ def get_coin(symbol):
         Coin if a crypto-coin exists with that name
     """
 
-    candidate = CryptoCoin(symbol, symbol)
-    for coin in CRYPTO_COINS:
-        if coin.symbol == candidate:
-            return coin
+    coin_id = COINS_REGISTRY.find_id(symbol)
+    if coin_id is not None and is_crypto(coin_id):
+        return COINS_REGISTRY.get_coin(symbol)
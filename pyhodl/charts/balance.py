@@ -27,12 +27,13 @@ class BalancePlotter(CryptoPlotter):
             Plots balances for each date for each coin
         """
 
+        timeline = self.portfolio.get_timeline()
         dates = self.portfolio.get_transactions_dates()
         for wallet in self.wallets:
-            balances = wallet.get_balance_by_date(dates)
+            balances = wallet.get_balance_array_by_date(timeline)
             plt.plot(
                 dates,
-                [b[VALUE_KEY] for b in balances],
+                balances,
                 "-x",
                 label="Amount of " + wallet.base_currency
             )
@@ -95,9 +96,12 @@ class FiatPlotter(BalancePlotter):
             Plots balances for transaction of coin
         """
 
+        timeline = self.portfolio.get_timeline()
         dates = self.portfolio.get_transactions_dates()
         for wallet in self.wallets:
-            balances = wallet.get_balance_by_date(dates, self.base_currency)
+            balances = wallet.get_balance_array_by_date(
+                timeline, self.base_currency
+            )
             label = "Value of " + wallet.base_currency + " (" + \
                     self.base_currency + ")"
             self.plot(dates, balances, label)
@@ -112,7 +116,7 @@ class FiatPlotter(BalancePlotter):
 
         dates = wallet.dates()
         dates = list(generate_dates(dates[0], dates[-1], hours=4))
-        price = wallet.get_price_on(dates, self.base_currency)
+        price = wallet.convert_many(dates, self.base_currency)  # NaN: no data
         self.plot(
             dates, price,
             wallet.base_currency + " " + self.base_currency + "price"
@@ -74,6 +74,16 @@ def create_args():
         default=False
     )
 
+    # extra options
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        dest="jobs",
+        help="Number of files to parse in parallel",
+        type=int,
+        default=1
+    )
+
     # extra options
     parser.add_argument(
         "-v",
@@ -100,7 +110,8 @@ def parse_args(parser):
         "run": RunMode(args["mode"]),
         "verbose": args["verbose"],
         "tor": args["tor"],
-        "path": args["path"]
+        "path": args["path"],
+        "jobs": args["jobs"]
     }
 
     if options["path"] is None and options["run"] in DEFAULT_PATHS:
@@ -148,15 +159,17 @@ def plot(input_file, verbose):
     plotter.show("Balances from " + input_file)
 
 
-def show_balance(run_path):
+def show_balance(run_path, jobs=1):
     """
     :param run_path: str
         Path to download file to
+    :param jobs: int
+        Number of files to parse in parallel
     :return: void
         Prints balance of wallets found
     """
 
-    balance = Balance(run_path, color=True)
+    balance = Balance(run_path, color=True, workers=jobs)
     balance.print()
 
 
@@ -261,7 +274,7 @@ def main():
     elif run_mode == RunMode.PLOTTER:
         plot(run_path, verbose)
     elif run_mode == RunMode.STATS:
-        show_balance(run_path)
+        show_balance(run_path, args["jobs"])
     elif run_mode == RunMode.DOWNLOAD_HISTORICAL:
         download_historical(run_path, verbose, tor)
 
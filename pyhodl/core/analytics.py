@@ -0,0 +1,521 @@
+# !/usr/bin/python3
+# coding: utf_8
+
+
+""" Risk and performance stats of portfolio value over time """
+
+from datetime import timedelta, datetime
+
+import numpy as np
+
+from pyhodl.data.coins import DEFAULT_FIAT
+from pyhodl.data.tables import MarketDataTable
+from pyhodl.utils.dates import get_buckets, parse_timedelta, \
+    dates_to_ns_array
+from pyhodl.utils.misc import merge_unique_sorted
+
+YEAR = timedelta(days=365)  # crypto markets never close
+YEAR_NS = YEAR // timedelta(microseconds=1) * 1000
+MAX_EXPONENT = 700.0  # exp overflows float64 above ~709
+
+
+def get_returns(values):
+    """
+    :param values: numpy array of float
+        Values at the end of each period
+    :return: numpy array of float
+        Simple return in each period (first one is NaN, and so are returns
+        on non-positive values)
+    """
+
+    values = np.asarray(values, dtype=np.float64)
+    returns = np.full(len(values), np.nan)
+    if len(values) > 1:
+        previous = values[:-1]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            returns[1:] = np.where(
+                previous > 0, values[1:] / previous - 1.0, np.nan
+            )
+    return returns
+
+
+def get_rolling_std(values, window):
+    """
+    :param values: numpy array of float
+        Values (NaN are skipped)
+    :param window: int
+        Number of periods in each window
+    :return: numpy array of float
+        Sample standard deviation of last window values, for each period
+        (NaN until there are 2 values in window)
+    """
+
+    if window < 2:
+        raise ValueError("Cannot compute deviation of window", window)
+
+    values = np.asarray(values, dtype=np.float64)
+    is_valid = ~np.isnan(values)
+    shift = np.nanmean(values) if is_valid.any() else 0.0  # for precision
+    valid = np.where(is_valid, values - shift, 0.0)
+
+    sums, squares, counts = (
+        np.concatenate(([0.0], np.cumsum(array)))
+        for array in (valid, valid * valid, is_valid.astype(np.float64))
+    )
+    starts = np.maximum(np.arange(1, len(values) + 1) - window, 0)
+    ends = np.arange(1, len(values) + 1)
+    total = sums[ends] - sums[starts]
+    total_squares = squares[ends] - squares[starts]
+    count = counts[ends] - counts[starts]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        variance = (total_squares - total * total / count) / (count - 1)
+    std = np.sqrt(np.maximum(variance, 0.0))
+    std[(count < 2) | (ends < window)] = np.nan
+    return std
+
+
+def get_drawdowns(values):
+    """
+    :param values: numpy array of float
+        Values at the end of each period
+    :return: numpy array of float
+        Relative loss of each value from the highest one so far (NaN while
+        the highest value is not positive)
+    """
+
+    values = np.asarray(values, dtype=np.float64)
+    peaks = np.fmax.accumulate(values) if len(values) else values
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(peaks > 0, values / peaks - 1.0, np.nan)
+
+
+def get_sharpe_ratio(returns, periods_per_year, risk_free=0.0):
+    """
+    :param returns: numpy array of float
+        Return in each period (NaN are skipped)
+    :param periods_per_year: float
+        Number of periods in a year
+    :param risk_free: float
+        Yearly risk-free rate
+    :return: float
+        Annualized Sharpe ratio (NaN if not enough returns)
+    """
+
+    excess = returns[~np.isnan(returns)] - risk_free / periods_per_year
+    if len(excess) < 2:
+        return np.nan
+
+    std = np.std(excess, ddof=1)
+    if std == 0:
+        return np.nan
+    return float(np.mean(excess) / std * np.sqrt(periods_per_year))
+
+
+def get_sortino_ratio(returns, periods_per_year, risk_free=0.0):
+    """
+    :param returns: numpy array of float
+        Return in each period (NaN are skipped)
+    :param periods_per_year: float
+        Number of periods in a year
+    :param risk_free: float
+        Yearly risk-free rate
+    :return: float
+        Annualized Sortino ratio, i.e mean excess return over downside
+        deviation (NaN if there are no losses)
+    """
+
+    excess = returns[~np.isnan(returns)] - risk_free / periods_per_year
+    if not len(excess):
+        return np.nan
+
+    downside = np.sqrt(np.mean(np.minimum(excess, 0.0) ** 2))
+    if downside == 0:
+        return np.nan
+    return float(np.mean(excess) / downside * np.sqrt(periods_per_year))
+
+
+def get_beta(returns, market_returns):
+    """
+    :param returns: numpy array of float
+        Return of portfolio in each period
+    :param market_returns: numpy array of float
+        Return of market in each period
+    :return: float
+        Beta of portfolio against market (periods where any of the 2 is NaN
+        are skipped)
+    """
+
+    both = ~np.isnan(returns) & ~np.isnan(market_returns)
+    if both.sum() < 2:
+        return np.nan
+
+    returns, market_returns = returns[both], market_returns[both]
+    variance = np.var(market_returns, ddof=1)
+    if variance == 0:
+        return np.nan
+
+    covariance = np.cov(returns, market_returns, ddof=1)[0, 1]
+    return float(covariance / variance)
+
+
+def get_analytics(portfolio, currency=DEFAULT_FIAT, freq="1d", window=30,
+                  risk_free=0.0, market=None):
+    """
+    :param portfolio: Portfolio
+        Portfolio to analyze
+    :param currency: str
+        Currency to value portfolio in
+    :param freq: str
+        Width of each period, written in short format (e.g 1m, 1h, 1d)
+    :param window: int
+        Number of periods in each rolling window
+    :param risk_free: float
+        Yearly risk-free rate
+    :param market: MarketDataTable
+        Market cap data to compute beta against (default one if None)
+    :return: {} of str -> numpy array or float
+        Start date (epoch ns), value at close and return of each period,
+        rolling (annualized) volatility and drawdown at each period, max
+        drawdown, Sharpe and Sortino ratios and beta against total market
+        cap
+    """
+
+    dates = portfolio.get_timeline()
+    if not len(dates):
+        return None
+
+    starts = get_buckets(dates[0], dates[-1], freq)
+    step = parse_timedelta(freq) // timedelta(microseconds=1) * 1000
+    periods_per_year = YEAR / parse_timedelta(freq)
+
+    closes = get_values_on(
+        portfolio.wallets, starts + step - 1, currency
+    )  # holdings and prices at last instant of period
+    returns = get_returns(closes)
+    drawdowns = get_drawdowns(closes)
+
+    if market is None:
+        market = MarketDataTable()
+    market_returns = get_returns(
+        market.get_values_on_dates_of(starts + step - 1)
+    )
+
+    return {
+        "date": starts,
+        "value": closes,
+        "returns": returns,
+        "volatility": get_rolling_std(returns, window) *
+                      np.sqrt(periods_per_year),
+        "drawdown": drawdowns,
+        "max_drawdown": float(np.nanmin(drawdowns))
+                        if not np.isnan(drawdowns).all() else np.nan,
+        "sharpe": get_sharpe_ratio(returns, periods_per_year, risk_free),
+        "sortino": get_sortino_ratio(returns, periods_per_year, risk_free),
+        "beta": get_beta(returns, market_returns)
+    }
+
+
+def get_values_on(wallets, dates, currency):
+    """
+    :param wallets: [] of Wallet
+        Wallets to value
+    :param dates: numpy array of int64
+        Dates (epoch ns)
+    :param currency: str
+        Currency to value wallets in
+    :return: numpy array of float
+        Value of all wallets on each date, with prices of that date (NaN if
+        price of any coin held is missing)
+    """
+
+    values = np.zeros(len(dates))
+    for wallet in wallets:
+        balances = wallet.balances_on(dates)
+        held = balances != 0
+        if held.any():
+            values[held] += wallet.convert_many(
+                dates[held], currency, balances[held]
+            )
+    return values
+
+
+def get_external_flows(wallets, currency):
+    """
+    :param wallets: [] of Wallet
+        Wallets with transactions
+    :param currency: str
+        Currency to value flows in
+    :return: tuple (numpy array of int64, numpy array of float)
+        Distinct dates (epoch ns) of deposits and withdrawals, and value moved
+        in (if positive) or out (if negative) of wallets on each date (NaN if
+        price of any coin moved is missing)
+    """
+
+    dates, values = [], []
+    for wallet in wallets:
+        flow_dates, amounts = wallet.get_flows()
+        if len(flow_dates):
+            dates.append(flow_dates)
+            values.append(wallet.convert_many(flow_dates, currency, amounts))
+
+    if not dates:
+        return np.array([], dtype=np.int64), np.array([], dtype=np.float64)
+
+    dates, inverse = np.unique(np.concatenate(dates), return_inverse=True)
+    return dates, np.bincount(inverse, weights=np.concatenate(values))
+
+
+def _get_npv(rates, times, cash_flows):
+    """
+    :param rates: numpy array of float
+        Log of (1 + rate) for each row
+    :param times: numpy array of float
+        Time (years) of each cash flow, one row for each problem
+    :param cash_flows: numpy array of float
+        Cash flows, one row for each problem
+    :return: tuple (numpy array of float, numpy array of float)
+        Net present value of each row and its derivative
+    """
+
+    discounts = np.exp(np.clip(
+        -times * rates[:, np.newaxis], -MAX_EXPONENT, MAX_EXPONENT
+    )) * cash_flows
+    return discounts.sum(axis=1), -(times * discounts).sum(axis=1)
+
+
+def solve_irr(times, cash_flows, tolerance=1e-10, max_iterations=50):
+    """
+    :param times: numpy array of float
+        Time (years since first one) of each cash flow, one row for each
+        problem
+    :param cash_flows: numpy array of float
+        Cash flows (negative if invested, positive if returned), one row for
+        each problem (padded with 0)
+    :param tolerance: float
+        Relative error on net present value to stop at
+    :param max_iterations: int
+        Max number of Newton steps
+    :return: numpy array of float
+        Yearly rate making net present value 0 for each row (NaN if there is
+        none). All rows are solved together with Newton steps, then by
+        bisection the ones Newton does not converge for.
+    """
+
+    times = np.atleast_2d(np.asarray(times, dtype=np.float64))
+    cash_flows = np.atleast_2d(np.asarray(cash_flows, dtype=np.float64))
+    scale = np.abs(cash_flows).sum(axis=1)
+    rates = np.zeros(len(cash_flows))  # log(1 + rate)
+    limits = MAX_EXPONENT / np.maximum(times.max(axis=1), 1e-9)  # of rates
+    solved = np.zeros(len(cash_flows), dtype=bool)
+
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        for _ in range(max_iterations):
+            npv, slope = _get_npv(rates, times, cash_flows)
+            solved = np.abs(npv) <= tolerance * scale
+            if solved.all():
+                break
+            step = np.where(solved, 0.0, npv / slope)
+            rates = np.clip(
+                rates - np.where(np.isfinite(step), step, 0.0),
+                -limits, limits
+            )
+
+        npv, _ = _get_npv(rates, times, cash_flows)
+        solved = np.abs(npv) <= tolerance * scale
+        if not solved.all():  # bracket root between bounds of rate
+            low, high = -limits, limits
+            npv_low, _ = _get_npv(low, times, cash_flows)
+            npv_high, _ = _get_npv(high, times, cash_flows)
+            bracketed = ~solved & (np.sign(npv_low) != np.sign(npv_high))
+            for _ in range(200):
+                middle = (low + high) / 2
+                npv_middle, _ = _get_npv(middle, times, cash_flows)
+                is_low = np.sign(npv_middle) == np.sign(npv_low)
+                low = np.where(is_low, middle, low)
+                high = np.where(is_low, high, middle)
+            rates = np.where(bracketed, (low + high) / 2, rates)
+            solved |= bracketed
+
+    return np.where(solved & (scale > 0), np.expm1(rates), np.nan)
+
+
+def get_period_returns(wallets, bounds, currency=DEFAULT_FIAT):
+    """
+    :param wallets: [] of Wallet
+        Wallets of portfolio (or exchange)
+    :param bounds: numpy array of int64
+        Dates (epoch ns, sorted and distinct) separating periods
+    :param currency: str
+        Currency to value wallets and flows in
+    :return: {} of str -> numpy array
+        For each period between 2 consecutive bounds: start date, value at
+        start and end, net external flows, time-weighted return and yearly
+        money-weighted return (XIRR). Deposits and withdrawals are not
+        counted as profits or losses. Returns of periods valued with missing
+        prices are NaN.
+    """
+
+    bounds = np.asarray(bounds, dtype=np.int64)
+    if len(bounds) < 2:
+        raise ValueError("Cannot get returns of periods between", bounds)
+
+    flow_dates, flows = get_external_flows(wallets, currency)
+    dates = merge_unique_sorted([bounds, flow_dates])
+    values = get_values_on(wallets, dates, currency)  # after flows of date
+    moved = np.zeros(len(dates))
+    moved[np.searchsorted(dates, flow_dates)] = flows
+    before = values - moved  # before flows of date
+
+    periods = np.searchsorted(dates, bounds)  # index of dates of bounds
+    starts, ends = periods[:-1], periods[1:]
+    events = np.arange(periods[0], periods[-1])  # dates in any period
+
+    # time-weighted: product of growth between consecutive dates
+    with np.errstate(divide="ignore", invalid="ignore"):
+        growth = np.where(
+            values[events] > 0, before[events + 1] / values[events], 1.0
+        )
+    twr = np.multiply.reduceat(growth, starts - periods[0]) - 1.0
+    inflows = np.add.reduceat(moved[events], starts - periods[0]) - \
+        moved[starts]  # flows at start are in start value
+
+    # money-weighted: value at start is invested, value at end is returned
+    rows = np.searchsorted(starts, events, side="right") - 1
+    columns = events - starts[rows]
+    counts = ends - starts
+    times = np.zeros((len(counts), counts.max() + 1))
+    cash_flows = np.zeros(times.shape)
+    cash_flows[rows, columns] = np.where(
+        columns == 0, -values[events], -moved[events]
+    )
+    times[rows, columns] = (dates[events] - bounds[rows]) / YEAR_NS
+    periods = np.arange(len(counts))
+    cash_flows[periods, counts] = before[ends]
+    times[periods, counts] = (bounds[1:] - bounds[:-1]) / YEAR_NS
+
+    return {
+        "date": bounds[:-1],
+        "start": values[starts],
+        "end": before[ends],
+        "flows": inflows,
+        "twr": twr,
+        "irr": solve_irr(times, cash_flows)
+    }
+
+
+def get_returns_state(wallets, until, currency=DEFAULT_FIAT, state=None):
+    """
+    :param wallets: [] of Wallet
+        Wallets of portfolio (or exchange): with all transactions, or
+        starting from their balances on date of state
+    :param until: int
+        Date (epoch ns) to update state to
+    :param currency: str
+        Currency to value wallets and flows in
+    :param state: {}
+        State of returns up to a date (see this function): if None, state
+        starts from first transaction of wallets
+    :return: {}
+        State of returns up to until: currency, date, value of wallets
+        (after flows of date), growth (time-weighted return + 1) and
+        external flows (date and value, the first one is value on first
+        date). None if there are no transactions, or if the price of any coin
+        held or moved is missing (wallets cannot be valued). Just flows after
+        date of state are valued, so that it is updated in time proportional
+        to new transactions.
+    """
+
+    if state is None:
+        firsts = [
+            wallet.dates_array[0] for wallet in wallets
+            if len(wallet.dates_array)
+        ]
+        if not firsts:
+            return None
+
+        state = {
+            "currency": str(currency),
+            "date": int(min(firsts)),
+            "value": None,  # set when updated
+            "growth": 1.0,
+            "flows": []
+        }
+
+    since = state["date"]
+    if until <= since:
+        return state
+
+    # flows on since are already in value on it
+    flow_dates, flows = get_external_flows(wallets, currency)
+    inside = (flow_dates > since) & (flow_dates <= until)
+    flow_dates, flows = flow_dates[inside], flows[inside]
+    dates = merge_unique_sorted([np.array([since, until]), flow_dates])
+    values = get_values_on(wallets, dates, currency)  # after flows of date
+    if np.isnan(values).any() or np.isnan(flows).any():
+        return None  # not valued as 0, nor saved as such
+
+    moved = np.zeros(len(dates))
+    moved[np.searchsorted(dates, flow_dates)] = flows
+    before = values - moved  # before flows of date
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        growth = np.where(values[:-1] > 0, before[1:] / values[:-1], 1.0)
+    return {
+        "currency": str(currency),
+        "date": int(until),
+        "value": float(values[-1]),
+        "growth": state["growth"] * float(np.prod(growth)),
+        "flows": (state["flows"] or [[since, float(values[0])]]) + [
+            [date, value]
+            for date, value in zip(flow_dates.tolist(), flows.tolist())
+        ]
+    }
+
+
+def get_state_returns(state):
+    """
+    :param state: {}
+        State of returns (see get_returns_state)
+    :return: tuple (float, float)
+        Time-weighted return and yearly money-weighted return up to date of
+        state (None if it has not been updated yet)
+    """
+
+    if state is None or state["value"] is None:
+        return None, None
+
+    dates = np.array(
+        [date for date, _ in state["flows"]] + [state["date"]],
+        dtype=np.int64
+    )
+    cash_flows = np.array(
+        [-value for _, value in state["flows"]] + [state["value"]]
+    )  # invested, then returned
+    times = (dates - dates[0]) / YEAR_NS
+    return state["growth"] - 1.0, float(solve_irr(times, cash_flows)[0])
+
+
+def get_total_returns(wallets, currency=DEFAULT_FIAT, until=None,
+                      state=None):
+    """
+    :param wallets: [] of Wallet
+        Wallets of portfolio (or exchange): with all transactions, or
+        starting from their balances on date of state
+    :param currency: str
+        Currency to value wallets and flows in
+    :param until: datetime
+        End of period (now if None)
+    :param state: {}
+        State of returns up to a date (see get_returns_state), e.g saved in
+        a checkpoint
+    :return: tuple (float, float)
+        Time-weighted return and yearly money-weighted return from first
+        transaction of wallets to end (None if there are no transactions or
+        prices are missing)
+    """
+
+    until = dates_to_ns_array([until or datetime.utcnow()])[0]
+    return get_state_returns(
+        get_returns_state(wallets, until, currency, state)
+    )
@@ -4,22 +4,83 @@
 
 """ Analyze transactions in exchanges """
 
+import numpy as np
+
+from pyhodl.data.coins import COINS_REGISTRY
+from pyhodl.utils.dates import datetime_to_unix_timestamp_ns
+from pyhodl.utils.misc import is_exact_units, from_units
+from .search import TransactionsIndex
+from .store import TransactionStore, TransactionsTable, DatesIndex
+from .transactions import get_ids_key
 from .wallets import Wallet
 
+HASH_MODULO = 2 ** 64  # hashes of transactions are summed modulo it
+
 
 class CryptoExchange:
     """ Exchange dealing with crypto-coins """
 
-    def __init__(self, transactions, exchange_name):
+    def __init__(self, transactions, exchange_name, store=None, index=None,
+                 fingerprints=None):
         """
-        :param transactions: [] of Transaction
+        :param transactions: [] of Transaction or TransactionsTable
             List of transactions
+        :param exchange_name: str
+            Name of exchange
+        :param store: TransactionStore
+            Columnar store of the same transactions (built if not given)
+        :param index: TransactionsIndex
+            Full-text index of the same transactions (built when first
+            needed if not given)
+        :param fingerprints: numpy array of uint64
+            Fingerprints (see pyhodl.data.dedup) of the first transactions
+            (the other ones are hashed when needed)
         """
 
         self.transactions = transactions
         if not self.transactions:
             raise ValueError("Creating exchange with no past transaction!")
         self.exchange_name = str(exchange_name)
+        self.store = store if store is not None else \
+            TransactionStore.from_transactions(self.transactions)
+        self.index = index
+        self.fingerprints = fingerprints
+        self.dates_index = DatesIndex()  # updated when needed
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["dates_index"] = DatesIndex()  # coin ids are per process
+        return state
+
+    def add_transactions(self, transactions):
+        """
+        :param transactions: [] of Transaction
+            Transactions to append
+        :return: void
+            Adds transactions to exchange (indexes are updated when needed).
+            Transactions kept in a table are appended to it as rows, their
+            raw data kept in memory.
+        """
+
+        if isinstance(self.transactions, TransactionsTable):
+            records = self.transactions.raw_records
+            self.transactions.add_transactions(transactions, [
+                records.keep(transaction.raw) for transaction in transactions
+            ])
+        else:
+            if not isinstance(self.transactions, list):
+                self.transactions = list(self.transactions)
+            self.transactions += transactions
+        self.store.add_transactions(transactions)
+
+    def get_dates_index(self):
+        """
+        :return: DatesIndex
+            Rows of transactions sorted by date, by coin and by type
+        """
+
+        self.dates_index.update(self.store)
+        return self.dates_index
 
     def get_transactions_count(self):
         """
@@ -35,11 +96,7 @@ class CryptoExchange:
             First transaction done (with respect to time)
         """
 
-        first = self.transactions[0]
-        for transaction in self.transactions:
-            if transaction.date < first.date:
-                first = transaction
-        return first
+        return self.transactions[self.get_dates_index().rows[0]]
 
     def get_last_transaction(self):
         """
@@ -47,11 +104,66 @@ class CryptoExchange:
             Last transaction done (with respect to time)
         """
 
-        last = self.transactions[0]
-        for transaction in self.transactions:
-            if transaction.date > last.date:
-                last = transaction
-        return last
+        index = self.get_dates_index()
+        first_of_last_date = np.searchsorted(
+            index.dates, index.dates[-1], side="left"
+        )
+        return self.transactions[index.rows[first_of_last_date]]
+
+    def _get_rows(self, rows):
+        """
+        :param rows: numpy array of int
+            Rows of transactions
+        :return: [] of Transaction
+            Transactions in rows
+        """
+
+        return [self.transactions[row] for row in rows.tolist()]
+
+    def transactions_between(self, since=None, until=None):
+        """
+        :param since: datetime
+            Get transactions since this date (from first one if None)
+        :param until: datetime
+            Get transactions until this date (up to last one if None)
+        :return: [] of Transaction
+            Transactions done between the dates (included), sorted by date
+        """
+
+        if since is not None:
+            since = datetime_to_unix_timestamp_ns(since)
+        if until is not None:
+            until = datetime_to_unix_timestamp_ns(until)
+        return self._get_rows(
+            self.get_dates_index().get_between(since, until)
+        )
+
+    def transactions_for(self, coin):
+        """
+        :param coin: str or Coin
+            Coin to look for
+        :return: [] of Transaction
+            Transactions buying, selling or paying fees in coin, sorted by
+            date
+        """
+
+        index = self.get_dates_index()
+        coin = COINS_REGISTRY.find_id(coin)
+        if coin is None:
+            return []
+        return self._get_rows(index.get_by_coin(coin))
+
+    def transactions_of_type(self, transaction_type):
+        """
+        :param transaction_type: TransactionType
+            Type of transactions to get
+        :return: [] of Transaction
+            Transactions of type, sorted by date
+        """
+
+        return self._get_rows(
+            self.get_dates_index().get_by_type(transaction_type)
+        )
 
     def get_transactions(self, rule):
         """
@@ -65,20 +177,221 @@ class CryptoExchange:
             if rule(transaction):
                 yield transaction
 
-    def build_wallets(self):
+    def get_ids(self, start=0):
+        """
+        :param start: int
+            First transaction to get ids of
+        :return: iterator of str
+            Ids in raw data of each transaction from start on (see
+            get_ids_key), read without decoding raw data when transactions
+            are kept in a table
+        """
+
+        if isinstance(self.transactions, TransactionsTable):
+            ids = self.transactions.ids
+            return (ids[row] for row in range(start, len(ids)))
+
+        return (
+            get_ids_key(transaction.raw)
+            for transaction in self.transactions[start:]
+        )
+
+    def take(self, rows):
         """
+        :param rows: [] of int
+            Rows of transactions
+        :return: CryptoExchange
+            Exchange with just transactions in rows (in this order). Its
+            full-text index and fingerprints are taken only if already
+            computed for all transactions (else computed when needed).
+        """
+
+        if isinstance(self.transactions, TransactionsTable):
+            transactions = self.transactions.take(rows)
+        else:
+            transactions = [self.transactions[row] for row in rows]
+
+        size = len(self.store)
+        index = self.index.take(rows) \
+            if self.index is not None and self.index.size == size else None
+        fingerprints = self.fingerprints[rows] \
+            if self.fingerprints is not None and \
+            len(self.fingerprints) == size else None
+        return CryptoExchange(
+            transactions, self.exchange_name, store=self.store.take(rows),
+            index=index, fingerprints=fingerprints
+        )
+
+    def get_index(self):
+        """
+        :return: TransactionsIndex
+            Full-text index of raw data of transactions
+        """
+
+        if self.index is None:
+            self.index = TransactionsIndex.from_transactions(
+                self.transactions
+            )
+        elif self.index.size < len(self.transactions):  # appended ones
+            self.index.add_transactions(self.transactions[self.index.size:])
+        return self.index
+
+    def search(self, item):
+        """
+        :param item: str
+            Value to look for (e.g order id, tx hash, address, symbol)
+        :return: [] of Transaction
+            Transactions with a raw field equal to item (case insensitive)
+        """
+
+        return [
+            self.transactions[row] for row in self.get_index().find(item)
+        ]
+
+    def search_prefix(self, prefix):
+        """
+        :param prefix: str
+            Start of value to look for
+        :return: [] of Transaction
+            Transactions with a raw field starting with prefix (case
+            insensitive)
+        """
+
+        return [
+            self.transactions[row]
+            for row in self.get_index().find_prefix(prefix)
+        ]
+
+    def build_wallets(self, fixed_point=False, checkpoint=None):
+        """
+        :param fixed_point: bool
+            True iff you want wallets to keep amounts as exact integer
+            number of smallest units of coin (e.g satoshi). Wallets of coins
+            with amounts out of exact range keep floats.
+        :param checkpoint: {}
+            Valid checkpoint (see get_checkpoint): if set, wallets start
+            from its balances and only newer transactions are replayed
         :return: {} of str -> Wallet
             Build a wallet for each currency traded and put trading history
             there
         """
 
         wallets = {}  # get only successful transactions
-        transactions = self.get_transactions(lambda x: x.successful)
-        for transaction in transactions:
-            for coin in transaction.get_coins():
-                if coin not in wallets:
-                    wallets[coin] = Wallet(coin)
+        since = checkpoint["date"] if checkpoint else None
+        deltas_by_coin = self.store.get_wallets_deltas(
+            fixed_point=fixed_point, since=since
+        )
+        openings = checkpoint["balances"] if checkpoint else {}
+        for coin, (rows, deltas) in deltas_by_coin.items():
+            symbol = COINS_REGISTRY.get_symbol(coin)
+            decimals = COINS_REGISTRY.get_decimals(coin)
+            if deltas.dtype != np.int64:  # out of exact range (or floats)
+                decimals = None
+            elif not is_exact_units(openings.get(symbol, 0.0), decimals):
+                deltas, decimals = from_units(deltas, decimals), None
+            wallets[symbol] = Wallet(symbol, decimals)
+            wallets[symbol].add_transactions(
+                self.transactions, self.store.dates[rows], deltas,
+                types=self.store.types[rows], rows=rows
+            )  # transactions are built only when asked for
 
-                wallets[coin].add_transaction(transaction)
+        for symbol, balance in openings.items():
+            if symbol not in wallets:
+                decimals = COINS_REGISTRY.get_decimals(symbol)
+                exact = fixed_point and is_exact_units(balance, decimals)
+                wallets[symbol] = Wallet(symbol, decimals if exact else None)
+            wallets[symbol].set_opening(balance, since)
 
         return wallets
+
+    def get_history_hash(self, date, start=None):
+        """
+        :param date: int
+            Date (epoch ns)
+        :param start: tuple (int, str)
+            Date and hash of transactions up to it: if set, just transactions
+            after it are added to hash
+        :return: str
+            Hash of dates, coins, amounts, types and outcome of transactions
+            up to date: sum of hash of each one, so that it is extended with
+            just the newer ones
+        """
+
+        dates = self.store.dates
+        hashes = self.store.get_hashes()[dates <= date]
+        total = 0
+        if start is not None:
+            hashes = hashes[dates[dates <= date] > start[0]]
+            total = int(start[1], 16)
+        total += int(hashes.sum(dtype=np.uint64))  # wraps around
+        return "{:016x}".format(total % HASH_MODULO)
+
+    def get_checkpoint(self, wallets, fixed_point=False, checkpoint=None):
+        """
+        :param wallets: {} of str -> Wallet
+            Wallets built from transactions of exchange
+        :param fixed_point: bool
+            True iff wallets keep exact integer units
+        :param checkpoint: {}
+            Valid checkpoint wallets have been built from (None if they have
+            been built from all transactions)
+        :return: {}
+            Balance of each wallet after last transaction, date (epoch ns),
+            ids of last transaction, number of transactions up to it and hash
+            of them (extended from the one of checkpoint)
+        """
+
+        index = self.get_dates_index()
+        last_date = int(index.dates[-1])
+        last = index.rows[-1]  # added last among the ones of last date
+        start = (checkpoint["date"], checkpoint["history"]) \
+            if checkpoint else None
+        return {
+            "exchange": self.exchange_name,
+            "date": last_date,
+            "count": len(self.store),
+            "history": self.get_history_hash(last_date, start),
+            "last": self.transactions[last].get_ids(),
+            "fixed_point": bool(fixed_point),
+            "balances": {
+                symbol: wallet.balance() for symbol, wallet in wallets.items()
+            }
+        }
+
+    def is_valid_checkpoint(self, checkpoint, fixed_point=False):
+        """
+        :param checkpoint: {}
+            Checkpoint (see get_checkpoint)
+        :param fixed_point: bool
+            True iff wallets are going to keep exact integer units
+        :return: bool
+            True iff checkpoint refers to transactions of this exchange,
+            i.e there are as many transactions up to its date, its last
+            transaction is there and none of them has changed
+        """
+
+        if not checkpoint or \
+                checkpoint.get("exchange") != self.exchange_name or \
+                checkpoint.get("fixed_point") != bool(fixed_point):
+            return False
+
+        index = self.get_dates_index()
+        date = checkpoint["date"]
+        if np.searchsorted(index.dates, date, side="right") != \
+                checkpoint["count"]:
+            return False
+
+        return any(
+            transaction.get_ids() == checkpoint["last"]
+            for transaction in self._get_rows(index.get_between(date, date))
+        ) and checkpoint.get("history") == self.get_history_hash(date)
+
+    def get_balances(self, fixed_point=False):
+        """
+        :param fixed_point: bool
+            True iff you want balances summed exactly as integer units
+        :return: {} of str -> float
+            Current balance of each coin traded
+        """
+
+        return self.store.get_balances(fixed_point=fixed_point)
@@ -0,0 +1,229 @@
+# !/usr/bin/python3
+# coding: utf_8
+
+
+""" Match acquisitions and disposals of coins in lots to get cost basis """
+
+import heapq
+from collections import deque
+from enum import Enum
+
+import numpy as np
+
+EPSILON = 1e-12  # lots with less (relative) amount left are closed
+
+
+class CostBasisMethod(Enum):
+    """ Which lot is consumed first when disposing coins """
+
+    FIFO = "fifo"  # first in, first out
+    LIFO = "lifo"  # last in, first out
+    HIFO = "hifo"  # highest (unit cost) in, first out
+
+
+class OpenLots:
+    """ Lots not yet fully disposed, ordered by cost basis method """
+
+    def __init__(self, method):
+        self.method = CostBasisMethod(method)
+        if self.method == CostBasisMethod.FIFO:
+            self.lots = deque()
+        else:
+            self.lots = []  # stack (LIFO) or heap (HIFO)
+
+    def __len__(self):
+        return len(self.lots)
+
+    def push(self, lot, price):
+        """
+        :param lot: int
+            Index of lot
+        :param price: float
+            Unit cost of lot
+        :return: void
+            Adds lot to open ones
+        """
+
+        if self.method == CostBasisMethod.HIFO:
+            heapq.heappush(self.lots, (-price, lot))
+        else:
+            self.lots.append(lot)
+
+    def peek(self):
+        """
+        :return: int
+            Index of lot to consume next
+        """
+
+        if self.method == CostBasisMethod.FIFO:
+            return self.lots[0]
+        elif self.method == CostBasisMethod.LIFO:
+            return self.lots[-1]
+        return self.lots[0][1]
+
+    def pop(self):
+        """
+        :return: void
+            Removes lot to consume next (because closed)
+        """
+
+        if self.method == CostBasisMethod.FIFO:
+            self.lots.popleft()
+        elif self.method == CostBasisMethod.LIFO:
+            self.lots.pop()
+        else:
+            heapq.heappop(self.lots)
+
+
+def match_lots(dates, amounts, fees, prices, transfers=None,
+               method=CostBasisMethod.FIFO, current_price=None):
+    """
+    :param dates: numpy array of int64
+        Date (epoch ns) of each transaction, sorted
+    :param amounts: numpy array of float
+        Amount of coin gained (if positive) or lost (if negative) by each
+        transaction, fees excluded
+    :param fees: numpy array of float
+        Amount of coin paid as fee in each transaction (positive)
+    :param prices: numpy array of float
+        Unit price of coin at each transaction (NaN if missing: gains of lots
+        it is the cost or proceeds of are NaN)
+    :param transfers: numpy array of bool
+        True for transactions moving coins out without selling them (e.g
+        withdrawals): lots are consumed but no gain is realized
+    :param method: CostBasisMethod
+        Order in which lots are consumed
+    :param current_price: float
+        Unit price to value open lots (last known price if None)
+    :return: {} of str -> numpy array (and "unmatched" -> float)
+        For each lot: date, amount, price (unit cost), remaining amount,
+        realized and unrealized gain. "unmatched" is the amount disposed
+        when no lot was open.
+    """
+
+    amounts = np.asarray(amounts, dtype=np.float64)
+    fees = np.asarray(fees, dtype=np.float64)
+    prices = np.asarray(prices, dtype=np.float64)
+    transfers = np.zeros(len(amounts), dtype=bool) if transfers is None \
+        else np.asarray(transfers, dtype=bool)
+
+    is_lot = amounts > 0
+    lots_amount = amounts[is_lot]
+    lots_price = prices[is_lot]
+    costs, totals = lots_price.tolist(), lots_amount.tolist()  # faster
+    remaining = lots_amount.tolist()
+    realized = [0.0] * len(remaining)
+    unmatched = 0.0
+    open_lots = OpenLots(method)
+
+    lot = 0  # index of next lot
+    for amount, fee, price, is_transfer in zip(amounts.tolist(),
+                                               fees.tolist(),
+                                               prices.tolist(),
+                                               transfers.tolist()):
+        if amount > 0:
+            open_lots.push(lot, price)
+            lot += 1
+
+        disposals = [(fee, 0.0, False)]  # fees have no proceeds
+        if amount < 0:
+            disposals.insert(0, (-amount, price, is_transfer))
+
+        for to_dispose, proceeds, no_gain in disposals:
+            while to_dispose > 0 and open_lots:
+                consumed_lot = open_lots.peek()
+                consumed = min(to_dispose, remaining[consumed_lot])
+                if not no_gain:
+                    realized[consumed_lot] += \
+                        consumed * (proceeds - costs[consumed_lot])
+                remaining[consumed_lot] -= consumed
+                to_dispose -= consumed
+                if remaining[consumed_lot] <= EPSILON * totals[consumed_lot]:
+                    remaining[consumed_lot] = 0.0
+                    open_lots.pop()
+
+            if to_dispose > EPSILON:
+                unmatched += to_dispose
+
+    remaining = np.array(remaining, dtype=np.float64)
+    if current_price is None:
+        known = prices[~np.isnan(prices)]
+        current_price = known[-1] if len(known) else np.nan
+
+    return {
+        "date": np.asarray(dates, dtype=np.int64)[is_lot],
+        "amount": lots_amount,
+        "price": lots_price,
+        "remaining": remaining,
+        "realized": np.array(realized, dtype=np.float64),
+        "unrealized": remaining * (current_price - lots_price),
+        "unmatched": unmatched
+    }
+
+
+def get_trade_price(transaction, coin, currency):
+    """
+    :param transaction: Transaction
+        Transaction of coin
+    :param coin: str
+        Coin of lot
+    :param currency: str
+        Currency to value lots in
+    :return: float
+        Unit price of coin paid or received in trade, if it is traded for
+        currency (NaN otherwise)
+    """
+
+    if transaction.is_trade():
+        legs = [transaction.coin_buy, transaction.coin_sell]
+        for leg, other in [legs, legs[::-1]]:
+            if leg and other and leg.get_symbol() == coin and \
+                    other.get_symbol() == currency and leg.get_amount():
+                return (other.get_amount() or 0.0) / leg.get_amount()
+    return np.nan
+
+
+def get_wallet_lots(wallet, currency, method=CostBasisMethod.FIFO,
+                    current_price=None):
+    """
+    :param wallet: Wallet
+        Coin wallet with transactions
+    :param currency: str
+        Currency to value lots in
+    :param method: CostBasisMethod
+        Order in which lots are consumed
+    :param current_price: float
+        Unit price to value open lots (last known price if None)
+    :return: {} of str -> numpy array
+        Lots of wallet (see match_lots). Unit price is the one of the other
+        coin of trades in currency, or the price on date of transaction
+        otherwise. "missing" are the dates of transactions with neither: the
+        gains they take part in are NaN, not counted as 0.
+    """
+
+    coin = wallet.base_currency
+    fees = np.array([
+        transaction.get_amount_fee(coin) for transaction in wallet.transactions
+    ])
+    amounts = np.array([
+        transaction.get_amount(coin) for transaction in wallet.transactions
+    ]) + fees
+    transfers = np.array([
+        transaction.is_withdrawal() for transaction in wallet.transactions
+    ], dtype=bool)
+    prices = np.array([
+        get_trade_price(transaction, coin, currency)
+        for transaction in wallet.transactions
+    ], dtype=np.float64)
+    unpriced = np.isnan(prices)
+    if unpriced.any():
+        prices[unpriced] = wallet.convert_many(
+            wallet.dates_array[unpriced], currency
+        )
+
+    lots = match_lots(
+        wallet.dates_array, amounts, fees, prices, transfers, method,
+        current_price
+    )
+    lots["missing"] = wallet.dates_array[wallet.get_missing_prices(prices)]
+    return lots
@@ -4,12 +4,17 @@
 
 """ Analyze transactions in wallets """
 
+from datetime import datetime
+
 import numpy as np
 
+from pyhodl.api.price.factory import get_price_on_date
 from pyhodl.config import VALUE_KEY, NAN, DATE_TIME_KEY
 from pyhodl.data.coins import DEFAULT_FIAT
+from pyhodl.utils.dates import get_buckets, ns_array_to_dates
 from pyhodl.utils.misc import get_ratio, get_percentage, is_nan, \
-    get_relative_delta, get_relative_percentage
+    get_relative_delta, get_relative_percentage, get_ohlc, \
+    merge_unique_sorted
 
 
 class Portfolio:
@@ -18,17 +23,105 @@ class Portfolio:
     def __init__(self, wallets, portfolio_name=None):
         self.wallets = wallets
         self.portfolio_name = str(portfolio_name) if portfolio_name else None
+        self._timeline = None  # dates of all transactions (see get_timeline)
+        self._timeline_key = None  # version of wallets of timeline
+
+    def get_timeline(self):
+        """
+        :return: numpy array of int64
+            Sorted distinct dates (epoch ns) of all transactions of all
+            wallets. It is cached until any wallet changes.
+        """
+
+        key = [(id(wallet), wallet.version) for wallet in self.wallets]
+        if self._timeline_key != key:
+            self._timeline = merge_unique_sorted([
+                wallet.dates_array for wallet in self.wallets
+            ])
+            self._timeline_key = key
+        return self._timeline
 
     def get_transactions_dates(self):
         """
         :return: [] of datetime
-            List of all dates of all transactions of all wallets
+            List of all distinct dates of all transactions of all wallets
+        """
+
+        return ns_array_to_dates(self.get_timeline())
+
+    def balance_at(self, date_time, currency=None):
+        """
+        :param date_time: datetime
+            Date and time of balance
+        :param currency: str or None
+            Currency to convert balances to (with price on date)
+        :return: {} of str -> float
+            Balance of each coin after all transactions up to date
+        """
+
+        balances = {}
+        for wallet in self.wallets:
+            balances[wallet.base_currency] = \
+                balances.get(wallet.base_currency, 0.0) + \
+                wallet.balance_at(date_time, currency)
+        return balances
+
+    def balances_between(self, since, until):
+        """
+        :param since: datetime
+            Get balances since this date
+        :param until: datetime
+            Get balances until this date
+        :return: {} of str -> (numpy array of int64, numpy array of float)
+            For each coin, distinct dates (epoch ns) of transactions in
+            between (extremes included) and balance of coin (summed over all its
+            wallets) after all transactions up to each date
         """
 
-        dates = []
+        wallets = {}
         for wallet in self.wallets:
-            dates += wallet.dates()
-        return sorted(dates)
+            wallets.setdefault(wallet.base_currency, []).append(wallet)
+
+        balances = {}
+        for coin, coin_wallets in wallets.items():
+            dates = np.unique(np.concatenate([
+                wallet.balances_between(since, until)[0]
+                for wallet in coin_wallets
+            ]))
+            balances[coin] = dates, sum(
+                wallet.balances_on(dates) for wallet in coin_wallets
+            )
+        return balances
+
+    def resample(self, freq, currency=DEFAULT_FIAT):
+        """
+        :param freq: str
+            Width of each bucket, written in short format (e.g 1h, 1d, 1w)
+        :param currency: str
+            Currency to convert balances to
+        :return: {} of str -> numpy array or {}
+            Start date (epoch ns) of each bucket ("date") and open, high,
+            low and close total value of wallets in currency ("value").
+            Coins with missing price count as 0.
+        """
+
+        dates = self.get_timeline()
+        if not len(dates):
+            return {"date": dates}
+
+        starts = get_buckets(dates[0], dates[-1], freq)
+        samples = np.sort(np.concatenate((starts, dates)), kind="stable")
+        values = np.zeros(len(samples))
+        for wallet in self.wallets:
+            wallet_values = wallet.convert_many(
+                samples, currency, wallet.balances_on(samples)
+            )
+            values += np.where(np.isnan(wallet_values), 0.0, wallet_values)
+
+        return {
+            "date": starts,
+            "value": get_ohlc(samples, values, starts)
+        }
 
     def get_current_balance(self, currency=DEFAULT_FIAT):
         """
@@ -36,13 +129,15 @@ class Portfolio:
             List of current balance by wallet
         """
 
+        totals = [wallet.balance() for wallet in self.wallets]  # once
+        prices = self.get_current_prices(currency)
         balances = [
             {
                 "symbol": wallet.base_currency,
-                "balance": wallet.balance(),
-                VALUE_KEY: wallet.balance(currency, True)
+                "balance": total,
+                VALUE_KEY: float(prices[wallet.base_currency]) * total
             }
-            for wallet in self.wallets
+            for wallet, total in zip(self.wallets, totals)
         ]
         tot_balance = self.sum_total_balance(balances)
 
@@ -62,6 +157,31 @@ class Portfolio:
 
         return balances
 
+    def get_current_prices(self, currency=DEFAULT_FIAT):
+        """
+        :param currency: str
+            Currency to get price in
+        :return: {} of str -> float
+            Current price of each coin of wallets (NaN if not available).
+            Prices are fetched together, in as few requests as provider
+            allows.
+        """
+
+        coins = list(dict.fromkeys(
+            wallet.base_currency for wallet in self.wallets
+        ))  # distinct, in order
+        prices = {
+            coin: 1.0 for coin in coins if str(coin) == str(currency)
+        }
+        to_fetch = [coin for coin in coins if coin not in prices]
+        if to_fetch:
+            fetched = get_price_on_date(
+                to_fetch, currency, datetime.now(), tor=False
+            )
+            for coin in to_fetch:
+                prices[coin] = fetched.get(coin, NAN)
+        return prices
+
     @staticmethod
     def get_balances_from_deltas(deltas):
         """
@@ -108,12 +228,13 @@ class Portfolio:
             List of dates, balances of crypto coins and fiat balances
         """
 
-        dates = self.get_transactions_dates()
+        dates_array = self.get_timeline()
+        dates = ns_array_to_dates(dates_array)
         crypto_values = np.zeros(len(dates))  # zeros
         fiat_values = np.zeros(len(dates))
 
         for wallet in self.wallets:
-            balances = wallet.get_balance_array_by_date(dates, currency)
+            balances = wallet.get_balance_array_by_date(dates_array, currency)
             if wallet.is_crypto():
                 crypto_values += balances
             else:
@@ -0,0 +1,260 @@
+# !/usr/bin/python3
+# coding: utf_8
+
+
+""" Full-text index of raw transactions data """
+
+import heapq
+from array import array
+
+import numpy as np
+
+from .store import PackedStrings
+
+
+def get_tokens(raw):
+    """
+    :param raw: {}, [] or *
+        Raw data
+    :return: generator of str
+        Lower-case value of each (nested) field
+    """
+
+    if isinstance(raw, dict):
+        for value in raw.values():
+            yield from get_tokens(value)
+    elif isinstance(raw, list):
+        for value in raw:
+            yield from get_tokens(value)
+    elif raw is not None and not isinstance(raw, bool):
+        yield str(raw).lower()
+
+
+class TransactionsIndex:
+    """ Inverted index: value of raw field -> transactions having it. Tokens
+    are kept sorted and packed, each one with its rows, so that the index is
+    compact and can be saved as arrays. """
+
+    def __init__(self):
+        self.tokens = PackedStrings()  # sorted distinct tokens
+        self.bounds = np.zeros(1, dtype=np.int64)  # rows of i-th token are
+        # rows[bounds[i]:bounds[i + 1]]
+        self.rows = np.empty(0, dtype=np.int64)
+        self.size = 0  # number of transactions indexed
+        self._runs = []  # indexes of batches added and not yet merged
+
+    def _get_postings(self):
+        """
+        :return: generator of (bytes, [] of int)
+            Each token (encoded) and its rows, sorted by token
+        """
+
+        buffer, offsets = bytes(self.tokens.buffer), self.tokens.offsets
+        bounds, rows = self.bounds.tolist(), self.rows.tolist()
+        for i in range(len(self.tokens)):
+            yield buffer[offsets[i]:offsets[i + 1]], \
+                rows[bounds[i]:bounds[i + 1]]
+
+    def _bisect(self, token):
+        """
+        :param token: bytes
+            Token (encoded)
+        :return: int
+            Index of first token not lower than token
+        """
+
+        self.merge()
+        low, high = 0, len(self.tokens)
+        while low < high:
+            middle = (low + high) // 2
+            if self.tokens.get_bytes(middle) < token:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def add(self, raw):
+        """
+        :param raw: {}
+            Raw data of next transaction
+        :return: int
+            Row of transaction
+        """
+
+        self.add_raws([raw])
+        return self.size - 1
+
+    def add_raws(self, raws):
+        """
+        :param raws: [] of {}
+            Raw data of next transactions
+        :return: void
+            Indexes batch of raw data (merged to others when needed)
+        """
+
+        postings = {}
+        for row, raw in enumerate(raws, self.size):
+            for token in set(get_tokens(raw)):
+                postings.setdefault(token.encode("utf-8"), []).append(row)
+
+        run = TransactionsIndex()
+        tokens = sorted(postings)
+        run.tokens.extend_bytes(tokens)
+        run.bounds = np.cumsum(
+            [0] + [len(postings[token]) for token in tokens], dtype=np.int64
+        )
+        run.rows = np.array(
+            [row for token in tokens for row in postings[token]],
+            dtype=np.int64
+        )
+        self.size += len(raws)
+        self._runs.append(run)
+
+    def add_transactions(self, transactions):
+        """
+        :param transactions: [] of Transaction
+            Transactions to index (in order)
+        :return: void
+            Adds raw data of each transaction to index
+        """
+
+        self.add_raws([transaction.raw for transaction in transactions])
+
+    def merge(self):
+        """
+        :return: void
+            Merges batches added to index (just once, when needed)
+        """
+
+        if not self._runs:
+            return
+
+        tokens, bounds, rows = PackedStrings(), array("q", [0]), array("q")
+        postings = heapq.merge(
+            self._get_postings(),
+            *[run._get_postings() for run in self._runs],
+            key=lambda posting: posting[0]
+        )  # rows of the same token are merged in order of batch
+        last = None
+        for token, token_rows in postings:
+            if token != last:
+                tokens.extend_bytes([token])
+                bounds.append(bounds[-1])
+                last = token
+            rows.extend(token_rows)
+            bounds[-1] += len(token_rows)
+
+        self.tokens = tokens
+        self.bounds = np.array(bounds, dtype=np.int64)
+        self.rows = np.array(rows, dtype=np.int64)
+        self._runs = []
+
+    def find(self, item):
+        """
+        :param item: str
+            Value to look for (e.g order id, tx hash, address, symbol)
+        :return: [] of int
+            Rows of transactions with a field equal to item
+        """
+
+        token = str(item).lower().encode("utf-8")
+        i = self._bisect(token)
+        if i < len(self.tokens) and self.tokens.get_bytes(i) == token:
+            return self.rows[self.bounds[i]:self.bounds[i + 1]].tolist()
+        return []
+
+    def find_prefix(self, prefix):
+        """
+        :param prefix: str
+            Start of value to look for
+        :return: [] of int
+            Rows of transactions with a field starting with prefix
+        """
+
+        prefix = str(prefix).lower().encode("utf-8")
+        if not prefix:
+            return list(range(self.size))
+
+        first = last = self._bisect(prefix)
+        while last < len(self.tokens) and \
+                self.tokens.get_bytes(last).startswith(prefix):
+            last += 1
+        return np.unique(
+            self.rows[self.bounds[first]:self.bounds[last]]
+        ).tolist()
+
+    def take(self, rows):
+        """
+        :param rows: [] of int
+            Rows of transactions
+        :return: TransactionsIndex
+            Index of just transactions in rows (in this order)
+        """
+
+        self.merge()
+        rows = np.asarray(rows, dtype=np.int64)
+        new_rows = np.full(self.size, -1, dtype=np.int64)
+        new_rows[rows] = np.arange(len(rows))
+        counts = np.diff(self.bounds)
+        groups = np.repeat(np.arange(len(counts)), counts)
+        mapped = new_rows[self.rows]
+        kept = mapped >= 0
+        groups, mapped = groups[kept], mapped[kept]
+        order = np.lexsort((mapped, groups))  # rows of each token sorted
+
+        counts = np.bincount(groups, minlength=len(counts))
+        index = TransactionsIndex()
+        index.tokens = self.tokens.take(np.flatnonzero(counts).tolist())
+        index.bounds = np.concatenate(
+            [[0], np.cumsum(counts[counts > 0])]
+        ).astype(np.int64)
+        index.rows = mapped[order]
+        index.size = len(rows)
+        return index
+
+    def to_arrays(self):
+        """
+        :return: {} of str -> numpy array
+            Arrays of index (e.g to save them)
+        """
+
+        self.merge()
+        tokens, offsets = self.tokens.to_arrays()
+        return {
+            "tokens": tokens,
+            "offsets": offsets,
+            "bounds": self.bounds,
+            "rows": self.rows,
+            "size": np.array(self.size, dtype=np.int64)
+        }
+
+    @staticmethod
+    def from_arrays(arrays):
+        """
+        :param arrays: {} of str -> numpy array
+            Arrays of index (see to_arrays)
+        :return: TransactionsIndex
+            Index (e.g saved before)
+        """
+
+        index = TransactionsIndex()
+        index.tokens = PackedStrings.from_arrays(
+            arrays["tokens"], arrays["offsets"]
+        )
+        index.bounds = np.asarray(arrays["bounds"], dtype=np.int64)
+        index.rows = np.asarray(arrays["rows"], dtype=np.int64)
+        index.size = int(arrays["size"])
+        return index
+
+    @staticmethod
+    def from_transactions(transactions):
+        """
+        :param transactions: [] of Transaction
+            List of transactions
+        :return: TransactionsIndex
+            Index of all transactions
+        """
+
+        index = TransactionsIndex()
+        index.add_transactions(transactions)
+        return index
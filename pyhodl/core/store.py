@@ -0,0 +1,1031 @@
+# !/usr/bin/python3
+# coding: utf_8
+
+
+""" Columnar (struct-of-arrays) storage of transactions """
+
+import hashlib
+import weakref
+from array import array
+
+import numpy as np
+
+from pyhodl.data.coins import COINS_REGISTRY
+from pyhodl.utils.dates import datetime_to_unix_timestamp_ns, \
+    unix_timestamp_ns_to_datetime
+from pyhodl.utils.misc import to_units, from_units, is_exact_units
+from .transactions import TransactionType, DELTA_SIGNS, NO_DELTA_SIGNS, \
+    Transaction, Commission, CoinAmount, RawRecords, get_ids_key
+
+NO_COIN = -1  # id of missing coin
+BUY, SELL, FEE = 0, 1, 2  # columns of coins and amounts matrices
+NO_AMOUNT, NO_SYMBOL = -1, -2  # coin index of missing amount or symbol
+NO_KEY = -1  # key of raw data of commission which is the whole record
+MAX_UNITS_SUM = 2.0 ** 62  # units of a coin are summed as int64 below it
+TABLE_COLUMNS = {
+    "dates": np.int64,  # epoch ns
+    "types": np.uint8,
+    "successful": bool,
+    "raw": np.int64,  # index of raw record
+    "buy_coin": np.int32,  # index of symbol (or NO_AMOUNT, NO_SYMBOL)
+    "buy_amount": np.float64,  # NaN if missing
+    "buy_in": bool,
+    "sell_coin": np.int32,
+    "sell_amount": np.float64,
+    "sell_in": bool,
+    "has_fee": bool,
+    "fee_coin": np.int32,
+    "fee_amount": np.float64,
+    "fee_in": bool,
+    "fee_dates": np.int64,
+    "fee_successful": bool,
+    "fee_raw": np.int64,
+    "fee_key": np.int32  # index of key of raw record (or NO_KEY)
+}  # name -> type of each column of transactions table
+
+MIX_SHIFTS = [np.uint64(30), np.uint64(27), np.uint64(31)]
+MIX_FACTORS = [np.uint64(0xbf58476d1ce4e5b9), np.uint64(0x94d049bb133111eb)]
+# of hash of each transaction (splitmix64 finalizer)
+
+# sign of each column (buy, sell, fee) in balance, by transaction type code
+SIGNS_TABLE = np.array([
+    DELTA_SIGNS.get(TransactionType(code), NO_DELTA_SIGNS)
+    for code in range(len(TransactionType))
+])
+
+
+def mix_hashes(values):
+    """
+    :param values: numpy array of uint64
+        Values to hash
+    :return: numpy array of uint64
+        Hash of each value (bits are spread across all of them)
+    """
+
+    for shift, factor in zip(MIX_SHIFTS, MIX_FACTORS):
+        values = (values ^ (values >> shift)) * factor
+    return values ^ (values >> MIX_SHIFTS[-1])
+
+
+def get_symbol_hash(symbol):
+    """
+    :param symbol: str
+        Symbol of coin
+    :return: int
+        Hash of symbol (same in each process, unlike ids of coins)
+    """
+
+    return int(hashlib.md5(symbol.encode("utf-8")).hexdigest()[:16], 16)
+
+
+class TransactionStore:
+    """ Transactions stored as columns: dates, coins, amounts, types and
+    success mask. Row i of each column refers to the i-th transaction
+    added. """
+
+    def __init__(self):
+        self.dates = np.empty(0, dtype=np.int64)  # epoch ns
+        self.coins = np.empty((0, 3), dtype=np.int32)  # buy, sell, fee
+        self.amounts = np.empty((0, 3), dtype=np.float64)  # buy, sell, fee
+        self.types = np.empty(0, dtype=np.uint8)
+        self.successful = np.empty(0, dtype=bool)
+        self.hashes = np.empty(0, dtype=np.uint64)  # of first rows (see
+        # get_hashes), computed when needed
+
+    def __len__(self):
+        return len(self.dates)
+
+    def __getstate__(self):  # ids are per process: save symbols instead
+        state = dict(self.__dict__)
+        ids = np.unique(self.coins[self.coins != NO_COIN])
+        state["symbols"] = [COINS_REGISTRY.get_symbol(i) for i in ids]
+        state["coins"] = np.where(
+            self.coins == NO_COIN, NO_COIN, np.searchsorted(ids, self.coins)
+        ).astype(np.int32)
+        return state
+
+    def __setstate__(self, state):
+        state = dict(state)
+        ids = np.array([
+            COINS_REGISTRY.get_coin(symbol).id
+            for symbol in state.pop("symbols")
+        ] + [NO_COIN], dtype=np.int32)  # NO_COIN (-1) maps to last
+        state["coins"] = ids[state["coins"]]
+        self.__dict__.update(state)
+
+    def _coin_row(self, coin_amount):
+        """
+        :param coin_amount: CoinAmount
+            Coin and amount moved
+        :return: tuple (int, float)
+            Coin id and amount (NO_COIN, 0 if not valid)
+        """
+
+        if coin_amount:
+            symbol = coin_amount.get_symbol()
+            if symbol:
+                return symbol.id, coin_amount.get_amount() or 0.0
+        return NO_COIN, 0.0
+
+    def add_transactions(self, transactions):
+        """
+        :param transactions: [] of Transaction
+            Transactions to append
+        :return: void
+            Appends all transactions to columns at once
+        """
+
+        dates, coins, amounts, types, successful = [], [], [], [], []
+        for transaction in transactions:
+            fee = transaction.commission.coin \
+                if transaction.commission else None
+            buy, sell, fee = \
+                self._coin_row(transaction.coin_buy), \
+                self._coin_row(transaction.coin_sell), \
+                self._coin_row(fee)
+
+            dates.append(datetime_to_unix_timestamp_ns(transaction.date))
+            coins.append((buy[0], sell[0], fee[0]))
+            amounts.append((buy[1], sell[1], fee[1]))
+            types.append(transaction.transaction_type.value)
+            successful.append(transaction.successful)
+
+        if not dates:
+            return
+
+        self.dates = np.concatenate(
+            (self.dates, np.array(dates, dtype=np.int64))
+        )
+        self.coins = np.concatenate(
+            (self.coins, np.array(coins, dtype=np.int32))
+        )
+        self.amounts = np.concatenate(
+            (self.amounts, np.array(amounts, dtype=np.float64))
+        )
+        self.types = np.concatenate(
+            (self.types, np.array(types, dtype=np.uint8))
+        )
+        self.successful = np.concatenate(
+            (self.successful, np.array(successful, dtype=bool))
+        )
+
+    def get_hashes(self):
+        """
+        :return: numpy array of uint64
+            Hash of date, coins, amounts, type and outcome of each row (just
+            rows added since last time are hashed)
+        """
+
+        start = len(self.hashes)
+        if start == len(self):
+            return self.hashes
+
+        symbols = self.get_symbols_hashes(start)
+        amounts = (self.amounts[start:] + 0.0).view(np.uint64)  # no -0.0
+        hashes = mix_hashes(self.dates[start:].view(np.uint64))
+        for column in [
+                self.types[start:].astype(np.uint64),
+                self.successful[start:].astype(np.uint64)] + \
+                [symbols[:, i] for i in range(3)] + \
+                [amounts[:, i] for i in range(3)]:
+            hashes = mix_hashes(hashes ^ column)
+        self.hashes = np.concatenate((self.hashes, hashes))
+        return self.hashes
+
+    def get_symbols_hashes(self, start=0):
+        """
+        :param start: int
+            First row to hash
+        :return: numpy array of uint64
+            Hash of symbol of each coin (buy, sell, fee) of each row from
+            start on (0 if coin is missing), see get_symbol_hash
+        """
+
+        coins = self.coins[start:]
+        ids = np.unique(coins[coins != NO_COIN])
+        symbols = np.array(
+            [get_symbol_hash(COINS_REGISTRY.get_symbol(i)) for i in ids] +
+            [0], dtype=np.uint64
+        )  # last one for missing coins
+        return symbols[
+            np.where(coins == NO_COIN, len(ids), np.searchsorted(ids, coins))
+        ]
+
+    def get_deltas(self):
+        """
+        :return: numpy array
+            Signed amount of each column (buy, sell, fee) of each row
+        """
+
+        signs = SIGNS_TABLE[self.types]
+        return np.where(signs != 0.0, self.amounts * signs, 0.0)
+
+    def get_units(self):
+        """
+        :return: tuple (numpy array of int64, numpy array of bool)
+            Amount of each column (buy, sell, fee) of each row as integer
+            number of smallest units of coin (e.g satoshi), and mask of the
+            ones converted exactly (others are 0, see is_exact_units)
+        """
+
+        decimals = np.array(COINS_REGISTRY.decimals, dtype=np.int64)
+        coins = np.where(self.coins == NO_COIN, 0, self.coins)
+        amounts = np.where(self.coins == NO_COIN, 0.0, self.amounts)
+        exact = is_exact_units(amounts, decimals[coins])
+        units = to_units(np.where(exact, amounts, 0.0), decimals[coins])
+        return units, exact
+
+    def get_deltas_units(self):
+        """
+        :return: tuple (numpy array of int64, numpy array of bool)
+            Signed units of each column (buy, sell, fee) of each row, and
+            mask of the ones converted exactly
+        """
+
+        signs = SIGNS_TABLE[self.types].astype(np.int64)
+        units, exact = self.get_units()
+        return units * signs, exact
+
+    def get_wallets_deltas(self, only_successful=True, fixed_point=False,
+                           since=None):
+        """
+        :param only_successful: bool
+            True iff you want to discard not successful transactions
+        :param fixed_point: bool
+            True iff you want deltas as integer number of smallest units.
+            Deltas of coins with amounts that cannot be converted exactly
+            (or summed as int64) are floats.
+        :param since: int
+            If set, only transactions after this date (epoch ns) are taken
+        :return: {} of int -> (numpy array, numpy array)
+            Coin id (in COINS_REGISTRY) -> rows of transactions touching
+            coin (in order of insertion) and delta of coin in each of them.
+            Coins are in order of first appearance (buy, sell, then fee).
+        """
+
+        rows = np.arange(len(self))
+        if only_successful:
+            rows = rows[self.successful]
+        if since is not None:
+            rows = rows[self.dates[rows] > since]
+
+        flat_rows = np.repeat(rows, 3)
+        flat_columns = np.tile(np.arange(3), len(rows))
+        flat_coins = self.coins[rows].ravel()
+        flat_deltas = self.get_deltas()[rows].ravel()
+        flat_units, flat_exact = None, None  # only in fixed point
+        if fixed_point:
+            units, exact = self.get_deltas_units()
+            flat_units, flat_exact = units[rows].ravel(), exact[rows].ravel()
+
+        valid = flat_coins != NO_COIN
+        order = np.flatnonzero(valid)
+        order = order[np.lexsort((flat_rows[order], flat_coins[order]))]
+        flat_rows, flat_columns, flat_coins, flat_deltas = \
+            flat_rows[order], flat_columns[order], flat_coins[order], \
+            flat_deltas[order]  # by coin, then row
+
+        # same coin may appear more than once in a row (e.g fee)
+        is_new = np.ones(len(flat_rows), dtype=bool)
+        is_new[1:] = (flat_rows[1:] != flat_rows[:-1]) | \
+                     (flat_coins[1:] != flat_coins[:-1])
+        starts = np.nonzero(is_new)[0]
+        if not len(starts):
+            return {}
+
+        flat_deltas = np.add.reduceat(flat_deltas, starts)
+        flat_rows, flat_columns, flat_coins = \
+            flat_rows[starts], flat_columns[starts], flat_coins[starts]
+
+        bounds = np.nonzero(np.diff(flat_coins))[0] + 1
+        firsts = np.append(0, bounds)
+        appearance = np.lexsort((flat_columns[firsts], flat_rows[firsts]))
+        coins_rows, coins_deltas = \
+            np.split(flat_rows, bounds), np.split(flat_deltas, bounds)
+        if fixed_point:  # coins out of exact range are kept as floats
+            coins_units = np.split(
+                np.add.reduceat(flat_units[order], starts), bounds
+            )
+            coins_exact = np.split(
+                np.logical_and.reduceat(flat_exact[order], starts), bounds
+            )
+            for i in range(len(coins_deltas)):
+                if np.all(coins_exact[i]) and np.abs(coins_units[i]).sum(
+                        dtype=np.float64) < MAX_UNITS_SUM:
+                    coins_deltas[i] = coins_units[i]
+
+        return {
+            int(flat_coins[firsts[i]]): (coins_rows[i], coins_deltas[i])
+            for i in appearance
+        }
+
+    def get_balances(self, only_successful=True, fixed_point=False):
+        """
+        :param only_successful: bool
+            True iff you want to discard not successful transactions
+        :param fixed_point: bool
+            True iff you want balances summed exactly as integer units
+        :return: {} of str -> float
+            Total balance of each coin
+        """
+
+        wallets = self.get_wallets_deltas(only_successful, fixed_point)
+        balances = {}
+        for coin, (_, deltas) in wallets.items():
+            total = np.cumsum(deltas)[-1]
+            if deltas.dtype == np.int64:  # else amounts out of exact range
+                total = from_units(total, COINS_REGISTRY.get_decimals(coin))
+            balances[COINS_REGISTRY.get_symbol(coin)] = float(total)
+        return balances
+
+    @staticmethod
+    def from_transactions(transactions):
+        """
+        :param transactions: [] of Transaction
+            List of transactions
+        :return: TransactionStore
+            Store with all transactions
+        """
+
+        if isinstance(transactions, TransactionsTable):
+            return transactions.get_store()  # without building them
+
+        store = TransactionStore()
+        store.add_transactions(transactions)
+        return store
+
+    def take(self, rows):
+        """
+        :param rows: [] of int
+            Rows of transactions
+        :return: TransactionStore
+            Store with just transactions in rows (in this order)
+        """
+
+        rows = np.asarray(rows, dtype=np.int64)
+        store = TransactionStore()
+        store.dates, store.coins, store.amounts, store.types, \
+            store.successful = self.dates[rows], self.coins[rows], \
+            self.amounts[rows], self.types[rows], self.successful[rows]
+        if len(self.hashes) == len(self):
+            store.hashes = self.hashes[rows]
+        return store
+
+
+class PackedStrings:
+    """ Strings packed (utf-8 encoded) one after the other in a buffer """
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.offsets = array("Q", [0])  # where each string starts (and end)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        return self.get_bytes(index).decode("utf-8")
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def get_bytes(self, index):
+        """
+        :param index: int
+            Index of string
+        :return: bytes
+            String (still encoded)
+        """
+
+        index = range(len(self))[index]  # raises IndexError if out of range
+        return bytes(
+            self.buffer[self.offsets[index]:self.offsets[index + 1]]
+        )
+
+    def extend(self, strings):
+        """
+        :param strings: [] of str
+            Strings to append
+        :return: void
+            Appends strings to buffer
+        """
+
+        self.extend_bytes(string.encode("utf-8") for string in strings)
+
+    def extend_bytes(self, strings):
+        """
+        :param strings: [] of bytes
+            Strings (already encoded) to append
+        :return: void
+            Appends strings to buffer
+        """
+
+        for string in strings:
+            self.buffer += string
+            self.offsets.append(len(self.buffer))
+
+    def take(self, rows):
+        """
+        :param rows: [] of int
+            Indexes of strings
+        :return: PackedStrings
+            Just strings at rows (in this order)
+        """
+
+        strings = PackedStrings()
+        strings.extend_bytes(self.get_bytes(row) for row in rows)
+        return strings
+
+    def to_arrays(self):
+        """
+        :return: tuple (numpy array of uint8, numpy array of uint64)
+            Buffer and offsets (e.g to save them)
+        """
+
+        return np.frombuffer(bytes(self.buffer), dtype=np.uint8), \
+            np.array(self.offsets, dtype=np.uint64)
+
+    @classmethod
+    def from_arrays(cls, buffer, offsets):
+        """
+        :param buffer: numpy array of uint8
+            Strings packed
+        :param offsets: numpy array of uint64
+            Where each string starts (and end)
+        :return: PackedStrings
+            Strings (e.g saved before)
+        """
+
+        strings = cls()
+        strings.buffer = bytearray(np.asarray(buffer, np.uint8).tobytes())
+        strings.offsets = array("Q", np.asarray(offsets, np.uint64).tolist())
+        return strings
+
+
+class TransactionsTable:
+    """ Transactions stored as columns, just as parsed: each one is built
+    only when asked for (the same object is given back while it is used
+    somewhere), and its raw data is kept in raw records """
+
+    def __init__(self, raw_records=None):
+        """
+        :param raw_records: RawRecords
+            Where raw data of transactions is kept
+        """
+
+        self.raw_records = raw_records if raw_records is not None \
+            else RawRecords()
+        self.symbols = []  # coins of transactions (indexed by coin columns)
+        self.keys = []  # keys of raw data of commissions in their records
+        self.ids = PackedStrings()  # ids in raw data (see get_ids_key)
+        self.columns = {
+            name: np.empty(0, dtype=dtype)
+            for name, dtype in TABLE_COLUMNS.items()
+        }
+        self._batches = []  # columns added and not yet joined to others
+        self._built = weakref.WeakValueDictionary()  # row -> transaction
+        # built and still alive
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_built"]  # built again when needed
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._built = weakref.WeakValueDictionary()
+
+    def __len__(self):
+        return len(self.columns["dates"]) + sum(
+            len(batch["dates"]) for batch in self._batches
+        )
+
+    def __getitem__(self, row):
+        if isinstance(row, slice):
+            return [self[i] for i in range(*row.indices(len(self)))]
+
+        row = range(len(self))[row]  # raises IndexError if out of range
+        transaction = self._built.get(row)
+        if transaction is None:
+            transaction = self._build(row)
+            self._built[row] = transaction
+        return transaction
+
+    def __iter__(self):
+        for row in range(len(self)):
+            yield self[row]
+
+    def _build(self, row):
+        """
+        :param row: int
+            Row of transaction
+        :return: Transaction
+            Transaction built from columns of row
+        """
+
+        columns = self.get_columns()
+        coin_buy, coin_sell, coin_fee = [
+            self._get_coin_amount(columns, name, row)
+            for name in ["buy", "sell", "fee"]
+        ]
+        commission = None
+        if columns["has_fee"][row]:
+            key = int(columns["fee_key"][row])
+            commission = Commission.from_record(
+                self.raw_records, int(columns["fee_raw"][row]), coin_fee,
+                unix_timestamp_ns_to_datetime(columns["fee_dates"][row]),
+                bool(columns["fee_successful"][row]),
+                key=self.keys[key] if key != NO_KEY else None
+            )
+
+        return Transaction.from_record(
+            self.raw_records, int(columns["raw"][row]), coin_buy, coin_sell,
+            unix_timestamp_ns_to_datetime(columns["dates"][row]),
+            TransactionType(int(columns["types"][row])),
+            bool(columns["successful"][row]), commission
+        )
+
+    def _get_coin_amount(self, columns, name, row):
+        """
+        :param columns: {} of str -> numpy array
+            Columns of table
+        :param name: str
+            Name of coin amount (buy, sell or fee)
+        :param row: int
+            Row of transaction
+        :return: CoinAmount
+            Coin amount (None if missing)
+        """
+
+        coin = int(columns[name + "_coin"][row])
+        if coin == NO_AMOUNT:
+            return None
+
+        return CoinAmount.from_float(
+            self.symbols[coin] if coin >= 0 else None,
+            float(columns[name + "_amount"][row]),
+            bool(columns[name + "_in"][row])
+        )
+
+    def _get_codes(self, coin_amounts):
+        """
+        :param coin_amounts: [] of CoinAmount
+            Coins moved (or None)
+        :return: tuple ([] of int, [] of float, [] of bool)
+            Index of symbol (NO_AMOUNT if coin amount is None, NO_SYMBOL if
+            it has no symbol), amount (NaN if None) and direction of each
+            one. New symbols are added to table.
+        """
+
+        symbols = {symbol: i for i, symbol in enumerate(self.symbols)}
+        coins, amounts, directions = [], [], []
+        for coin_amount in coin_amounts:
+            if coin_amount is None:
+                coins.append(NO_AMOUNT)
+                amounts.append(np.nan)
+                directions.append(False)
+                continue
+
+            if coin_amount.coin:
+                symbol = str(coin_amount.coin)
+                if symbol not in symbols:
+                    symbols[symbol] = len(self.symbols)
+                    self.symbols.append(symbol)
+                coins.append(symbols[symbol])
+            else:
+                coins.append(NO_SYMBOL)
+            amounts.append(
+                np.nan if coin_amount.amount is None else coin_amount.amount
+            )
+            directions.append(coin_amount.is_in)
+        return coins, amounts, directions
+
+    def _get_key(self, raw, fee_raw):
+        """
+        :param raw: {}
+            Raw record of transaction
+        :param fee_raw: {}
+            Raw data of its commission
+        :return: int
+            Index of key of raw record with raw data of commission (NO_KEY
+            if it is the whole record). New keys are added to table.
+        """
+
+        if fee_raw is raw:
+            return NO_KEY
+
+        for key, value in raw.items():
+            if value is fee_raw:
+                if key not in self.keys:
+                    self.keys.append(key)
+                return self.keys.index(key)
+
+        raise ValueError("Raw data of commission is not in its record")
+
+    def add_transactions(self, transactions, rows):
+        """
+        :param transactions: [] of Transaction
+            Transactions parsed (with their raw data)
+        :param rows: [] of int
+            Index of raw record of each transaction in raw records of table
+        :return: void
+            Appends transactions to table
+        """
+
+        commissions = [transaction.commission for transaction in transactions]
+        batch = {
+            "dates": [
+                datetime_to_unix_timestamp_ns(transaction.date)
+                for transaction in transactions
+            ],
+            "types": [
+                transaction.transaction_type.value
+                for transaction in transactions
+            ],
+            "successful": [
+                transaction.successful for transaction in transactions
+            ],
+            "raw": rows,
+            "has_fee": [fee is not None for fee in commissions]
+        }
+        coins_buy, coins_sell = \
+            [transaction.coin_buy for transaction in transactions], \
+            [transaction.coin_sell for transaction in transactions]
+        for name, coin_amounts in [
+                ("buy", coins_buy), ("sell", coins_sell),
+                ("fee", [fee.coin if fee else None for fee in commissions])]:
+            batch[name + "_coin"], batch[name + "_amount"], \
+                batch[name + "_in"] = self._get_codes(coin_amounts)
+
+        batch["fee_dates"] = [
+            datetime_to_unix_timestamp_ns(fee.date) if fee else 0
+            for fee in commissions
+        ]
+        batch["fee_successful"] = [
+            fee.successful if fee else False for fee in commissions
+        ]
+        batch["fee_raw"] = [
+            row if fee else 0 for row, fee in zip(rows, commissions)
+        ]
+        batch["fee_key"] = [
+            self._get_key(transaction.raw, fee.raw) if fee else NO_KEY
+            for transaction, fee in zip(transactions, commissions)
+        ]
+        self.ids.extend(
+            get_ids_key(transaction.raw) for transaction in transactions
+        )
+        self._batches.append({
+            name: np.array(batch[name], dtype=dtype)
+            for name, dtype in TABLE_COLUMNS.items()
+        })
+
+    def _get_indices(self, values, table_values, missing):
+        """
+        :param values: [] of str
+            Symbols or keys (None if missing)
+        :param table_values: [] of str
+            Symbols or keys of table
+        :param missing: int
+            Index of missing values
+        :return: numpy array of int
+            Index of each value in table values (missing if None). New values
+            are added to table.
+        """
+
+        indices = {value: i for i, value in enumerate(table_values)}
+        for value in values:
+            if value is not None and value not in indices:
+                indices[value] = len(table_values)
+                table_values.append(value)
+        indices[None] = missing
+        return np.array([indices[value] for value in values], dtype=np.int32)
+
+    def add_columns(self, columns, rows):
+        """
+        :param columns: {} of str -> numpy array
+            Columns of transactions parsed (with symbols of coins and keys of
+            commissions instead of their index, None if missing), and "ids"
+            in raw data of each one
+        :param rows: [] of int
+            Index of raw record of each transaction in raw records of table
+        :return: void
+            Appends transactions to table, without building any of them
+        """
+
+        has_fee = np.asarray(columns["has_fee"], dtype=bool)
+        batch = dict(columns)
+        for name, missing in [
+                ("buy", NO_AMOUNT), ("sell", NO_AMOUNT), ("fee", NO_SYMBOL)]:
+            batch[name + "_coin"] = self._get_indices(
+                columns[name + "_coin"], self.symbols, missing
+            )
+        batch["fee_coin"] = np.where(has_fee, batch["fee_coin"], NO_AMOUNT)
+        batch["fee_key"] = self._get_indices(
+            columns["fee_key"], self.keys, NO_KEY
+        )
+        batch["raw"] = np.asarray(rows, dtype=np.int64)
+        batch["fee_raw"] = np.where(has_fee, batch["raw"], 0)
+        self.ids.extend(columns["ids"])
+        self._batches.append({
+            name: np.asarray(batch[name], dtype=dtype)
+            for name, dtype in TABLE_COLUMNS.items()
+        })
+
+    def get_columns(self):
+        """
+        :return: {} of str -> numpy array
+            Columns of table (see TABLE_COLUMNS), one row for each
+            transaction
+        """
+
+        if self._batches:  # joined just once, when needed
+            self.columns = {
+                name: np.concatenate(
+                    [self.columns[name]] +
+                    [batch[name] for batch in self._batches]
+                ) for name in TABLE_COLUMNS
+            }
+            self._batches = []
+        return self.columns
+
+    def get_store(self):
+        """
+        :return: TransactionStore
+            Columns of balances of transactions in table
+        """
+
+        columns = self.get_columns()
+        ids = np.array([
+            COINS_REGISTRY.get_id(symbol) for symbol in self.symbols
+        ] + [NO_COIN], dtype=np.int32)  # last one for missing coins
+        coins = np.stack([
+            columns["buy_coin"], columns["sell_coin"],
+            np.where(columns["has_fee"], columns["fee_coin"], NO_AMOUNT)
+        ], axis=1)
+        amounts = np.stack([
+            columns["buy_amount"], columns["sell_amount"],
+            columns["fee_amount"]
+        ], axis=1)
+
+        store = TransactionStore()
+        store.coins = ids[np.where(coins >= 0, coins, len(self.symbols))]
+        store.amounts = np.where(
+            (coins >= 0) & ~np.isnan(amounts), amounts, 0.0
+        )
+        store.dates = columns["dates"]
+        store.types = columns["types"]
+        store.successful = columns["successful"]
+        return store
+
+    def take(self, rows):
+        """
+        :param rows: [] of int
+            Rows of transactions
+        :return: TransactionsTable
+            Table with just transactions in rows (in this order), sharing raw
+            records with this one
+        """
+
+        rows = np.asarray(rows, dtype=np.int64)
+        table = TransactionsTable(self.raw_records)
+        table.symbols, table.keys = list(self.symbols), list(self.keys)
+        table.ids = self.ids.take(rows.tolist())
+        table.columns = {
+            name: column[rows] for name, column in self.get_columns().items()
+        }
+        return table
+
+    @classmethod
+    def from_columns(cls, columns, symbols, keys, ids, raw_records):
+        """
+        :param columns: {} of str -> numpy array
+            Columns of table (see get_columns)
+        :param symbols: [] of str
+            Coins indexed by coin columns
+        :param keys: [] of str
+            Keys indexed by key column
+        :param ids: PackedStrings
+            Ids in raw data of each transaction
+        :param raw_records: RawRecords
+            Raw data of transactions
+        :return: TransactionsTable
+            Table (e.g saved before)
+        """
+
+        table = cls(raw_records)
+        table.symbols, table.keys = list(symbols), list(keys)
+        table.ids = ids
+        table.columns = {
+            name: np.asarray(columns[name], dtype=dtype)
+            for name, dtype in TABLE_COLUMNS.items()
+        }
+        return table
+
+
+class TransactionRows:
+    """ Transactions kept as rows of the sequences they are in (e.g table of
+    exchange): each one is got from its sequence only when indexed """
+
+    def __init__(self):
+        self.sources = []  # sequences of transactions
+        self.objects = []  # transactions added without their sequence
+        self.source_ids = np.empty(0, dtype=np.int32)  # sequence of each
+        self.rows = np.empty(0, dtype=np.int64)  # row in its sequence
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+
+        index = range(len(self))[index]  # raises IndexError if out of range
+        return self.sources[self.source_ids[index]][int(self.rows[index])]
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def __eq__(self, other):
+        try:
+            return list(self) == list(other)
+        except TypeError:
+            return NotImplemented
+
+    __hash__ = None  # mutable
+
+    def _get_source(self, transactions):
+        """
+        :param transactions: [] of Transaction or TransactionsTable
+            Sequence of transactions
+        :return: int
+            Index of sequence in sources (added if missing)
+        """
+
+        for i, source in enumerate(self.sources):
+            if source is transactions:
+                return i
+
+        self.sources.append(transactions)
+        return len(self.sources) - 1
+
+    def add(self, transactions, rows=None):
+        """
+        :param transactions: [] of Transaction or TransactionsTable
+            Sequence of transactions
+        :param rows: [] of int
+            Rows of transactions to append (if None, all transactions are
+            appended, keeping just a reference to each one)
+        :return: void
+            Appends transactions at rows, in this order
+        """
+
+        if rows is None:
+            rows = np.arange(len(transactions)) + len(self.objects)
+            self.objects.extend(transactions)
+            transactions = self.objects
+        rows = np.asarray(rows, dtype=np.int64)
+        self.source_ids = np.concatenate((
+            self.source_ids,
+            np.full(len(rows), self._get_source(transactions), dtype=np.int32)
+        ))
+        self.rows = np.concatenate((self.rows, rows))
+
+    def reorder(self, order):
+        """
+        :param order: numpy array of int
+            New position -> old position of each transaction
+        :return: void
+            Sorts transactions in this order
+        """
+
+        self.source_ids, self.rows = self.source_ids[order], self.rows[order]
+
+
+def merge_rows(rows, dates, new_rows, new_dates):
+    """
+    :param rows: numpy array of int64
+        Rows sorted by date
+    :param dates: numpy array of int64
+        Date of each row (sorted)
+    :param new_rows: numpy array of int64
+        Rows to add, sorted by date
+    :param new_dates: numpy array of int64
+        Date of each row to add (sorted)
+    :return: tuple (numpy array of int64, numpy array of int64)
+        All rows sorted by date and their dates. Rows added go after rows
+        with the same date.
+    """
+
+    if not len(dates) or new_dates[0] >= dates[-1]:  # just append
+        return np.concatenate((rows, new_rows)), \
+               np.concatenate((dates, new_dates))
+
+    positions = np.searchsorted(dates, new_dates, side="right")
+    return np.insert(rows, positions, new_rows), \
+           np.insert(dates, positions, new_dates)
+
+
+class DatesIndex:
+    """ Rows of store sorted by date: all of them, by coin and by type.
+    Rows with the same date keep the order they have been added in. """
+
+    def __init__(self):
+        self.size = 0  # number of rows indexed
+        self.rows = np.empty(0, dtype=np.int64)  # sorted by date
+        self.dates = np.empty(0, dtype=np.int64)  # date of each row
+        self.by_coin = {}  # coin id -> (rows, dates) sorted by date
+        self.by_type = {}  # type code -> (rows, dates) sorted by date
+
+    def _add_groups(self, groups, keys, rows, dates):
+        """
+        :param groups: {} of int -> tuple (numpy array, numpy array)
+            Rows and dates of each key
+        :param keys: numpy array of int
+            Key of each row to add
+        :param rows: numpy array of int64
+            Rows to add, sorted by date
+        :param dates: numpy array of int64
+            Date of each row to add
+        :return: void
+            Merges rows into the ones of their key
+        """
+
+        by_key = np.argsort(keys, kind="stable")  # keeps dates sorted
+        keys, rows, dates = keys[by_key], rows[by_key], dates[by_key]
+        splits = np.flatnonzero(np.diff(keys)) + 1
+        for key, key_rows, key_dates in zip(
+                keys[np.concatenate(([0], splits))].tolist(),
+                np.split(rows, splits), np.split(dates, splits)):
+            if key in groups:
+                groups[key] = merge_rows(*groups[key], key_rows, key_dates)
+            else:
+                groups[key] = (key_rows, key_dates)
+
+    def update(self, store):
+        """
+        :param store: TransactionStore
+            Store indexed (rows can only be appended to it)
+        :return: void
+            Adds to index rows appended to store since last update
+        """
+
+        if self.size >= len(store):
+            return
+
+        by_date = np.argsort(store.dates[self.size:], kind="stable")
+        rows = by_date + self.size
+        dates = store.dates[rows]
+        self.rows, self.dates = merge_rows(self.rows, self.dates, rows, dates)
+        self._add_groups(
+            self.by_type, store.types[rows].astype(np.int64), rows, dates
+        )
+
+        coins = store.coins[rows]
+        is_new = np.ones(coins.shape, dtype=bool)  # coin not already in row
+        is_new[:, 1] = coins[:, 1] != coins[:, 0]
+        is_new[:, 2] = (coins[:, 2] != coins[:, 0]) & \
+                       (coins[:, 2] != coins[:, 1])
+        is_new &= coins != NO_COIN
+        positions, columns = np.nonzero(is_new)  # sorted by date
+        self._add_groups(
+            self.by_coin, coins[positions, columns].astype(np.int64),
+            rows[positions], dates[positions]
+        )
+        self.size = len(store)
+
+    def get_between(self, since=None, until=None):
+        """
+        :param since: int
+            First date (epoch ns) included (no limit if None)
+        :param until: int
+            Last date (epoch ns) included (no limit if None)
+        :return: numpy array of int64
+            Rows with date in range, sorted by date
+        """
+
+        start = 0 if since is None else \
+            np.searchsorted(self.dates, since, side="left")
+        end = len(self.dates) if until is None else \
+            np.searchsorted(self.dates, until, side="right")
+        return self.rows[start:end]
+
+    def get_by_coin(self, coin):
+        """
+        :param coin: int
+            Coin id
+        :return: numpy array of int64
+            Rows with coin bought, sold or paid as fee, sorted by date
+        """
+
+        return self.by_coin.get(coin, (self.rows[:0],))[0]
+
+    def get_by_type(self, transaction_type):
+        """
+        :param transaction_type: TransactionType
+            Type of transaction
+        :return: numpy array of int64
+            Rows of transactions of type, sorted by date
+        """
+
+        return self.by_type.get(transaction_type.value, (self.rows[:0],))[0]
@@ -4,11 +4,15 @@
 
 """ Core core """
 
+import json
+import os
+from array import array
+from collections import OrderedDict
 from enum import Enum
 
 import pytz
 
-from pyhodl.data.coins import Coin, CryptoCoin, FIAT_COINS
+from pyhodl.data.coins import COINS_REGISTRY
 
 
 class TransactionType(Enum):
@@ -23,14 +27,211 @@ class TransactionType(Enum):
     COMMISSION = 6
 
 
+# sign of coin bought, sold and paid as fee in balance, by transaction type
+DELTA_SIGNS = {
+    TransactionType.TRADING: (1.0, -1.0, -1.0),
+    TransactionType.DEPOSIT: (1.0, 0.0, 0.0),
+    TransactionType.WITHDRAWAL: (0.0, -1.0, 0.0),
+    TransactionType.COMMISSION: (0.0, 0.0, -1.0)
+}
+NO_DELTA_SIGNS = (0.0, 0.0, 0.0)
+ID_KEYS = ["id", "tid", "tradeId", "trade_id", "txId", "orderId"]  # raw ids
+DECODED_RECORDS = 256  # raw records kept decoded by each file
+
+
+def get_file_stamp(input_file):
+    """
+    :param input_file: str
+        Path to file
+    :return: tuple (int, float)
+        Size and modification time of file
+    """
+
+    stat = os.stat(input_file)
+    return stat.st_size, stat.st_mtime
+
+
+def get_ids_key(raw):
+    """
+    :param raw: {}
+        Raw data
+    :return: str
+        Value of each id key (see ID_KEYS) in raw data (empty if missing),
+        joined by "|"
+    """
+
+    return "|".join(str(raw.get(key, "")) for key in ID_KEYS)
+
+
+class RawRecords:
+    """ Raw exchange records of a file. Just offset and length of each
+    record in file are kept: records are read from file and decoded only
+    when asked for (the last ones decoded are kept). """
+
+    __slots__ = ("input_file", "starts", "lengths", "stamp", "kept",
+                 "_stream", "_decoded")
+
+    def __init__(self, input_file=None, stamp=None):
+        """
+        :param input_file: str
+            File records are in
+        :param stamp: tuple (int, float)
+            Size and modification time of file when spans of records have
+            been read (the current ones if None)
+        """
+
+        self.input_file = input_file
+        self.starts = array("Q")  # offset (bytes) of each record in file
+        self.lengths = array("Q")  # length (bytes) of each record
+        if stamp is None and input_file and os.path.exists(input_file):
+            stamp = get_file_stamp(input_file)
+        self.stamp = tuple(stamp) if stamp is not None else None
+        self.kept = {}  # index -> record not in file (e.g added later)
+        self._stream = None  # opened when first needed
+        self._decoded = OrderedDict()  # index -> record, last ones decoded
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __getstate__(self):  # file is opened again when needed
+        return self.input_file, self.starts, self.lengths, self.stamp, \
+            self.kept
+
+    def __setstate__(self, state):
+        self.input_file, self.starts, self.lengths, self.stamp, \
+            self.kept = state
+        self._stream = None
+        self._decoded = OrderedDict()
+
+    def add(self, start, length):
+        """
+        :param start: int
+            Offset (bytes) of record in file
+        :param length: int
+            Length (bytes) of record
+        :return: int
+            Index of record
+        """
+
+        self.starts.append(start)
+        self.lengths.append(length)
+        return len(self) - 1
+
+    def keep(self, raw):
+        """
+        :param raw: {}
+            Raw record not in file (e.g of a transaction added later)
+        :return: int
+            Index of record, kept in memory
+        """
+
+        index = self.add(0, 0)
+        self.kept[index] = raw
+        return index
+
+    def _read(self, index):
+        """
+        :param index: int
+            Index of record
+        :return: {}
+            Raw record, read from file (kept open)
+        """
+
+        if self.stamp is not None and \
+                get_file_stamp(self.input_file) != self.stamp:
+            self.close()
+            raise ValueError(
+                self.input_file + " has changed since it has been parsed"
+            )  # offsets are no more valid
+
+        if self._stream is None:
+            self._stream = open(self.input_file, "rb")
+        self._stream.seek(self.starts[index])
+        return json.loads(
+            self._stream.read(self.lengths[index]).decode("utf-8")
+        )
+
+    def get(self, index, key=None):
+        """
+        :param index: int
+            Index of record
+        :param key: str
+            If set, just value of this key of record is returned
+        :return: {}
+            Raw record (exactly as in file)
+        """
+
+        if index in self.kept:
+            raw = self.kept[index]
+        elif index in self._decoded:
+            raw = self._decoded[index]
+            self._decoded.move_to_end(index)
+        else:
+            raw = self._read(index)
+            self._decoded[index] = raw
+            if len(self._decoded) > DECODED_RECORDS:
+                self._decoded.popitem(last=False)
+        return raw if key is None else raw[key]
+
+    def close(self):
+        """
+        :return: void
+            Closes file (opened again when needed)
+        """
+
+        if self._stream is not None:
+            self._stream.close()
+            self._stream = None
+
+    @classmethod
+    def from_arrays(cls, input_file, starts, lengths, stamp=None):
+        """
+        :param input_file: str
+            File records are in
+        :param starts: [] of int
+            Offset (bytes) of each record in file
+        :param lengths: [] of int
+            Length (bytes) of each record
+        :param stamp: tuple (int, float)
+            Size and modification time of file when records have been read
+        :return: RawRecords
+            Records (e.g saved before)
+        """
+
+        records = cls(input_file, stamp)
+        records.starts = array("Q", starts)
+        records.lengths = array("Q", lengths)
+        return records
+
+
 class CoinAmount:
     """ Amount of coin """
 
+    __slots__ = ("coin", "amount", "is_in")
+
     def __init__(self, coin, amount, is_in):
-        self.coin = Coin(coin) if coin else None
+        self.coin = COINS_REGISTRY.get_coin(coin) if coin else None
         self.amount = float(amount) if amount else None
         self.is_in = bool(is_in) if is_in else False
 
+    @staticmethod
+    def from_float(coin, amount, is_in):
+        """
+        :param coin: str
+            Coin moved
+        :param amount: float
+            Amount moved (NaN if missing), kept even if 0
+        :param is_in: bool
+            True iff coin is gained
+        :return: CoinAmount
+            Amount of coin
+        """
+
+        coin_amount = CoinAmount(coin, None, is_in)
+        if amount == amount:  # not NaN
+            coin_amount.amount = float(amount)
+        return coin_amount
+
     def get_symbol(self):
         """
         :return: Coin
@@ -38,9 +239,7 @@ class CoinAmount:
         """
 
         if self.coin:
-            if self.coin in FIAT_COINS:
-                return self.coin
-            return CryptoCoin(self.coin.symbol)
+            return self.coin  # already fiat Coin or CryptoCoin
         return False
 
     def get_amount(self):
@@ -62,6 +261,10 @@ class CoinAmount:
 class Transaction:
     """ Exchange transaction """
 
+    __slots__ = ("_raw", "_raw_key", "raw_records", "coin_buy", "coin_sell",
+                 "transaction_type", "date", "successful", "commission",
+                 "deltas", "__weakref__")
+
     def __init__(self, raw_dict, coin_in, coin_out, date,
                  trans_type=TransactionType.TRADING,
                  successful=True, commission=None):
@@ -78,13 +281,88 @@ class Transaction:
             Commission of transaction (if any)
         """
 
-        self.raw = raw_dict
+        self.raw_records = None  # raw dict is kept as it is
+        self._raw = raw_dict
+        self._raw_key = None
         self.coin_buy = coin_in
         self.coin_sell = coin_out
         self.transaction_type = trans_type
         self.date = pytz.utc.localize(date) if not date.tzinfo else date
         self.successful = bool(successful)
         self.commission = commission
+        self.deltas = self._get_deltas()
+
+    @classmethod
+    def from_record(cls, raw_records, index, *args, key=None, **kwargs):
+        """
+        :param raw_records: RawRecords
+            Records where raw data is already stored
+        :param index: int
+            Index of raw data in records
+        :param args: []
+            Other arguments of constructor (after raw data)
+        :param key: str
+            If set, raw data is just the value of this key of record (e.g
+            network data of a Coinbase transaction, for its commission)
+        :param kwargs: {}
+            Other keyword arguments of constructor
+        :return: Transaction
+            Transaction whose raw data is decoded from records only when
+            needed
+        """
+
+        transaction = cls(None, *args, **kwargs)
+        transaction.raw_records, transaction._raw = raw_records, index
+        transaction._raw_key = key
+        return transaction
+
+    def __setstate__(self, state):
+        slots = state[1] if isinstance(state, tuple) else state
+        for key, value in slots.items():
+            setattr(self, key, value)
+        self.deltas = self._get_deltas()  # coin ids of this process
+
+    def _get_deltas(self):
+        """
+        :return: {} of int -> float
+            Coin id -> amount of coin gained (or lost if negative), for each
+            coin bought, sold or paid as fee
+        """
+
+        coin_fee = self.commission.coin if self.commission else None
+        signs = DELTA_SIGNS.get(self.transaction_type, NO_DELTA_SIGNS)
+        deltas = {}
+        for coin, sign in zip((self.coin_buy, self.coin_sell, coin_fee),
+                              signs):
+            symbol = coin.get_symbol() if coin else None
+            if symbol:
+                delta = deltas.get(symbol.id, 0.0)
+                if sign:
+                    delta += sign * (coin.get_amount() or 0.0)
+                deltas[symbol.id] = delta
+        return deltas
+
+    @property
+    def raw(self):
+        """
+        :return: {}
+            Raw data (decoded from records if not kept in memory)
+        """
+
+        if self.raw_records is not None:
+            return self.raw_records.get(self._raw, self._raw_key)
+        return self._raw
+
+    def get_ids(self):
+        """
+        :return: {} of str -> *
+            Ids (e.g trade id, tx id) found in raw data
+        """
+
+        raw = self.raw
+        return {
+            key: raw[key] for key in ID_KEYS if key in raw
+        }
 
     def get_attrs(self):
         """
@@ -187,6 +465,20 @@ class Transaction:
             amount -= self.commission.coin.get_amount()
         return amount
 
+    def get_amount_fee(self, coin):
+        """
+        :param coin: Coin
+            Coin to get
+        :return: float
+            Amount of coin paid as fee (positive), either on a trade or as a
+            standalone commission
+        """
+
+        if (self.is_trade() or self.is_fee()) and self.commission and \
+                self.commission.coin.get_symbol() == coin:
+            return self.commission.coin.get_amount() or 0.0
+        return 0.0
+
     def get_amount_moved(self, coin):
         """
         :param coin: Coin
@@ -213,26 +505,16 @@ class Transaction:
             Amount of coin in transaction
         """
 
-        amount = self.get_amount_traded(coin)
-        amount += self.get_amount_commission(coin)
-        amount += self.get_amount_moved(coin)
-        return amount
+        return self.deltas.get(COINS_REGISTRY.find_id(coin), 0.0)
 
     def get_coins(self):
         """
-        :return: tuple (str, str, str)
-            Coin buy, coin sell and coin fee
+        :return: set of str
+            Symbols of coin buy, coin sell and coin fee
         """
 
-        coin_buy, coin_sell, coin_fee = self.coin_buy, self.coin_sell, None
-
-        if self.commission:
-            coin_fee = self.commission.coin
-
-        coins = [coin_buy, coin_sell, coin_fee]
-        coins = [coin.get_symbol() for coin in coins if coin]  # only valid
         return {
-            coin.symbol for coin in coins if coin  # get only symbol
+            COINS_REGISTRY.get_symbol(coin_id) for coin_id in self.deltas
         }
 
     def __getitem__(self, key):
@@ -254,6 +536,8 @@ class Transaction:
 class Commission(Transaction):
     """ Transaction commission """
 
+    __slots__ = ("coin",)
+
     def __init__(self, raw_dict, coin, date, successful=True):
         """
         :param raw_dict: {}
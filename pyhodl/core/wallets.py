@@ -4,7 +4,6 @@
 
 """ Wallets """
 
-from bisect import bisect
 from datetime import datetime
 
 import numpy as np
@@ -13,16 +12,85 @@ from pyhodl.api.price.factory import get_price_on_date
 from pyhodl.config import VALUE_KEY, DATE_TIME_KEY
 from pyhodl.data.coins import is_crypto
 from pyhodl.data.tables import get_coin_prices_table
-from pyhodl.utils.misc import is_nan
+from pyhodl.utils.dates import datetime_to_unix_timestamp_ns, \
+    unix_timestamp_ns_to_datetime, dates_to_ns_array, ns_array_to_dates, \
+    get_buckets
+from pyhodl.utils.misc import to_units, from_units, get_ohlc
+from .store import TransactionRows
+from .transactions import TransactionType
+
+PRICES_ERRORS = (
+    OSError, ValueError, KeyError, TypeError
+)  # prices table cannot be read, or has no price of coin on date
+FLOW_TYPES = [
+    TransactionType.DEPOSIT.value, TransactionType.WITHDRAWAL.value
+]  # codes of types of transactions moving coins in or out of wallet
 
 
 class Wallet:
     """ A general wallet, tracking addition, deletions and fees """
 
-    def __init__(self, base_currency):
+    def __init__(self, base_currency, decimals=None):
+        """
+        :param base_currency: str
+            Coin of wallet
+        :param decimals: int
+            If set, amounts are kept as exact integer number of smallest
+            units of coin (with this number of decimals), else as floats
+        """
+
         self.base_currency = base_currency  # todo use Coin()
-        self.transactions = []  # list of operations performed
-        self.is_sorted = False
+        self.decimals = decimals
+        self.transactions = TransactionRows()  # operations performed (by
+        # date), got from their exchange only when indexed
+        self.size = 0  # number of transactions
+        self._dates = np.empty(0, dtype=np.int64)  # epoch ns
+        self._types = np.empty(0, dtype=np.uint8)  # code of type
+        self._deltas = np.empty(
+            0, dtype=np.float64 if decimals is None else np.int64
+        )  # delta by transaction
+        self._totals = np.empty(0, dtype=self._deltas.dtype)  # prefix sums
+        self.opening = self._deltas.dtype.type(0)  # balance before first
+        self.opening_date = None  # date (epoch ns) of opening balance
+        self.version = 0  # incremented at every change
+
+    @property
+    def dates_array(self):
+        """
+        :return: numpy array of int64
+            Date (epoch ns) of each transaction, sorted
+        """
+
+        return self._dates[:self.size]
+
+    @property
+    def types(self):
+        """
+        :return: numpy array of uint8
+            Code of type (see TransactionType) of each transaction, sorted by
+            date
+        """
+
+        return self._types[:self.size]
+
+    @property
+    def deltas(self):
+        """
+        :return: numpy array
+            Delta (as stored by wallet) of each transaction, sorted by date
+        """
+
+        return self._deltas[:self.size]
+
+    @property
+    def totals(self):
+        """
+        :return: numpy array
+            Balance (as stored by wallet) after each transaction, sorted by
+            date
+        """
+
+        return self._totals[:self.size]
 
     def is_crypto(self):
         """
@@ -32,17 +100,55 @@ class Wallet:
 
         return is_crypto(self.base_currency)
 
-    def _sort_transactions(self):
+    def set_opening(self, balance, date):
+        """
+        :param balance: float
+            Balance (in coins) before transactions of wallet, e.g from a
+            checkpoint
+        :param date: int
+            Date (epoch ns) of balance
+        :return: void
+            Starts running balance from it
+        """
+
+        if self.decimals is not None:
+            balance = to_units(balance, self.decimals)
+        self.opening = self._deltas.dtype.type(balance)
+        self.opening_date = int(date)
+        self._update_totals(0)
+        self.version += 1
+
+    def _reserve(self, size):
         """
+        :param size: int
+            Number of transactions to make room for
         :return: void
-            Sort transactions by date
+            Grows arrays (doubling capacity) so that appends are amortized
         """
 
-        if not self.is_sorted:
-            self.transactions = sorted(
-                self.transactions, key=lambda x: x.date
-            )  # sort by date
-            self.is_sorted = True
+        capacity = len(self._dates)
+        if size <= capacity:
+            return
+
+        capacity = max(size, 2 * capacity, 16)
+        for name in ["_dates", "_types", "_deltas", "_totals"]:
+            old = getattr(self, name)
+            new = np.empty(capacity, dtype=old.dtype)
+            new[:self.size] = old[:self.size]
+            setattr(self, name, new)
+
+    def _update_totals(self, start):
+        """
+        :param start: int
+            First transaction whose balance has changed
+        :return: void
+            Recomputes running balance from start on
+        """
+
+        last = self._totals[start - 1] if start > 0 else self.opening
+        self._totals[start:self.size] = np.cumsum(
+            np.concatenate(([last], self._deltas[start:self.size]))
+        )[1:]  # same summation order as whole cumsum
 
     def add_transaction(self, transaction):
         """
@@ -52,8 +158,85 @@ class Wallet:
             Adds amount to balance
         """
 
-        self.transactions.append(transaction)
-        self.is_sorted = False
+        delta = transaction.get_amount(self.base_currency)
+        if self.decimals is not None:
+            delta = to_units(delta, self.decimals)
+
+        self.add_transactions(
+            [transaction],
+            [datetime_to_unix_timestamp_ns(transaction.date)],
+            [delta]
+        )
+
+    def add_transactions(self, transactions, dates, deltas, types=None,
+                         rows=None):
+        """
+        :param transactions: [] of Transaction or TransactionsTable
+            Transactions
+        :param dates: [] of int
+            Date (epoch ns) of each transaction
+        :param deltas: [] of float (or int if wallet has decimals)
+            Amount (or units) of wallet coin moved by each transaction
+        :param types: [] of int
+            Code of type of each transaction (read from transactions if None)
+        :param rows: [] of int
+            If set, just transactions at these rows are added (in this
+            order): they are kept as rows, and built only when indexed
+        :return: void
+            Adds amounts to balance, keeping transactions sorted by date.
+            Transactions newer than the ones in wallet are just appended;
+            older ones are merged in (ties keep order of insertion).
+        """
+
+        if rows is None:
+            transactions = list(transactions)
+        dates = np.asarray(dates, dtype=np.int64)
+        deltas = np.asarray(deltas, dtype=self._deltas.dtype)
+        if not len(dates):
+            return
+
+        if types is None:
+            types = [
+                transactions[row].transaction_type.value
+                for row in (range(len(dates)) if rows is None else rows)
+            ]
+        types = np.asarray(types, dtype=np.uint8)
+
+        start = self.size
+        self.transactions.add(transactions, rows)
+        added = None  # position of each one added (if not in order)
+        if np.any(dates[1:] < dates[:-1]):
+            added = start + np.argsort(dates, kind="stable")
+            dates, types, deltas = \
+                dates[added - start], types[added - start], \
+                deltas[added - start]
+
+        if start and dates[0] < self._dates[start - 1]:  # merge
+            positions = np.searchsorted(self.dates_array, dates, side="right")
+            self.transactions.reorder(np.insert(
+                np.arange(start), positions,
+                start + np.arange(len(dates)) if added is None else added
+            ))
+            new_dates = np.insert(self.dates_array, positions, dates)
+            new_types = np.insert(self.types, positions, types)
+            new_deltas = np.insert(self.deltas, positions, deltas)
+            start = int(positions[0])
+        else:  # append
+            if added is not None:
+                self.transactions.reorder(
+                    np.concatenate((np.arange(start), added))
+                )
+            new_dates, new_types, new_deltas = dates, types, deltas
+
+        size = len(self.transactions)
+        self._reserve(size)
+        offset = size - len(new_dates)
+        self._dates[offset:size] = new_dates
+        self._types[offset:size] = new_types
+        self._deltas[offset:size] = new_deltas
+        self.size = size
+        self._update_totals(start)
+        self.version += 1
 
     def dates(self):
         """
@@ -61,10 +244,41 @@ class Wallet:
             List of all dates
         """
 
-        self._sort_transactions()
-        return [
-            transaction.date for transaction in self.transactions
-        ]
+        return ns_array_to_dates(self.dates_array)
+
+    def _to_amounts(self, values):
+        """
+        :param values: numpy array or number
+            Amounts as stored by wallet
+        :return: numpy array of float or float
+            Amounts of coin
+        """
+
+        if self.decimals is None:
+            return values
+        return from_units(values, self.decimals)
+
+    def _get_changes(self):
+        """
+        :return: tuple (numpy array, numpy array)
+            Indexes of transactions that actually changed balance and
+            balance after each of them (as stored by wallet)
+        """
+
+        changes = np.nonzero(self.deltas)[0]
+        return changes, self.totals[changes]
+
+    def _get_last_change(self):
+        """
+        :return: int
+            Index of last transaction that actually changed balance (None if
+            there is none)
+        """
+
+        for i in range(self.size - 1, -1, -1):
+            if self._deltas[i]:
+                return i
+        return None
 
     def balance(self, currency=None, now=False):
         """
@@ -72,9 +286,11 @@ class Wallet:
             Balance up to date with last transaction
         """
 
-        subtotals = self.get_balance_by_transaction()
-        if subtotals:
-            total = subtotals[-1][VALUE_KEY]  # amount of coins
+        last = self._get_last_change()
+        if last is not None or self.opening:
+            total = float(self._to_amounts(
+                self._totals[last] if last is not None else self.opening
+            ))  # coins
 
             if now:  # convert to currency now
                 price = get_price_on_date(
@@ -84,7 +300,10 @@ class Wallet:
 
             if currency:  # convert to currency
                 return self.convert_to(
-                    subtotals[-1]["transaction"].date,
+                    unix_timestamp_ns_to_datetime(
+                        self._dates[last] if last is not None
+                        else self.opening_date
+                    ),
                     currency,
                     amount=total
                 )
@@ -92,6 +311,99 @@ class Wallet:
             return total
         return 0.0
 
+    def balances_on(self, dates):
+        """
+        :param dates: [] of datetime, numpy array of datetime64 or int64
+            List of dates
+        :return: numpy array of float
+            Balance (after all transactions up to date) on each date
+        """
+
+        after = np.searchsorted(
+            self.dates_array, dates_to_ns_array(dates), side="right"
+        )
+        totals = np.where(
+            after > 0, self.totals[np.maximum(after - 1, 0)], self.opening
+        ) if self.size else np.full(len(after), self.opening)
+        return np.asarray(self._to_amounts(totals), dtype=np.float64)
+
+    def balance_at(self, date_time, currency=None):
+        """
+        :param date_time: datetime
+            Date and time of balance
+        :param currency: str or None
+            Currency to convert balance to (with price on date)
+        :return: float
+            Balance after all transactions up to date
+        """
+
+        after = np.searchsorted(
+            self.dates_array, datetime_to_unix_timestamp_ns(date_time),
+            side="right"
+        )  # transactions up to date
+        total = float(self._to_amounts(
+            self._totals[after - 1] if after > 0 else self.opening
+        ))
+
+        if currency and total:
+            return self.convert_to(date_time, currency, amount=total)
+        return total
+
+    def balances_between(self, since, until):
+        """
+        :param since: datetime
+            Get balances since this date
+        :param until: datetime
+            Get balances until this date
+        :return: tuple (numpy array of int64, numpy array of float)
+            Date (epoch ns) of each transaction in between (extremes
+            included) and balance after it
+        """
+
+        start = np.searchsorted(
+            self.dates_array, datetime_to_unix_timestamp_ns(since),
+            side="left"
+        )
+        end = np.searchsorted(
+            self.dates_array, datetime_to_unix_timestamp_ns(until),
+            side="right"
+        )
+        return self.dates_array[start:end].copy(), np.asarray(
+            self._to_amounts(self.totals[start:end]), dtype=np.float64
+        )
+
+    def resample(self, freq, currency=None):
+        """
+        :param freq: str
+            Width of each bucket, written in short format (e.g 1h, 1d, 1w)
+        :param currency: str or None
+            Currency to convert balances to
+        :return: {} of str -> numpy array or {}
+            Start date (epoch ns) of each bucket ("date"), open, high, low
+            and close coin balance in each bucket ("balance") and value in
+            currency ("value", if currency is given; NaN if price is
+            missing)
+        """
+
+        if not self.size:
+            return {"date": np.empty(0, dtype=np.int64)}
+
+        starts = get_buckets(self.dates_array[0], self.dates_array[-1], freq)
+        samples = np.sort(
+            np.concatenate((starts, self.dates_array)), kind="stable"
+        )  # balance on start of each bucket and after each transaction
+        balances = self.balances_on(samples)
+        resampled = {
+            "date": starts,
+            "balance": get_ohlc(samples, balances, starts)
+        }
+
+        if currency:
+            values = self.convert_many(samples, currency, balances)
+            resampled["value"] = get_ohlc(samples, values, starts)
+
+        return resampled
+
     def convert_to(self, date_time, currency, amount=1.0):
         """
         :param date_time: datetime
@@ -101,15 +413,48 @@ class Wallet:
         :param amount: float
             Amount to convert
         :return: float
-            Amount of wallet base currency converted to currency
+            Amount of wallet base currency converted to currency (NaN if
+            price is missing)
         """
 
         try:
             prices_table = get_coin_prices_table(currency)
             val = prices_table.get_value_on(self.base_currency, date_time)
             return float(val) * amount
-        except:
-            return 0.0
+        except PRICES_ERRORS:
+            return np.nan
+
+    def convert_many(self, dates, currency, amounts=1.0):
+        """
+        :param dates: [] of datetime, numpy array of datetime64 or int64
+            Dates of conversion
+        :param currency: str
+            Currency to convert to
+        :param amounts: numpy array of float or float
+            Amount to convert on each date
+        :return: numpy array of float
+            Amounts of wallet base currency converted to currency, NaN where
+            price is missing (see get_missing_prices)
+        """
+
+        try:
+            prices = get_coin_prices_table(currency).get_values_on_dates_of(
+                self.base_currency, dates
+            )
+        except PRICES_ERRORS:
+            prices = np.full(len(dates), np.nan)
+        return prices * np.asarray(amounts, dtype=np.float64)
+
+    @staticmethod
+    def get_missing_prices(converted):
+        """
+        :param converted: numpy array of float
+            Amounts converted with convert_many
+        :return: numpy array of bool
+            True where conversion failed because price is missing
+        """
+
+        return np.isnan(converted)
 
     def get_price_on(self, dates, currency):
         """
@@ -118,12 +463,12 @@ class Wallet:
         :param currency: str
             Currency to get price
         :return: [] of float
-            List of price if coin converted to currency on those dates
+            List of price if coin converted to currency on those dates (0 if
+            price is missing)
         """
 
-        return [
-            self.convert_to(date, currency) for date in dates
-        ]
+        prices = self.convert_many(dates, currency)
+        return np.where(self.get_missing_prices(prices), 0.0, prices).tolist()
 
     def get_delta_by_transaction(self):
         """
@@ -131,16 +476,26 @@ class Wallet:
             List of delta balance by transaction
         """
 
-        self._sort_transactions()
-        data = []
-        for transaction in self.transactions:
-            delta = transaction.get_amount(self.base_currency)
-            if delta != 0.0:  # balance has actually changed
-                data.append({
-                    "transaction": transaction,
-                    VALUE_KEY: delta
-                })
-        return data
+        changes, _ = self._get_changes()
+        deltas = self._to_amounts(self.deltas[changes])
+        return [
+            {
+                "transaction": self.transactions[i],
+                VALUE_KEY: float(delta)
+            } for i, delta in zip(changes, deltas)  # balance has changed
+        ]
+
+    def get_flows(self):
+        """
+        :return: tuple (numpy array of int64, numpy array of float)
+            Date (epoch ns) of each deposit and withdrawal moving coins, and
+            amount moved in (if positive) or out (if negative) of wallet
+        """
+
+        moved = np.isin(self.types, FLOW_TYPES) & (self.deltas != 0)
+        return self.dates_array[moved], np.asarray(
+            self._to_amounts(self.deltas[moved]), dtype=np.float64
+        )
 
     def get_data_by_date(self, data, dates, currency=None):
         """
@@ -155,7 +510,7 @@ class Wallet:
         """
 
         if data == "delta":
-            data = self.get_delta_by_transaction(), dates, currency
+            data = self.get_delta_by_transaction()
         elif data == "balance":
             data = self.get_balance_by_transaction()
         else:
@@ -169,67 +524,86 @@ class Wallet:
             List of balance by transaction
         """
 
-        deltas = self.get_delta_by_transaction()
-        if not deltas:
-            return []
-
-        balances = [deltas[0]]
-        for delta in deltas[1:]:
-            balances.append({
-                "transaction": delta["transaction"],
-                VALUE_KEY: balances[-1][VALUE_KEY] + delta[VALUE_KEY]
-            })
-        return balances
+        changes, subtotals = self._get_changes()
+        return [
+            {
+                "transaction": self.transactions[i],
+                VALUE_KEY: float(subtotal)
+            } for i, subtotal in zip(changes, self._to_amounts(subtotals))
+        ]
 
     def get_balance_array_by_date(self, dates, currency=None):
         """
-        :param dates: [] of datetime
-            List of dates
+        :param dates: [] of datetime, numpy array of datetime64 or int64
+            List of dates (sorted)
         :param currency: str or None
             Currency to convert balances to
         :return: numpy array
-            Balance value by date
+            Balance value by date (NaN values are 0)
         """
 
-        balances = self.get_data_by_date("balance", dates, currency)
-        lst = np.zeros(len(balances))
-        for i, balance in enumerate(balances):
-            if not is_nan(balance):
-                lst[i] += balance
-        return lst
+        changes, subtotals = self._get_changes()
+        value_dates, values = self.fill_missing_data(
+            self._to_amounts(subtotals), self.dates_array[changes], dates
+        )
+
+        if currency:
+            values = self._convert_by_date(value_dates, values, currency)
+
+        return np.where(np.isnan(values), 0.0, values)
+
+    def _convert_by_date(self, dates, values, currency):
+        """
+        :param dates: numpy array of int64
+            Date (epoch ns) of each value
+        :param values: numpy array of float
+            Amounts of wallet base currency
+        :param currency: str
+            Currency to convert to
+        :return: numpy array of float
+            Amounts converted to currency (0 if price is missing)
+        """
+
+        converted = np.zeros(len(values))
+        to_convert = values != 0
+        unique_dates, inverse = np.unique(
+            dates[to_convert], return_inverse=True
+        )
+        prices = self.convert_many(unique_dates, currency)
+        prices[self.get_missing_prices(prices)] = 0.0
+        converted[to_convert] = values[to_convert] * prices[inverse]
+        return converted
 
     @staticmethod
     def fill_missing_data(data, dates, all_dates):
         """
-        :param data: [] of summable (e.g float)
+        :param data: numpy array of float
             Data to be filled
-        :param dates: [] of datetime
-            Dates of data
-        :param all_dates: [] of datetime
-            Full dates
-        :return: [] of {}
-            Fill missing data: when date not in original data, we create a
-            new data point with value the last value
+        :param dates: [] of datetime, numpy array of datetime64 or int64
+            Dates of data (sorted)
+        :param all_dates: [] of datetime, numpy array of datetime64 or int64
+            Full dates (sorted)
+        :return: tuple (numpy array of int64, numpy array of float)
+            Date (epoch ns) of each value and value for each of full dates.
+            Fill missing data: when date not in original data, last value
+            (with its date) is carried forward; before first data it is 0.
         """
 
-        filled = []
+        data = np.asarray(data, dtype=np.float64)
+        dates = dates_to_ns_array(dates)
+        all_dates = dates_to_ns_array(all_dates)
+        if not len(dates):
+            return all_dates, np.zeros(len(all_dates))
 
-        for date in all_dates:
-            i = bisect(dates, date)
-            if i == 0:
-                filled.append({
-                    DATE_TIME_KEY: date,
-                    VALUE_KEY: 0.0
-                })
-            elif date in dates:
-                filled.append({
-                    DATE_TIME_KEY: date,
-                    VALUE_KEY: data[i - 1]
-                })
-            else:
-                filled.append(filled[-1])
+        after = np.searchsorted(dates, all_dates, side="right")  # data <= date
+        before = np.maximum(after - 1, 0)
+        is_known = (after == 0) | (dates[before] == all_dates)
+        sources = np.maximum.accumulate(
+            np.where(is_known, np.arange(len(all_dates)), 0)
+        )  # index of full date to carry forward
 
-        return filled
+        values = np.where(after == 0, 0.0, data[before])[sources]
+        return all_dates[sources], values
 
     def fill_missing_transactions(self, data, dates, currency=None):
         """
@@ -239,25 +613,23 @@ class Wallet:
             All dates
         :param currency: str or None
             Currency to convert balances to
-        :return: [] of {}
+        :return: [] of {} (or [] of float if converted to currency)
             Fill missing data: when date not in original data, we create a
             new data point with value the last value
         """
 
-        filled = self.fill_missing_data(
+        filled_dates, filled = self.fill_missing_data(
             [transaction[VALUE_KEY] for transaction in data],  # data
             [transaction["transaction"].date for transaction in data],  # dates
             dates
         )
 
         if currency:
-            filled = [
-                self.convert_to(
-                    data[DATE_TIME_KEY],
-                    currency,
-                    float(data[VALUE_KEY])
-                )
-                for data in filled
-            ]
+            return list(self._convert_by_date(filled_dates, filled, currency))
 
-        return filled
+        return [
+            {
+                DATE_TIME_KEY: date,
+                VALUE_KEY: value
+            } for date, value in zip(ns_array_to_dates(filled_dates), filled)
+        ]
@@ -0,0 +1,366 @@
+# !/usr/bin/python3
+# coding: utf_8
+
+
+""" Binary columnar cache of transactions parsed from exchange files """
+
+import hashlib
+import json
+import os
+import tempfile
+
+import numpy as np
+
+from pyhodl.config import APP_FOLDER
+from pyhodl.core.exchanges import CryptoExchange
+from pyhodl.core.search import TransactionsIndex
+from pyhodl.core.store import TransactionsTable, PackedStrings
+from pyhodl.core.transactions import RawRecords
+from pyhodl.data.dedup import get_exchange_fingerprints
+
+CACHE_FOLDER = os.path.join(APP_FOLDER, "cache")
+CACHE_FORMAT = 8  # version of layout of cache files
+HASH_CHUNK_SIZE = 1 << 20  # bytes hashed at a time
+
+
+def get_cache_file(input_file):
+    """
+    :param input_file: str
+        File exchange is parsed from
+    :return: str
+        Path to cache file of transactions parsed from file
+    """
+
+    path = os.path.abspath(input_file)
+    return os.path.join(
+        CACHE_FOLDER,
+        hashlib.md5(path.encode("utf-8")).hexdigest() + ".npz"
+    )
+
+
+def get_file_hash(input_file):
+    """
+    :param input_file: str
+        File to hash
+    :return: str
+        Hash of content of file
+    """
+
+    content_hash = hashlib.md5()
+    with open(input_file, "rb") as stream:
+        for chunk in iter(lambda: stream.read(HASH_CHUNK_SIZE), b""):
+            content_hash.update(chunk)
+    return content_hash.hexdigest()
+
+
+def get_file_key(input_file, content_hash=None):
+    """
+    :param input_file: str
+        File exchange is parsed from
+    :param content_hash: str
+        Hash of content of file (computed if None)
+    :return: {}
+        Path, size, modification time and hash of content of file
+    """
+
+    stat = os.stat(input_file)
+    return {
+        "path": os.path.abspath(input_file),
+        "size": stat.st_size,
+        "mtime": stat.st_mtime,
+        "hash": content_hash or get_file_hash(input_file)
+    }
+
+
+def write_cache_file(cache_file, columns):
+    """
+    :param cache_file: str
+        Path to cache file
+    :param columns: {} of str -> numpy array
+        Content of cache file
+    :return: void
+        Saves content to a temporary file first, then moves it in place, so
+        that an interrupted run never leaves a truncated cache file
+    """
+
+    folder = os.path.dirname(cache_file)
+    os.makedirs(folder, exist_ok=True)
+    descriptor, temp_file = tempfile.mkstemp(suffix=".tmp", dir=folder)
+    try:
+        with os.fdopen(descriptor, "wb") as out:
+            np.savez(out, **columns)
+        os.replace(temp_file, cache_file)
+    except:
+        os.remove(temp_file)
+        raise
+
+
+def get_content(exchange):
+    """
+    :param exchange: CryptoExchange
+        Exchange parsed from file
+    :return: tuple ({}, {} of str -> numpy array)
+        Metadata (name, symbols and keys of raw data, size and modification
+        time of file records have been read from) and arrays (columns of
+        table, spans of raw records, ids, hashes and fingerprints of
+        transactions and search index) of exchange (both None if its
+        transactions are not kept in a table, or some were added after it
+        has been parsed)
+    """
+
+    table = exchange.transactions
+    if not isinstance(table, TransactionsTable) or table.raw_records.kept:
+        return None, None  # raw data not all in file
+
+    records = table.raw_records
+    metadata = {
+        "exchange": exchange.exchange_name,
+        "symbols": table.symbols,
+        "keys": table.keys,
+        "stamp": records.stamp
+    }
+    ids, ids_offsets = table.ids.to_arrays()
+    arrays = dict(
+        starts=np.array(records.starts, dtype=np.uint64),
+        lengths=np.array(records.lengths, dtype=np.uint64),
+        ids=ids,
+        ids_offsets=ids_offsets,
+        hashes=exchange.store.get_hashes(),
+        fingerprints=get_exchange_fingerprints(exchange),
+        **table.get_columns(),
+        **{
+            "index_" + name: array
+            for name, array in exchange.get_index().to_arrays().items()
+        }
+    )
+    return metadata, arrays
+
+
+def build_exchange(metadata, arrays, input_file):
+    """
+    :param metadata: {}
+        Metadata of exchange (see get_content)
+    :param arrays: {} of str -> numpy array
+        Arrays of exchange (see get_content)
+    :param input_file: str
+        File exchange has been parsed from
+    :return: CryptoExchange
+        Exchange (None if it has no transactions), built without decoding
+        nor parsing raw data
+    """
+
+    records = RawRecords.from_arrays(
+        os.path.abspath(input_file), arrays["starts"].tolist(),
+        arrays["lengths"].tolist(), stamp=metadata["stamp"]
+    )
+    table = TransactionsTable.from_columns(
+        arrays, metadata["symbols"], metadata["keys"],
+        PackedStrings.from_arrays(arrays["ids"], arrays["ids_offsets"]),
+        records
+    )
+    if not len(table):
+        return None
+
+    index = TransactionsIndex.from_arrays({
+        key[len("index_"):]: array
+        for key, array in arrays.items() if key.startswith("index_")
+    })
+    store = table.get_store()
+    store.hashes = np.asarray(arrays["hashes"], dtype=np.uint64)
+    return CryptoExchange(
+        table, metadata["exchange"], store=store, index=index,
+        fingerprints=np.asarray(arrays["fingerprints"], dtype=np.uint64)
+    )
+
+
+def get_common_rows(hashes, ids, ids_offsets, old_hashes, old_ids,
+                    old_offsets):
+    """
+    :param hashes: numpy array of uint64
+        Hash of each transaction (see TransactionStore.get_hashes)
+    :param ids: numpy array of uint8
+        Ids of each transaction, packed (see PackedStrings.to_arrays)
+    :param ids_offsets: numpy array of uint64
+        Where ids of each transaction start (and end)
+    :param old_hashes: numpy array of uint64
+        Hash of each transaction saved before
+    :param old_ids: numpy array of uint8
+        Ids of each transaction saved before
+    :param old_offsets: numpy array of uint64
+        Where ids of each transaction saved before start (and end)
+    :return: int
+        Number of first transactions with the same hash and ids in both
+    """
+
+    size = min(len(hashes), len(old_hashes))
+    same = (hashes[:size] == old_hashes[:size]) & \
+        (ids_offsets[1:size + 1] == old_offsets[1:size + 1])
+    if not same.all():
+        size = int(np.argmin(same))
+
+    end = int(ids_offsets[size])  # same in both
+    differ = np.flatnonzero(ids[:end] != old_ids[:end])
+    if len(differ):
+        size = int(np.searchsorted(ids_offsets, differ[0], side="right")) - 1
+    return size
+
+
+def reuse_fingerprints(exchange, cache_file):
+    """
+    :param exchange: CryptoExchange
+        Exchange just parsed from file, with transactions kept in a table
+    :param cache_file: str
+        Cache file of the same file, even if no more valid (e.g file has
+        been rewritten with more transactions)
+    :return: void
+        Takes fingerprints of the first transactions that are the same as
+        the ones saved in cache file, so that just the other ones are hashed
+    """
+
+    if exchange.fingerprints is not None or not os.path.exists(cache_file):
+        return
+
+    try:
+        with np.load(cache_file) as content:
+            metadata = json.loads(str(content["metadata"]))
+            if metadata.get("format") != CACHE_FORMAT or \
+                    metadata.get("exchange") != exchange.exchange_name:
+                return
+            old_hashes, old_ids, old_offsets, fingerprints = [
+                content[key]
+                for key in ["hashes", "ids", "ids_offsets", "fingerprints"]
+            ]
+    except Exception:  # corrupted (e.g truncated by an interrupted run)
+        return
+
+    ids, ids_offsets = exchange.transactions.ids.to_arrays()
+    size = get_common_rows(
+        exchange.store.get_hashes(), ids, ids_offsets, old_hashes, old_ids,
+        old_offsets
+    )
+    exchange.fingerprints = np.asarray(fingerprints[:size], dtype=np.uint64)
+
+
+def save_exchange(exchange, input_file, parser, content_hash=None):
+    """
+    :param exchange: CryptoExchange
+        Exchange parsed from file
+    :param input_file: str
+        File exchange has been parsed from
+    :param parser: CryptoParser
+        Parser used
+    :param content_hash: str
+        Hash of content of file (computed if None)
+    :return: bool
+        True iff transactions have been saved to cache file (i.e they are
+        kept in a table, as parsed)
+    """
+
+    if not isinstance(exchange.transactions, TransactionsTable):
+        return False
+
+    cache_file = get_cache_file(input_file)
+    reuse_fingerprints(exchange, cache_file)
+    metadata, arrays = get_content(exchange)
+    if metadata is None:
+        return False
+
+    metadata.update({
+        "format": CACHE_FORMAT,
+        "file": get_file_key(input_file, content_hash),
+        "parser": type(parser).__name__,
+        "key": parser.get_key(input_file),
+        "data": parser.get_cache_data()
+    })
+    write_cache_file(
+        cache_file, dict(metadata=np.array(json.dumps(metadata)), **arrays)
+    )
+    return True
+
+
+def is_valid_entry(metadata, input_file, parsers):
+    """
+    :param metadata: {}
+        Metadata of cache file
+    :param input_file: str
+        File exchange is parsed from
+    :param parsers: {} of str -> class
+        Name -> parser class of each parser available
+    :return: bool
+        True iff cache file has been written by its parser with the same
+        key (i.e version) from the same file content (file is hashed only if
+        its modification time has changed), and data it depends on (e.g
+        markets split with symbols table) would still be the same
+    """
+
+    parser = parsers.get(metadata.get("parser"))
+    if metadata.get("format") != CACHE_FORMAT or parser is None or \
+            metadata.get("key") != parser.get_key(input_file):
+        return False
+
+    key = metadata["file"]
+    stat = os.stat(input_file)
+    if key["path"] != os.path.abspath(input_file) or \
+            key["size"] != stat.st_size:
+        return False
+
+    if key["mtime"] != stat.st_mtime and \
+            key["hash"] != get_file_hash(input_file):
+        return False
+
+    return parser.is_valid_cache_data(input_file, metadata["data"])
+
+
+def parse_exchange(input_file, parsers):
+    """
+    :param input_file: str
+        File exchange is parsed from
+    :param parsers: {} of str -> class
+        Name -> parser class of each parser available
+    :return: CryptoExchange
+        Exchange with transactions saved in cache file (None if there is
+        no valid cache file), built without decoding nor parsing raw data
+    """
+
+    return load_exchange(input_file, parsers)[0]
+
+
+def load_exchange(input_file, parsers):
+    """
+    :param input_file: str
+        File exchange is parsed from
+    :param parsers: {} of str -> class
+        Name -> parser class of each parser available
+    :return: tuple (CryptoExchange, class)
+        Exchange with transactions saved in cache file and parser class they
+        have been parsed with (both None if there is no valid cache file)
+    """
+
+    cache_file = get_cache_file(input_file)
+    if not os.path.exists(cache_file):
+        return None, None
+
+    try:
+        with np.load(cache_file) as content:
+            metadata = json.loads(str(content["metadata"]))
+            if not is_valid_entry(metadata, input_file, parsers):
+                return None, None
+            content = {key: content[key] for key in content.files}
+    except Exception:  # corrupted (e.g truncated by an interrupted run)
+        return None, None
+
+    stat = os.stat(input_file)
+    mtime = stat.st_mtime
+    metadata["stamp"] = [stat.st_size, mtime]  # of content checked
+    if metadata["file"]["mtime"] != mtime:  # touched, but same content
+        metadata["file"]["mtime"] = mtime
+        content["metadata"] = np.array(json.dumps(metadata))
+        try:
+            write_cache_file(cache_file, content)  # not to hash it again
+        except OSError:
+            pass
+
+    exchange = build_exchange(metadata, content, input_file)
+    if exchange is None:
+        return None, None
+    return exchange, parsers[metadata["parser"]]
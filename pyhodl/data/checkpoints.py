@@ -0,0 +1,113 @@
+# !/usr/bin/python3
+# coding: utf_8
+
+
+""" Input/output balance checkpoints, to replay only newer transactions """
+
+import hashlib
+import json
+import os
+
+from hal.files.parsers import JSONParser
+from hal.files.save_as import write_dicts_to_json
+
+from pyhodl.config import APP_FOLDER
+
+CHECKPOINTS_FOLDER = os.path.join(APP_FOLDER, "checkpoints")
+HASH_KEY = "hash"
+
+
+def get_checkpoint_file(input_file):
+    """
+    :param input_file: str
+        File exchange is parsed from
+    :return: str
+        Path to balance checkpoint file of exchange parsed from file (each
+        file has its own, even if of the same exchange)
+    """
+
+    path = os.path.abspath(input_file)
+    return os.path.join(
+        CHECKPOINTS_FOLDER,
+        hashlib.md5(path.encode("utf-8")).hexdigest() + ".json"
+    )
+
+
+def get_returns_file(input_file):
+    """
+    :param input_file: str
+        File exchange is parsed from
+    :return: str
+        Path to file with state of returns of exchange parsed from file, up
+        to its checkpoint (kept apart, so that balances are replayed from
+        checkpoint even if returns cannot be computed)
+    """
+
+    path = os.path.abspath(input_file)
+    return os.path.join(
+        CHECKPOINTS_FOLDER,
+        "returns",
+        hashlib.md5(path.encode("utf-8")).hexdigest() + ".json"
+    )
+
+
+def get_total_checkpoint_file():
+    """
+    :return: str
+        Path to checkpoint file of returns of all exchanges
+    """
+
+    return os.path.join(
+        CHECKPOINTS_FOLDER,
+        "TotalCheckpoint.json"
+    )
+
+
+def get_checkpoint_hash(checkpoint):
+    """
+    :param checkpoint: {}
+        Checkpoint data
+    :return: str
+        Hash of content of checkpoint
+    """
+
+    content = {
+        key: value for key, value in checkpoint.items() if key != HASH_KEY
+    }
+    return hashlib.md5(
+        json.dumps(content, sort_keys=True, default=str).encode("utf-8")
+    ).hexdigest()
+
+
+def parse_checkpoint(input_file):
+    """
+    :param input_file: str
+        Parse checkpoint from this file
+    :return: {}
+        Checkpoint (None if there is no file or its content is corrupted)
+    """
+
+    if os.path.exists(input_file):
+        try:
+            content = JSONParser(input_file).get_content()
+            if content[HASH_KEY] == get_checkpoint_hash(content):
+                return content
+        except:
+            pass
+    return None
+
+
+def save_checkpoint(checkpoint, output_file):
+    """
+    :param checkpoint: {}
+        Checkpoint data
+    :param output_file: str
+        Path to save data to
+    :return: void
+        Saves checkpoint (with its hash) to file
+    """
+
+    checkpoint = dict(checkpoint)
+    checkpoint[HASH_KEY] = get_checkpoint_hash(checkpoint)
+    os.makedirs(os.path.dirname(output_file), exist_ok=True)
+    write_dicts_to_json(checkpoint, output_file)
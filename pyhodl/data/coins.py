@@ -4,28 +4,232 @@
 
 """ List of crypto-coins supported """
 
+from numbers import Integral
+
 from hal.files.parsers import JSONParser
 
 from pyhodl.config import COINS_DATABASE
 from pyhodl.utils.lists import do_any_are_in
 
+CRYPTO_DECIMALS = 8  # smallest unit of crypto coins is 1e-8 (satoshi)
+FIAT_DECIMALS = 8  # fiat legs and fees (price x quantity) go below cents,
+# and int64 still holds ~9e10 units of coin
+
+
+class CoinsRegistry:
+    """ Process-wide table of coins: each symbol (and alias) is interned to
+    a small integer id, so that comparing coins is comparing ints """
+
+    def __init__(self):
+        self.symbols = []  # id -> symbol
+        self.ids = {}  # symbol (any spelling) -> id
+        self.aliases = {}  # lower-case name -> id
+        self.listed = bytearray()  # id -> 1 iff fiat or in coins database
+        self.fiat = bytearray()  # id -> 1 iff fiat coin
+        self.decimals = bytearray()  # id -> decimals of smallest unit
+        self.coins = []  # id -> Coin instance (built when needed)
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def _intern(self, symbol):
+        """
+        :param symbol: str
+            Upper-case symbol never seen before
+        :return: int
+            New id of symbol
+        """
+
+        coin_id = len(self.symbols)
+        self.symbols.append(symbol)
+        self.ids[symbol] = coin_id
+        self.listed.append(0)
+        self.fiat.append(0)
+        self.decimals.append(CRYPTO_DECIMALS)
+        self.coins.append(None)
+        return coin_id
+
+    def find_id(self, symbol):
+        """
+        :param symbol: str or Coin
+            Coin to look for
+        :return: int
+            Id of coin, or None if never seen
+        """
+
+        if isinstance(symbol, Coin):
+            return symbol.id
+
+        try:
+            return self.ids[symbol]
+        except KeyError:
+            coin_id = self.ids.get(str(symbol).upper())
+            if coin_id is not None:
+                self.ids[symbol] = coin_id  # remember this spelling
+            return coin_id
+
+    def get_id(self, symbol):
+        """
+        :param symbol: str or Coin
+            Coin to look for
+        :return: int
+            Id of coin (a new one is created if never seen)
+        """
+
+        coin_id = self.find_id(symbol)
+        if coin_id is None:
+            coin_id = self._intern(str(symbol).upper())
+        return coin_id
+
+    def get_crypto_id(self, symbol, names):
+        """
+        :param symbol: str
+            Upper-case symbol of coin
+        :param names: [] of str
+            Lower-case names of coin
+        :return: int
+            Id of coin. Symbols not listed (as fiat or in coins database)
+            take the id of the first known name, without becoming its alias,
+            whether they have been interned before or not: the same symbol
+            and names always get the same id
+        """
+
+        coin_id = self.find_id(symbol)
+        if coin_id is not None and self.listed[coin_id]:
+            return coin_id
+
+        for name in names:
+            if name and name in self.aliases:
+                return self.aliases[name]
+
+        return coin_id if coin_id is not None else self._intern(symbol)
+
+    def get_symbol(self, coin_id):
+        """
+        :param coin_id: int
+            Id of coin
+        :return: str
+            Symbol of coin
+        """
+
+        return self.symbols[coin_id]
+
+    def get_coin(self, symbol):
+        """
+        :param symbol: str or Coin
+            Coin to look for
+        :return: Coin
+            Shared instance of coin (CryptoCoin iff not fiat)
+        """
+
+        coin_id = self.get_id(symbol)
+        if self.coins[coin_id] is None:
+            symbol = self.symbols[coin_id]
+            self.coins[coin_id] = Coin(symbol) if self.fiat[coin_id] \
+                else CryptoCoin(symbol)
+        return self.coins[coin_id]
+
+    def is_fiat(self, symbol):
+        """
+        :param symbol: int, str or Coin
+            Coin (or id of coin) to check
+        :return: bool
+            True iff coin is fiat (False if never seen)
+        """
+
+        if not isinstance(symbol, Integral):
+            symbol = self.find_id(symbol)
+            if symbol is None:
+                return False
+        return bool(self.fiat[symbol])
+
+    def get_decimals(self, symbol):
+        """
+        :param symbol: int, str or Coin
+            Coin (or id of coin) to check
+        :return: int
+            Number of decimals of smallest unit of coin (e.g 8 for BTC), the
+            one of crypto coins if never seen
+        """
+
+        if not isinstance(symbol, Integral):
+            symbol = self.find_id(symbol)
+            if symbol is None:
+                return CRYPTO_DECIMALS
+        return self.decimals[symbol]
+
+    def add_fiat(self, symbols):
+        """
+        :param symbols: [] of str
+            Symbols of fiat coins
+        :return: void
+            Flags coins as fiat
+        """
+
+        for symbol in symbols:
+            coin_id = self.get_id(symbol)
+            self.listed[coin_id] = 1
+            self.fiat[coin_id] = 1
+            self.decimals[coin_id] = FIAT_DECIMALS
+
+    def add_database(self, raw_coins):
+        """
+        :param raw_coins: [] of {}
+            Raw coins with symbol, name and other names
+        :return: void
+            Interns all symbols, then all names as aliases
+        """
+
+        coins_ids = [self.get_id(raw["symbol"]) for raw in raw_coins]
+        for coin_id in coins_ids:
+            self.listed[coin_id] = 1
+        for raw, coin_id in zip(raw_coins, coins_ids):
+            for name in [raw["name"]] + raw["other_names"]:
+                self.aliases.setdefault(str(name).lower(), coin_id)
+
 
 class Coin:
     """ Model of a coin traded """
 
+    __slots__ = ("_symbol", "name", "id")
+
     def __init__(self, symbol, name=None):
-        self.symbol = str(symbol).upper()
         self.name = str(name).lower() if name else None
+        self._symbol = str(symbol).upper()
+        self.id = self._get_id()
+
+    @property
+    def symbol(self):
+        """
+        :return: str
+            Symbol of coin (read-only: coin is hashed by its id)
+        """
+
+        return self._symbol
+
+    def _get_id(self):
+        """
+        :return: int
+            Id of coin in registry
+        """
+
+        return COINS_REGISTRY.get_id(self._symbol)
 
     def __eq__(self, other):
         if isinstance(other, Coin):
-            return self.symbol == other.symbol
+            return self.id == other.id
 
         if isinstance(other, str):  # equals with string
-            return self == Coin(other)
+            return self.id == COINS_REGISTRY.find_id(other)
 
         return False
 
+    def __hash__(self):
+        return self.id
+
+    def __reduce__(self):  # ids are per process: intern again when loaded
+        return get_coin, (self.symbol,)
+
     def __str__(self):
         return self.symbol
 
@@ -33,23 +237,26 @@ class Coin:
 class CryptoCoin(Coin):
     """ Crypto currency model """
 
+    __slots__ = ("other_names",)
+
     def __init__(self, symbol, name=None, other_names=None):
-        Coin.__init__(self, symbol, name)
         if other_names:
             self.other_names = [
                 str(other).lower() for other in other_names
             ]
         else:
             self.other_names = []
+        Coin.__init__(self, symbol, name)
 
-    def __eq__(self, other):
-        if super().__eq__(other):
-            return True
-
-        if self.name and self.name == other.name:
-            return True
+    def _get_id(self):
+        return COINS_REGISTRY.get_crypto_id(
+            self._symbol, [self.name] + self.other_names
+        )
 
-        return self.has_same_names(other)
+    def __reduce__(self):  # coins found by name: find them again by name
+        if COINS_REGISTRY.find_id(self._symbol) != self.id:
+            return CryptoCoin, (self.symbol, self.name, self.other_names)
+        return super().__reduce__()
 
     def has_same_names(self, other):
         """
@@ -87,13 +294,29 @@ class CoinsNamesTable(JSONParser):
             List of default coins
         """
 
-        return [
+        COINS_REGISTRY.add_database(self.content)
+        coins = [
             CryptoCoin(
                 raw["symbol"],
                 name=raw["name"],
                 other_names=raw["other_names"]
             ) for raw in self.content
         ]
+        for coin in coins:
+            if COINS_REGISTRY.coins[coin.id] is None:
+                COINS_REGISTRY.coins[coin.id] = coin
+        return coins
+
+
+def get_coin(symbol):
+    """
+    :param symbol: str
+        Symbol of coin
+    :return: Coin
+        Shared instance of coin in this process
+    """
+
+    return COINS_REGISTRY.get_coin(symbol)
 
 
 def is_crypto(coin):
@@ -101,12 +324,14 @@ def is_crypto(coin):
     :param coin: str or Coin
         Coin to check
     :return: bool
-        True iff coin is among crypto supported
+        True iff coin is among crypto supported (i.e not fiat)
     """
 
-    return coin not in FIAT_COINS
+    return not COINS_REGISTRY.is_fiat(coin)
 
 
+COINS_REGISTRY = CoinsRegistry()
+COINS_REGISTRY.add_fiat(["USD", "EUR"])
 FIAT_COINS = [Coin("USD"), Coin("EUR")]  # supported fiat coins
 DEFAULT_FIAT = Coin("USD")
 CRYPTO_COINS = CoinsNamesTable(COINS_DATABASE).get_coins()
@@ -0,0 +1,97 @@
+# !/usr/bin/python3
+# coding: utf_8
+
+
+""" Find transactions listed more than once across dumps """
+
+import hashlib
+
+import numpy as np
+
+from pyhodl.core.store import mix_hashes
+
+
+def get_ids_hashes(exchange, start=0):
+    """
+    :param exchange: CryptoExchange
+        Exchange with transactions
+    :param start: int
+        First transaction to hash
+    :return: numpy array of uint64
+        Hash of exchange name and ids of each transaction from start on
+    """
+
+    return np.array([
+        int(hashlib.md5(
+            (exchange.exchange_name + "|" + ids).encode("utf-8")
+        ).hexdigest()[:16], 16)
+        for ids in exchange.get_ids(start)
+    ], dtype=np.uint64)
+
+
+def get_fingerprints(exchange, start=0):
+    """
+    :param exchange: CryptoExchange
+        Exchange with transactions
+    :param start: int
+        First transaction to hash
+    :return: numpy array of uint64
+        Fingerprint of each transaction from start on: hash of exchange,
+        ids, date, type, coins and amounts
+    """
+
+    store = exchange.store
+    symbols = store.get_symbols_hashes(start)
+    amounts = (store.amounts[start:] + 0.0).view(np.uint64)  # no -0.0
+    fingerprints = get_ids_hashes(exchange, start)
+    for column in [
+            store.dates[start:].view(np.uint64),
+            store.types[start:].astype(np.uint64)] + \
+            [symbols[:, i] for i in range(3)] + \
+            [amounts[:, i] for i in range(3)]:
+        fingerprints = mix_hashes(fingerprints ^ column)
+    return fingerprints
+
+
+def get_exchange_fingerprints(exchange):
+    """
+    :param exchange: CryptoExchange
+        Exchange with transactions
+    :return: numpy array of uint64
+        Fingerprint of each transaction. Just transactions after the ones
+        already fingerprinted (e.g reused from cache entry of file, see
+        cache.reuse_fingerprints) are hashed.
+    """
+
+    known = exchange.fingerprints
+    if known is None:
+        known = np.empty(0, dtype=np.uint64)
+    if len(known) < len(exchange.store):
+        known = np.concatenate(
+            (known, get_fingerprints(exchange, len(known)))
+        )
+    exchange.fingerprints = known
+    return known
+
+
+def drop_duplicates(transactions, fingerprints, source, seen):
+    """
+    :param transactions: [] of Transaction
+        Transactions parsed from source
+    :param fingerprints: [] of int
+        Fingerprint of each transaction
+    :param source: str
+        Where transactions come from (e.g file)
+    :param seen: {} of int -> str
+        Fingerprint -> source it has been first seen in. It is updated with
+        fingerprints of source.
+    :return: [] of Transaction
+        Transactions not already seen in other sources (equal transactions
+        in the same source are all kept)
+    """
+
+    kept = []
+    for transaction, fingerprint in zip(transactions, fingerprints):
+        if seen.setdefault(fingerprint, source) == source:
+            kept.append(transaction)
+    return kept
@@ -4,14 +4,26 @@
 
 """ Parse raw data """
 
+import functools
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+
 from hal.files.models.system import ls_recurse, is_file
 
+from pyhodl.data import cache
+from pyhodl.data.dedup import get_exchange_fingerprints, drop_duplicates
 from pyhodl.data.parse.core import CryptoParser
 from .markets.binance import BinanceParser
 from .markets.bitfinex import BitfinexParser
 from .markets.coinbase import CoinbaseParser
 from .markets.gdax import GdaxParser
 
+PARSERS = {
+    parser.__name__: parser
+    for parser in [BinanceParser, BitfinexParser, CoinbaseParser, GdaxParser]
+}  # name -> parser
+
 
 def build_parser(input_file):
     """
@@ -21,30 +33,24 @@ def build_parser(input_file):
         Builds exchange model based on transactions
     """
 
-    parser = CryptoParser(input_file)
-    raw_data = parser.get_raw_data()
-
-    if isinstance(raw_data, dict):  # dict
-        for _, raw_lst in raw_data.items():
-            if raw_lst:
-                raw_data = raw_lst
-
-    parser = get_parser(raw_data)
+    records = CryptoParser(input_file).get_raw_records()
+    first = next(records, None)  # only first is read
+    raw_item = first[0] if first else None
+    parser = get_parser(raw_item) if isinstance(raw_item, dict) else None
 
-    if parser:
-        return parser(input_file)
+    if parser:  # goes on reading from first record
+        return parser(input_file, itertools.chain([first], records))
     raise ValueError("Cannot identify parser for file", input_file)
 
 
-def get_parser(raw_data):
+def get_parser(raw_item):
     """
-    :param raw_data: []
-        Raw data
+    :param raw_item: {}
+        First raw record of file
     :return: CryptoParser
         Build parse from raw data
     """
 
-    raw_item = raw_data[0]
     if "instant_exchange" in raw_item:
         return CoinbaseParser
     elif "currency" in raw_item:
@@ -55,36 +61,192 @@ def get_parser(raw_data):
         return BinanceParser
 
 
-def build_parsers(input_folder):
+def get_files(input_folder):
     """
     :param input_folder: str
         Path to folder where to look for transactions files
-    :return: [] of Parsers
-        Parsers found for each file
+    :return: [] of str
+        Files in folder (and sub-folders)
     """
 
-    files = [
+    return [
         doc for doc in ls_recurse(input_folder) if is_file(doc)
     ]
 
-    for input_file in files:
+
+def build_parsers(input_folder):
+    """
+    :param input_folder: str
+        Path to folder where to look for transactions files
+    :return: [] of Parsers
+        Parsers found for each file
+    """
+
+    for input_file in get_files(input_folder):
         try:
-            yield build_parser(input_file)
+            parser = build_parser(input_file)
         except:
-            pass
+            continue
+
+        yield parser
+
+
+def build_file_exchange(input_file, use_cache=True):
+    """
+    :param input_file: str
+        File to parse
+    :param use_cache: bool
+        True iff you want to load transactions from cache when file has not
+        changed since they have been parsed (and save them there otherwise)
+    :return: CryptoExchange
+        Exchange with transactions of file (None if there is no parser for
+        file)
+    """
+
+    return parse_file(input_file, use_cache)[0]
 
 
-def build_exchanges(input_folder):
+def parse_file(input_file, use_cache=True):
+    """
+    :param input_file: str
+        File to parse
+    :param use_cache: bool
+        True iff you want to load transactions from cache when file has not
+        changed since they have been parsed (and save them there otherwise)
+    :return: tuple (CryptoExchange, class)
+        Exchange with transactions of file and parser class used (both None
+        if there is no parser for file)
+    """
+
+    if use_cache:
+        exchange, parser = cache.load_exchange(input_file, PARSERS)
+        if exchange is not None:
+            return exchange, parser
+
+    try:
+        parser = build_parser(input_file)
+    except:
+        return None, None
+
+    exchange = parser.build_exchange()
+    if use_cache and os.path.exists(os.path.dirname(cache.CACHE_FOLDER)):
+        cache.save_exchange(exchange, input_file, parser)
+    return exchange, type(parser)
+
+
+def parse_file_content(input_file, use_cache=True):
+    """
+    :param input_file: str
+        File to parse
+    :param use_cache: bool
+        True iff you want to load transactions from cache when file has not
+        changed since they have been parsed (and save them there otherwise)
+    :return: tuple ({}, {} of str -> numpy array, class)
+        Metadata and arrays of exchange parsed from file (see
+        cache.get_content), and parser class used (all None if there is no
+        parser for file): just columns are sent back from other processes
+    """
+
+    exchange, parser = parse_file(input_file, use_cache)
+    if exchange is None:
+        return None, None, None
+
+    metadata, arrays = cache.get_content(exchange)
+    return metadata, arrays, parser
+
+
+def parse_exchanges(input_folder, workers=1, use_cache=True):
     """
     :param input_folder: str
         Path to folder where to look for transactions files
+    :param workers: int
+        Number of processes parsing files at the same time (files are
+        parsed in this process if 1)
+    :param use_cache: bool
+        True iff you want to load transactions of files not changed from
+        cache
+    :return: generator of (str, CryptoExchange, class)
+        Each file (in order) with the exchange parsed from it and parser
+        class used
+    """
+
+    files = get_files(input_folder)
+    if workers > 1:
+        parse = functools.partial(parse_file_content, use_cache=use_cache)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parsed = pool.map(parse, files)
+            for input_file, (metadata, arrays, parser) in zip(files, parsed):
+                if metadata is not None:
+                    yield input_file, cache.build_exchange(
+                        metadata, arrays, input_file
+                    ), parser
+        return
+
+    parse = functools.partial(parse_file, use_cache=use_cache)
+    for input_file in files:
+        exchange, parser = parse(input_file)
+        if exchange is not None:
+            yield input_file, exchange, parser
+
+
+def build_exchanges(input_folder, deduplicate=True, workers=1,
+                    use_cache=True):
+    """
+    :param input_folder: str
+        Path to folder where to look for transactions files
+    :param deduplicate: bool
+        True iff you want to drop transactions already found in other files
+        (e.g overlapping dumps)
+    :param workers: int
+        Number of processes parsing files at the same time. Exchanges are
+        the same (and in the same order) as with just 1.
+    :param use_cache: bool
+        True iff you want to load transactions of files not changed from
+        cache, skipping decoding and parsing of raw data
     :return: [] of CryptoExchange
         Exchanges found (with transactions)
     """
 
-    parsers = build_parsers(input_folder)
-    for parser in parsers:
-        yield parser.build_exchange()
+    for _, exchange in build_file_exchanges(
+            input_folder, deduplicate, workers, use_cache):
+        yield exchange
+
+
+def build_file_exchanges(input_folder, deduplicate=True, workers=1,
+                         use_cache=True):
+    """
+    :param input_folder: str
+        Path to folder where to look for transactions files
+    :param deduplicate: bool
+        True iff you want to drop transactions already found in other files
+    :param workers: int
+        Number of processes parsing files at the same time
+    :param use_cache: bool
+        True iff you want to load transactions of files not changed from
+        cache
+    :return: generator of (str, CryptoExchange)
+        Each file with transactions and the exchange built from it (see
+        build_exchanges)
+    """
+
+    exchanges = parse_exchanges(input_folder, workers, use_cache)
+    if not deduplicate:
+        for input_file, exchange, _ in exchanges:
+            yield input_file, exchange
+        return
+
+    seen = {}  # fingerprint -> file
+    for input_file, exchange, _ in exchanges:
+        fingerprints = get_exchange_fingerprints(exchange).tolist()
+        rows = drop_duplicates(
+            range(len(fingerprints)), fingerprints, input_file, seen
+        )
+        if len(rows) < len(fingerprints):
+            if not rows:
+                continue  # whole file already seen
+
+            exchange = exchange.take(rows)
+        yield input_file, exchange
 
 
 def get_transactions(input_folder):
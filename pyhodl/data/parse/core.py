@@ -5,26 +5,207 @@
 """ Parse raw data """
 
 import abc
+import itertools
 import os
 
+import numpy as np
 from hal.files.parsers import JSONParser
 
 from pyhodl.core.exchanges import CryptoExchange
+from pyhodl.core.search import TransactionsIndex
+from pyhodl.core.store import TransactionsTable
 from pyhodl.core.transactions import TransactionType, Transaction, \
-    CoinAmount
+    CoinAmount, RawRecords, get_ids_key
+from pyhodl.data.coins import COINS_REGISTRY
+from pyhodl.utils.dates import dates_to_ns_array, \
+    unix_timestamp_ns_to_datetime
+from .stream import iter_records
+
+BATCH_SIZE = 1 << 12  # records parsed at a time
+
+
+def to_amounts(values):
+    """
+    :param values: [] of str or float
+        Raw amounts
+    :return: numpy array of float
+        Amounts (NaN where raw amount is missing, i.e empty or 0 number)
+    """
+
+    return np.array([
+        value if value else np.nan for value in values
+    ], dtype=np.float64)
+
+
+def nonzero_amounts(values):
+    """
+    :param values: numpy array of float
+        Amounts computed (e.g price times quantity)
+    :return: numpy array of float
+        Amounts (NaN where 0, as if missing)
+    """
+
+    return np.where(values == 0, np.nan, values)
+
+
+def ms_to_ns(values):
+    """
+    :param values: [] of int or str
+        Unix timestamps (milliseconds)
+    :return: numpy array of int64
+        Unix timestamps (nanoseconds)
+    """
+
+    return np.array(values).astype(np.int64) * 1000000
+
+
+def ms_to_date(value):
+    """
+    :param value: int or str
+        Unix timestamp (milliseconds)
+    :return: datetime
+        Date and time (UTC), as in ms_to_ns
+    """
+
+    return unix_timestamp_ns_to_datetime(int(value) * 1000000)
+
+
+def seconds_to_date(value):
+    """
+    :param value: float or str
+        Unix timestamp (seconds, truncated)
+    :return: datetime
+        Date and time (UTC), as in seconds_to_ns
+    """
+
+    return unix_timestamp_ns_to_datetime(int(float(value)) * 1000000000)
+
+
+def seconds_to_ns(values):
+    """
+    :param values: [] of float or str
+        Unix timestamps (seconds, truncated)
+    :return: numpy array of int64
+        Unix timestamps (nanoseconds)
+    """
+
+    return np.array(values, dtype=np.float64).astype(np.int64) * 1000000000
+
+
+def from_coin_amounts(coin_amounts):
+    """
+    :param coin_amounts: [] of CoinAmount
+        Coins moved (or None)
+    :return: tuple ([] of str, numpy array of float)
+        Coin (None if missing) and amount (NaN if missing) of each one
+    """
+
+    return [
+        coin_amount.coin if coin_amount else None
+        for coin_amount in coin_amounts
+    ], np.array([
+        coin_amount.amount if coin_amount and
+        coin_amount.amount is not None else np.nan
+        for coin_amount in coin_amounts
+    ], dtype=np.float64)
+
+
+def get_symbols(coins):
+    """
+    :param coins: [] of str or Coin
+        Coins (None or empty if missing)
+    :return: numpy array of str
+        Symbol of each coin, as in its shared instance (None if missing),
+        looked up once for each distinct coin
+    """
+
+    symbols = {
+        coin: str(COINS_REGISTRY.get_coin(coin)) for coin in set(coins) if coin
+    }
+    return np.array([symbols.get(coin) if coin else None for coin in coins],
+                    dtype=object)
+
+
+def get_fee_key(raw, fee_raw):
+    """
+    :param raw: {}
+        Raw record of transaction
+    :param fee_raw: {}
+        Raw data of its commission (None if there is none)
+    :return: str
+        Key of raw record with raw data of commission (None if it is the
+        whole record, or there is no commission)
+    """
+
+    if fee_raw is None or fee_raw is raw:
+        return None
+
+    for key, value in raw.items():
+        if value is fee_raw:
+            return key
+
+    raise ValueError("Raw data of commission is not in its record")
 
 
 class CryptoParser:
     """ Abstract parser """
 
-    def __init__(self, input_file):
+    VERSION = 2  # change it when transactions parsed change (e.g new fields)
+
+    def __init__(self, input_file, records=None):
         """
         :param input_file: str
             File to parse
+        :param records: iterator of ({}, tuple (int, int))
+            Raw records of file (and their span in file) already being read
+            (e.g to detect parser): they are parsed instead of reading file
+            again the first time
         """
 
         self.input_file = os.path.join(input_file)  # reformat file path
         self.filename = os.path.basename(self.input_file)
+        self.raw_records = RawRecords(
+            os.path.abspath(self.input_file)
+        )  # where raw data of parsed transactions is in file
+        self.records = records
+
+    @classmethod
+    def get_key(cls, input_file):
+        """
+        :param input_file: str
+            File to parse
+        :return: {}
+            Name and version of parser: transactions parsed from the same
+            file content with the same key are the same
+        """
+
+        return {
+            "parser": cls.__name__,
+            "version": cls.VERSION
+        }
+
+    def get_cache_data(self):
+        """
+        :return: {}
+            What transactions parsed so far depend on, besides file content
+            and key (e.g how market symbols have been split): it is saved
+            along with them in cache
+        """
+
+        return {}
+
+    @classmethod
+    def is_valid_cache_data(cls, input_file, data):
+        """
+        :param input_file: str
+            File transactions have been parsed from
+        :param data: {}
+            What they depend on, as saved in cache (see get_cache_data)
+        :return: bool
+            True iff transactions would be parsed the same now
+        """
+
+        return True
 
     def get_raw_data(self):
         """
@@ -34,6 +215,20 @@ class CryptoParser:
 
         return JSONParser(self.input_file).get_content()
 
+    def get_raw_records(self):
+        """
+        :return: generator of ({}, tuple (int, int))
+            Each raw record in file and its offset and length (bytes) in
+            file (read incrementally, so that only one record at a time is
+            decoded, and just once if file is already being read)
+        """
+
+        if self.records is not None:  # continue reading
+            records, self.records = self.records, None
+            return records
+
+        return iter_records(self.input_file, spans=True)
+
     @abc.abstractmethod
     def is_trade(self, raw):
         """
@@ -195,25 +390,191 @@ class CryptoParser:
             self.get_commission(raw)
         )
 
+    def get_record_types(self, records):
+        """
+        :param records: [] of {}
+            Raw records
+        :return: numpy array of uint8
+            Code of type of each record (see TransactionType)
+        """
+
+        return np.array([
+            self.get_transaction_type(raw).value for raw in records
+        ], dtype=np.uint8)
+
+    def parse_group(self, records, transaction_type):
+        """
+        :param records: [] of {}
+            Raw records, all of the same type
+        :param transaction_type: TransactionType
+            Type of records
+        :return: {} of str -> numpy array
+            Columns of transactions parsed (see build_columns): parsers
+            should convert fields of all records at once and call
+            build_columns, else records are parsed one at a time
+        """
+
+        transactions = [self.parse_transaction(raw) for raw in records]
+        fees = [transaction.commission for transaction in transactions]
+        return self.build_columns(records, transaction_type, {
+            "date": [transaction.date for transaction in transactions],
+            "successful": [
+                transaction.successful for transaction in transactions
+            ],
+            "buy": from_coin_amounts(
+                [transaction.coin_buy for transaction in transactions]
+            ),
+            "sell": from_coin_amounts(
+                [transaction.coin_sell for transaction in transactions]
+            ),
+            "fee": (
+                [fee.raw if fee else None for fee in fees],
+                *from_coin_amounts([fee.coin if fee else None for fee in fees]),
+                [fee.successful if fee else False for fee in fees]
+            )
+        })
+
+    def build_columns(self, records, transaction_type, columns):
+        """
+        :param records: [] of {}
+            Raw records, all of the same type
+        :param transaction_type: TransactionType
+            Type of records
+        :param columns: {} of str -> []
+            Fields of records. "date" is a list of dates or a numpy array of
+            epoch ns, "successful" a list with a value for each record.
+            "buy" and "sell" are tuples (coins, amounts) (None coin if
+            nothing is bought/sold, NaN amount if missing). Optional "fee"
+            is a tuple (raw dicts, coins, amounts, successful) (None raw dict
+            if there is no commission).
+        :return: {} of str -> numpy array
+            Columns of transactions of records (see
+            TransactionsTable.add_columns): no transaction is built, the
+            table builds them when asked for
+        """
+
+        size = len(records)
+        no_fee = [None] * size
+        fee_raws, fee_coins, fee_amounts, fee_successful = \
+            columns.get("fee", (no_fee, no_fee, no_fee, no_fee))
+        dates = dates_to_ns_array(columns["date"])
+        has_fee = np.array([raw is not None for raw in fee_raws], dtype=bool)
+        batch = {
+            "dates": dates,
+            "types": np.full(size, transaction_type.value, dtype=np.uint8),
+            "successful": np.array(columns["successful"], dtype=bool),
+            "has_fee": has_fee,
+            "fee_dates": np.where(has_fee, dates, 0),
+            "fee_successful": has_fee & np.array([
+                bool(ok) for ok in fee_successful
+            ], dtype=bool),
+            "fee_key": np.array([
+                get_fee_key(raw, fee_raw)
+                for raw, fee_raw in zip(records, fee_raws)
+            ], dtype=object)
+        }
+        for name, (coins, amounts), is_in in [
+                ("buy", columns["buy"], True),
+                ("sell", columns["sell"], False),
+                ("fee", (fee_coins, fee_amounts), False)]:
+            coins = get_symbols(coins)
+            moved = has_fee if name == "fee" else np.array([
+                coin is not None for coin in coins
+            ], dtype=bool)
+            batch[name + "_coin"] = coins
+            batch[name + "_amount"] = np.where(
+                moved, np.array(amounts, dtype=np.float64), np.nan
+            )
+            batch[name + "_in"] = moved & is_in
+        return batch
+
+    def parse_columns(self, records):
+        """
+        :param records: [] of {}
+            Raw records
+        :return: {} of str -> numpy array
+            Columns of transactions parsed (in the same order, see
+            build_columns), and ids in raw data of each one. Each record is
+            classified just once, then records of each type are parsed
+            together.
+        """
+
+        types = self.get_record_types(records)
+        columns = {
+            "ids": np.array(
+                [get_ids_key(raw) for raw in records], dtype=object
+            )
+        }
+        for code in np.unique(types).tolist():
+            rows = np.flatnonzero(types == code)
+            group = self.parse_group(
+                [records[row] for row in rows.tolist()], TransactionType(code)
+            )
+            for name, column in group.items():
+                if name not in columns:
+                    columns[name] = np.empty(
+                        len(records), dtype=np.asarray(column).dtype
+                    )
+                columns[name][rows] = column
+        return columns
+
+    def parse_transactions(self, records):
+        """
+        :param records: [] of {}
+            Raw records
+        :return: [] of Transaction
+            Parsed transactions (in the same order), built from their
+            columns (see parse_columns)
+        """
+
+        if not records:
+            return []
+
+        table = TransactionsTable()
+        rows = [table.raw_records.keep(raw) for raw in records]
+        table.add_columns(self.parse_columns(records), rows)
+        return list(table)
+
     def get_transactions_list(self):
         """
         :return: [] of Transaction
             List of transactions of exchange
         """
 
-        raw = self.get_raw_data()
-        for transaction in raw:
-            yield self.parse_transaction(transaction)
+        records = self.get_raw_records()
+        while True:
+            batch = list(itertools.islice(records, BATCH_SIZE))
+            if not batch:
+                return
+
+            yield from self.parse_transactions([raw for raw, _ in batch])
 
     def build_exchange(self, exchange_name):
         """
         :param exchange_name: str
             Name of exchange
         :return: CryptoExchange
-            List of transactions listed in a exchange
+            List of transactions listed in a exchange. Records are parsed a
+            batch at a time and kept as columns (and indexed), so that just
+            a batch of transactions is in memory at any time.
         """
 
+        table, index = TransactionsTable(self.raw_records), TransactionsIndex()
+        records = self.get_raw_records()
+        while True:
+            batch = list(itertools.islice(records, BATCH_SIZE))
+            if not batch:
+                break
+
+            raws = [raw for raw, _ in batch]
+            rows = [self.raw_records.add(*span) for _, span in batch]
+            table.add_columns(self.parse_columns(raws), rows)
+            index.add_raws(raws)
+
+        index.merge()
         return CryptoExchange(
-            list(self.get_transactions_list()),
-            exchange_name
+            table,
+            exchange_name,
+            store=table.get_store(),
+            index=index
         )
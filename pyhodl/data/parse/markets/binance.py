@@ -4,26 +4,79 @@
 
 """ Parse raw Binance data """
 
-from datetime import datetime
+import os
 
-from pyhodl.core.transactions import Commission, CoinAmount
-from ..core import CryptoParser
+import numpy as np
+
+from pyhodl.core.transactions import Commission, CoinAmount, TransactionType
+from pyhodl.data.symbols import SymbolsTable, get_symbols_file, \
+    parse_symbols
+from ..core import CryptoParser, to_amounts, nonzero_amounts, ms_to_ns, \
+    ms_to_date
+
+DATE_KEYS = {
+    TransactionType.TRADING: "time",
+    TransactionType.DEPOSIT: "insertTime",
+    TransactionType.WITHDRAWAL: "successTime"
+}  # type -> key of timestamp (ms)
+SUCCESS_STATUS = {
+    TransactionType.DEPOSIT: 1,
+    TransactionType.WITHDRAWAL: 6
+}  # type -> status of completed transaction
 
 
 class BinanceParser(CryptoParser):
     """ Parses Binance transactions data """
 
+    VERSION = 4  # cache entries keep markets they have been split into
+
+    def __init__(self, input_file, records=None):
+        super().__init__(input_file, records)
+
+        self.symbols = None  # table of markets, loaded when needed
+        self.markets = {}  # symbol -> base and quote coin of markets traded
+
+    def get_cache_data(self):
+        return {
+            "markets": {
+                symbol: list(coins) for symbol, coins in self.markets.items()
+            }
+        }
+
+    @classmethod
+    def is_valid_cache_data(cls, input_file, data):
+        markets = data.get("markets", {})
+        if not markets:
+            return True  # no trade, nothing to resolve
+
+        table = SymbolsTable(parse_symbols(cls.get_symbols_file(input_file)))
+        return all(
+            list(coins) == list(table.get_coins(symbol))
+            for symbol, coins in markets.items()
+        )
+
+    @staticmethod
+    def get_symbols_file(input_file):
+        """
+        :param input_file: str
+            File to parse
+        :return: str
+            Symbols table saved by updater along with file
+        """
+
+        return get_symbols_file(
+            os.path.dirname(os.path.abspath(input_file)), "binance"
+        )
+
     def get_coin_moved(self, raw, coin_key="asset", amount_key="amount"):
         return super().get_coin_moved(raw, coin_key, amount_key)
 
-    @staticmethod
-    def get_coins_amount_traded(raw):
-        coin_buy, coin_sell = BinanceParser.get_coins_traded(raw)
+    def get_coins_amount_traded(self, raw):
+        coin_buy, coin_sell = self.get_coins_traded(raw)
         amount_buy, amount_sell = BinanceParser.get_amount_traded(raw)
         return coin_buy, amount_buy, coin_sell, amount_sell
 
-    @staticmethod
-    def get_coins_traded(raw):
+    def get_coins_traded(self, raw):
         """
         :param raw: {}
             Raw details of transaction
@@ -31,17 +84,36 @@ class BinanceParser(CryptoParser):
             Coin bought, coin sold, in case of trading data
         """
 
-        market = raw["symbol"]
-        if market.endswith("USDT"):
-            coin_buy, coin_sell = market.replace("USDT", ""), "USDT"
-        else:
-            coin_buy, coin_sell = market[:-3], market[-3:]
-
+        coin_buy, coin_sell = self.get_market_coins(raw["symbol"])
         if raw["isBuyer"]:
             return coin_buy, coin_sell
 
         return coin_sell, coin_buy
 
+    def get_symbols_table(self):
+        """
+        :return: SymbolsTable
+            Markets saved by updater along with file (read once)
+        """
+
+        if self.symbols is None:
+            self.symbols = SymbolsTable(
+                parse_symbols(self.get_symbols_file(self.input_file))
+            )
+        return self.symbols
+
+    def get_market_coins(self, market):
+        """
+        :param market: str
+            Symbol of market (e.g ETHBTC)
+        :return: tuple (str, str)
+            Base and quote coin of market
+        """
+
+        coins = self.get_symbols_table().get_coins(market)
+        self.markets[market] = coins
+        return coins
+
     @staticmethod
     def get_amount_traded(raw):
         """
@@ -75,17 +147,11 @@ class BinanceParser(CryptoParser):
 
     def get_date(self, raw):
         if self.is_trade(raw):
-            return datetime.fromtimestamp(
-                int(raw["time"]) / 1000  # ms -> s
-            )
+            return ms_to_date(raw["time"])
         elif self.is_deposit(raw):
-            return datetime.fromtimestamp(
-                int(raw["insertTime"]) / 1000  # ms -> s
-            )
+            return ms_to_date(raw["insertTime"])
         elif self.is_withdrawal(raw):
-            return datetime.fromtimestamp(
-                int(raw["successTime"]) / 1000  # ms -> s
-            )
+            return ms_to_date(raw["successTime"])
 
     def is_successful(self, raw):
         if self.is_trade(raw):
@@ -106,5 +172,85 @@ class BinanceParser(CryptoParser):
     def is_withdrawal(self, raw):
         return "applyTime" in raw
 
+    def get_record_types(self, records):
+        return np.array([
+            TransactionType.TRADING.value if "isBuyer" in raw else
+            TransactionType.DEPOSIT.value if "insertTime" in raw else
+            TransactionType.WITHDRAWAL.value if "applyTime" in raw else
+            TransactionType.NULL.value
+            for raw in records
+        ], dtype=np.uint8)
+
+    def parse_group(self, records, transaction_type):
+        if transaction_type not in DATE_KEYS:
+            return super().parse_group(records, transaction_type)
+
+        date_key = DATE_KEYS[transaction_type]
+        dates = ms_to_ns([raw[date_key] for raw in records])
+        if transaction_type == TransactionType.TRADING:
+            successful = ["commission" in raw for raw in records]
+            buy, sell = self.get_group_traded(records)
+        else:
+            status = SUCCESS_STATUS[transaction_type]
+            successful = np.array([
+                raw["status"] for raw in records
+            ]).astype(np.int64) == status
+            coins = [raw["asset"] for raw in records]
+            amounts = nonzero_amounts(np.abs(np.array([
+                raw["amount"] for raw in records
+            ], dtype=np.float64)))
+            no_coins = ([None] * len(records), amounts)
+            if transaction_type == TransactionType.DEPOSIT:
+                buy, sell = (coins, amounts), no_coins
+            else:
+                buy, sell = no_coins, (coins, amounts)
+
+        successful = np.asarray(successful).tolist()
+        fees = [
+            raw if "commissionAsset" in raw else None for raw in records
+        ]
+        return self.build_columns(records, transaction_type, {
+            "date": dates,
+            "successful": successful,
+            "buy": buy,
+            "sell": sell,
+            "fee": (
+                fees,
+                [raw["commissionAsset"] if raw else None for raw in fees],
+                to_amounts([raw["commission"] if raw else None
+                            for raw in fees]),
+                successful
+            )
+        })
+
+    def get_group_traded(self, records):
+        """
+        :param records: [] of {}
+            Raw trades
+        :return: tuple (tuple ([] of str, numpy array of float), tuple)
+            Coins and amounts bought, coins and amounts sold by each trade
+        """
+
+        is_buyer = np.array([bool(raw["isBuyer"]) for raw in records])
+        quantities = np.array([raw["qty"] for raw in records], dtype=float)
+        prices = np.array([raw["price"] for raw in records], dtype=float)
+        symbols = [raw["symbol"] for raw in records]
+        markets = self.get_symbols_table().resolve(symbols)  # once each
+        self.markets.update(markets)
+        bases, quotes = zip(*(markets[symbol] for symbol in symbols))
+        base_amounts, quote_amounts = \
+            nonzero_amounts(quantities), nonzero_amounts(prices * quantities)
+
+        coins_buy = [
+            base if buyer else quote
+            for base, quote, buyer in zip(bases, quotes, is_buyer.tolist())
+        ]
+        coins_sell = [
+            quote if buyer else base
+            for base, quote, buyer in zip(bases, quotes, is_buyer.tolist())
+        ]
+        return (coins_buy, np.where(is_buyer, base_amounts, quote_amounts)), \
+               (coins_sell, np.where(is_buyer, quote_amounts, base_amounts))
+
     def build_exchange(self, exchange_name="binance"):
         return super(BinanceParser, self).build_exchange(exchange_name)
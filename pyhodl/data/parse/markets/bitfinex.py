@@ -4,10 +4,18 @@
 
 """ Parse raw Bitfinex data """
 
-from datetime import datetime
+import numpy as np
 
-from pyhodl.core.transactions import Commission, CoinAmount
-from ..core import CryptoParser
+from pyhodl.core.transactions import Commission, CoinAmount, TransactionType
+from ..core import CryptoParser, nonzero_amounts, seconds_to_ns, \
+    seconds_to_date
+
+RECORD_TYPES = {
+    "Sell": TransactionType.TRADING,
+    "Buy": TransactionType.TRADING,
+    "DEPOSIT": TransactionType.DEPOSIT,
+    "WITHDRAWAL": TransactionType.WITHDRAWAL
+}  # raw type -> type of transaction
 
 
 class BitfinexParser(CryptoParser):
@@ -72,7 +80,7 @@ class BitfinexParser(CryptoParser):
         )
 
     def get_date(self, raw):
-        return datetime.fromtimestamp(int(float(raw["timestamp"])))
+        return seconds_to_date(raw["timestamp"])
 
     def is_deposit(self, raw):
         return raw["type"] == "DEPOSIT"
@@ -85,5 +93,83 @@ class BitfinexParser(CryptoParser):
 
         return False
 
+    def get_record_types(self, records):
+        return np.array([
+            RECORD_TYPES.get(raw["type"], TransactionType.NULL).value
+            for raw in records
+        ], dtype=np.uint8)
+
+    def parse_group(self, records, transaction_type):
+        if transaction_type == TransactionType.NULL:
+            return super().parse_group(records, transaction_type)
+
+        size = len(records)
+        no_coins = [None] * size
+        if transaction_type == TransactionType.TRADING:
+            fee_amounts = np.array([
+                raw["fee_amount"] for raw in records
+            ], dtype=np.float64)
+            fee_coins = [raw["fee_currency"] for raw in records]
+            successful = (fee_amounts <= 0).tolist()
+            buy, sell = self.get_group_traded(records)
+        else:
+            coins = [raw["currency"] for raw in records]
+            amounts = nonzero_amounts(np.abs(np.array([
+                raw["amount"] for raw in records
+            ], dtype=np.float64)))
+            successful = [raw["status"] == "COMPLETED" for raw in records]
+            if transaction_type == TransactionType.DEPOSIT:
+                buy, sell = (coins, amounts), (no_coins, amounts)
+                fee_coins = coins
+                fee_amounts = np.array([
+                    raw["fee"] for raw in records
+                ], dtype=np.float64)
+            else:
+                buy, sell = (no_coins, amounts), (coins, amounts)
+                fee_coins, fee_amounts = no_coins, np.full(size, np.nan)
+
+        return self.build_columns(records, transaction_type, {
+            "date": seconds_to_ns([raw["timestamp"] for raw in records]),
+            "successful": successful,
+            "buy": buy,
+            "sell": sell,
+            "fee": (
+                records, fee_coins, nonzero_amounts(np.abs(fee_amounts)),
+                successful
+            )
+        })
+
+    @staticmethod
+    def get_group_traded(records):
+        """
+        :param records: [] of {}
+            Raw trades
+        :return: tuple (tuple ([] of str, numpy array of float), tuple)
+            Coins and amounts bought, coins and amounts sold by each trade
+        """
+
+        is_buy = np.array([raw["type"] == "Buy" for raw in records])
+        amounts = np.array([raw["amount"] for raw in records], dtype=float)
+        prices = np.array([raw["price"] for raw in records], dtype=float)
+        bases = [
+            BitfinexParser.fix_coin_name(raw["symbol"][:3]) for raw in records
+        ]
+        quotes = [
+            BitfinexParser.fix_coin_name(raw["symbol"][3:]) for raw in records
+        ]
+        base_amounts, quote_amounts = \
+            nonzero_amounts(amounts), nonzero_amounts(amounts * prices)
+
+        coins_buy = [
+            base if buy else quote
+            for base, quote, buy in zip(bases, quotes, is_buy.tolist())
+        ]
+        coins_sell = [
+            quote if buy else base
+            for base, quote, buy in zip(bases, quotes, is_buy.tolist())
+        ]
+        return (coins_buy, np.where(is_buy, base_amounts, quote_amounts)), \
+               (coins_sell, np.where(is_buy, quote_amounts, base_amounts))
+
     def build_exchange(self, exchange_name="bitfinex"):
         return super().build_exchange(exchange_name)
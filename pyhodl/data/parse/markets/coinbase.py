@@ -5,9 +5,10 @@
 """ Parse raw Coinbase data """
 
 import ciso8601
+import numpy as np
 
-from pyhodl.core.transactions import Commission, CoinAmount
-from ..core import CryptoParser
+from pyhodl.core.transactions import Commission, CoinAmount, TransactionType
+from ..core import CryptoParser, nonzero_amounts
 
 
 class CoinbaseParser(CryptoParser):
@@ -69,11 +70,133 @@ class CoinbaseParser(CryptoParser):
     def is_successful(self, raw):
         return raw["status"] == "completed"
 
-    def get_transactions_list(self):
-        raw = self.get_raw_data()
-        for _, transactions in raw.items():
-            for transaction in transactions:
-                yield self.parse_transaction(transaction)
+    def get_record_types(self, records):
+        is_trade = np.array([
+            raw["type"] in ["buy", "sell"] for raw in records
+        ], dtype=bool)
+        amounts, native_amounts = self.get_group_amounts(records)
+        types = np.where(
+            (amounts >= 0) & (native_amounts >= 0),
+            TransactionType.DEPOSIT.value,
+            np.where(
+                (amounts < 0) & (native_amounts < 0),
+                TransactionType.WITHDRAWAL.value, TransactionType.NULL.value
+            )
+        )
+        return np.where(
+            is_trade, TransactionType.TRADING.value, types
+        ).astype(np.uint8)
+
+    @staticmethod
+    def get_group_amounts(records):
+        """
+        :param records: [] of {}
+            Raw records
+        :return: tuple (numpy array of float, numpy array of float)
+            Amount and native amount of each record
+        """
+
+        return np.array([
+            raw["amount"]["amount"] for raw in records
+        ], dtype=np.float64), np.array([
+            raw["native_amount"]["amount"] for raw in records
+        ], dtype=np.float64)
+
+    @staticmethod
+    def get_network_fee(raw):
+        """
+        :param raw: {}
+            Raw record
+        :return: tuple (str, float, bool)
+            Coin, amount (NaN if missing) and status of network fee (None if
+            there is no valid one)
+        """
+
+        try:
+            network = raw["network"]
+            amount = network["transaction_fee"]["amount"]
+            return network["transaction_fee"]["currency"], \
+                float(amount) if amount else np.nan, \
+                network["status"] == "confirmed"
+        except (KeyError, TypeError, ValueError):
+            return None
+
+    def get_group_fees(self, records):
+        """
+        :param records: [] of {}
+            Raw records
+        :return: tuple ([] of {}, [] of str, numpy array of float, [] of
+            bool)
+            Raw network data, coin, amount and status of fee of each record
+            (None raw data if there is no fee)
+        """
+
+        fees = [self.get_network_fee(raw) for raw in records]
+        return [
+            raw["network"] if fee else None for raw, fee in zip(records, fees)
+        ], [fee[0] if fee else None for fee in fees], np.array([
+            fee[1] if fee else np.nan for fee in fees
+        ], dtype=np.float64), [fee[2] if fee else None for fee in fees]
+
+    def get_group_traded(self, records):
+        """
+        :param records: [] of {}
+            Raw trades
+        :return: tuple (tuple ([] of str, numpy array of float), tuple)
+            Coins and amounts bought, coins and amounts sold by each trade
+        """
+
+        amounts, native_amounts = self.get_group_amounts(records)
+        amounts, native_amounts = \
+            nonzero_amounts(np.abs(amounts)), \
+            nonzero_amounts(np.abs(native_amounts))
+        coins_buy, coins_sell = [], []
+        is_sell = []
+        for raw in records:
+            coin, currency = \
+                raw["amount"]["currency"], raw["native_amount"]["currency"]
+            if coin == currency:  # just a fiat log to discard
+                coin, currency = None, None
+            is_sell.append(raw["type"] == "sell")
+            coins_buy.append(currency if is_sell[-1] else coin)
+            coins_sell.append(coin if is_sell[-1] else currency)
+
+        is_sell = np.array(is_sell, dtype=bool)
+        return (coins_buy, np.where(is_sell, native_amounts, amounts)), \
+               (coins_sell, np.where(is_sell, amounts, native_amounts))
+
+    def get_group_moved(self, records, transaction_type):
+        """
+        :param records: [] of {}
+            Raw deposits, withdrawals or other moves
+        :param transaction_type: TransactionType
+            Type of records
+        :return: tuple (tuple ([] of str, numpy array of float), tuple)
+            Coins and amounts bought, coins and amounts sold by each record
+        """
+
+        coins = [raw["amount"]["currency"] for raw in records]
+        amounts = nonzero_amounts(np.abs(self.get_group_amounts(records)[0]))
+        no_coins = ([None] * len(records), amounts)
+        if transaction_type == TransactionType.DEPOSIT:
+            return (coins, amounts), no_coins
+        return no_coins, (coins, amounts)
+
+    def parse_group(self, records, transaction_type):
+        if transaction_type == TransactionType.TRADING:
+            buy, sell = self.get_group_traded(records)
+        else:
+            buy, sell = self.get_group_moved(records, transaction_type)
+
+        return self.build_columns(records, transaction_type, {
+            "date": [
+                ciso8601.parse_datetime(raw["updated_at"]) for raw in records
+            ],
+            "successful": [raw["status"] == "completed" for raw in records],
+            "buy": buy,
+            "sell": sell,
+            "fee": self.get_group_fees(records)
+        })
 
     def build_exchange(self, exchange_name="coinbase"):
         return super().build_exchange(exchange_name)
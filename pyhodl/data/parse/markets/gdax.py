@@ -5,8 +5,16 @@
 """ Parse raw Gdax data """
 
 import ciso8601
+import numpy as np
 
+from pyhodl.core.transactions import TransactionType
 from .coinbase import CoinbaseParser
+from ..core import nonzero_amounts
+
+TRANSFER_TYPES = {
+    "deposit": TransactionType.DEPOSIT,
+    "withdraw": TransactionType.WITHDRAWAL
+}  # raw transfer type -> type of transaction
 
 
 class GdaxParser(CoinbaseParser):
@@ -51,5 +59,34 @@ class GdaxParser(CoinbaseParser):
     def is_successful(self, raw):
         return True  # always
 
+    def get_record_types(self, records):
+        return np.array([
+            TransactionType.TRADING.value if "product_id" in raw["details"]
+            else TRANSFER_TYPES.get(
+                self.get_transfer_type(raw), TransactionType.NULL
+            ).value
+            for raw in records
+        ], dtype=np.uint8)
+
+    def parse_group(self, records, transaction_type):
+        amounts = np.array([raw["amount"] for raw in records], dtype=float)
+        coins = [raw["currency"] for raw in records]
+        is_buy = amounts >= 0
+        amounts = nonzero_amounts(np.abs(amounts))
+        return self.build_columns(records, transaction_type, {
+            "date": [
+                ciso8601.parse_datetime(raw["created_at"]) for raw in records
+            ],
+            "successful": [True] * len(records),
+            "buy": ([
+                coin if buy else None
+                for coin, buy in zip(coins, is_buy.tolist())
+            ], amounts),
+            "sell": ([
+                None if buy else coin
+                for coin, buy in zip(coins, is_buy.tolist())
+            ], amounts)
+        })
+
     def build_exchange(self, exchange_name="gdax"):
         return super().build_exchange(exchange_name)
@@ -0,0 +1,225 @@
+# !/usr/bin/python3
+# coding: utf_8
+
+
+""" Read records of big JSON files one at a time """
+
+import json
+
+CHUNK_SIZE = 1 << 16  # characters read at a time
+WHITESPACE = " \t\n\r"
+
+
+class JSONStream:
+    """ Reads a JSON file incrementally: only the record being decoded (and
+    a chunk of file) are kept in memory. Position (in bytes) of each record
+    in file is tracked too, to read it again later. """
+
+    def __init__(self, input_file, chunk_size=CHUNK_SIZE):
+        """
+        :param input_file: str
+            File to read
+        :param chunk_size: int
+            Number of characters read at a time
+        """
+
+        self.input_file = input_file
+        self.chunk_size = int(chunk_size)
+        self.decoder = json.JSONDecoder()
+        self.stream = None
+        self.buffer = ""
+        self.position = 0  # of next character to read in buffer
+        self.is_over = False  # all file has been read
+        self.mark = 0  # character of buffer whose offset is known
+        self.offset = 0  # in file (bytes) of marked character
+
+    def _read(self, size=None):
+        """
+        :param size: int
+            Number of characters to read (chunk size if None)
+        :return: bool
+            True iff something has been read from file
+        """
+
+        if self.is_over:
+            return False
+
+        chunk = self.stream.read(size or self.chunk_size)
+        if not chunk:
+            self.is_over = True
+            return False
+
+        if self.position > self.chunk_size:  # drop what has been read
+            self._get_offset(self.position)
+            self.buffer = self.buffer[self.position:]
+            self.position, self.mark = 0, 0
+        self.buffer += chunk
+        return True
+
+    def _get_offset(self, position):
+        """
+        :param position: int
+            Character of buffer (not before the marked one)
+        :return: int
+            Offset of character in file (bytes). Character is then marked,
+            so that each character is encoded just once.
+        """
+
+        self.offset += len(self.buffer[self.mark:position].encode("utf-8"))
+        self.mark = position
+        return self.offset
+
+    def _peek(self):
+        """
+        :return: str
+            Next character which is not whitespace ("" if file is over)
+        """
+
+        while True:
+            while self.position < len(self.buffer) and \
+                    self.buffer[self.position] in WHITESPACE:
+                self.position += 1
+            if self.position < len(self.buffer) or not self._read():
+                return self.buffer[self.position:self.position + 1]
+
+    def _expect(self, characters):
+        """
+        :param characters: str
+            Characters allowed
+        :return: str
+            Next character (which is then skipped)
+        """
+
+        character = self._peek()
+        if not character or character not in characters:
+            raise ValueError(
+                "Expecting one of", characters, "in", self.input_file,
+                "but found", character
+            )
+        self.position += 1
+        return character
+
+    def _decode(self):
+        """
+        :return: *
+            Next JSON value (which is then skipped)
+        """
+
+        self._peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(
+                    self.buffer, self.position
+                )
+                if end < len(self.buffer) or self.is_over:
+                    self.position = end
+                    return value  # not truncated (e.g numbers)
+            except json.JSONDecodeError:
+                if self.is_over:
+                    raise
+
+            # value goes beyond buffer: read as much as is buffered again
+            self._read(max(self.chunk_size, len(self.buffer)))
+
+    def _iter_array(self, key):
+        """
+        :param key: str
+            Key of array (None if array is top-level)
+        :return: generator of (str, *, tuple (int, int))
+            Key, each item of array and its offset and length (bytes) in
+            file (opening bracket already skipped)
+        """
+
+        if self._peek() == "]":
+            self.position += 1
+            return
+
+        while True:
+            self._peek()  # skips whitespace
+            start = self._get_offset(self.position)
+            item = self._decode()
+            yield key, item, (start, self._get_offset(self.position) - start)
+            if self._expect(",]") == "]":
+                return
+
+    def _iter_object(self):
+        """
+        :return: generator of (str, *, tuple (int, int))
+            Key and each item of each array value, or key and value if it
+            is not an array, with their offset and length (bytes) in file
+            (opening brace already skipped)
+        """
+
+        if self._peek() == "}":
+            self.position += 1
+            return
+
+        while True:
+            key = self._decode()
+            self._expect(":")
+            if self._peek() == "[":
+                self.position += 1
+                yield from self._iter_array(key)
+            else:
+                start = self._get_offset(self.position)
+                value = self._decode()
+                yield key, value, \
+                    (start, self._get_offset(self.position) - start)
+
+            if self._expect(",}") == "}":
+                return
+
+    def iter_spans(self):
+        """
+        :return: generator of (str, *, tuple (int, int))
+            Each item of top-level array (with None key), or each item of
+            each array in top-level object (with key of array), with its
+            offset and length (bytes) in file
+        """
+
+        # no newline translation, not to change offsets of characters
+        with open(self.input_file, "r", encoding="utf-8", newline="") as \
+                stream:
+            self.stream = stream
+            self.buffer, self.position, self.is_over = "", 0, False
+            self.mark, self.offset = 0, 0
+            if self._expect("[{") == "[":
+                yield from self._iter_array(None)
+            else:
+                yield from self._iter_object()
+
+    def iter_items(self):
+        """
+        :return: generator of (str, *)
+            Each item of top-level array (with None key), or each item of
+            each array in top-level object (with key of array)
+        """
+
+        for key, item, _ in self.iter_spans():
+            yield key, item
+
+    def __iter__(self):
+        for _, record in self.iter_items():
+            yield record
+
+
+def iter_records(input_file, chunk_size=CHUNK_SIZE, spans=False):
+    """
+    :param input_file: str
+        JSON file with an array of records, or an object with an array of
+        records for each key (e.g by account)
+    :param chunk_size: int
+        Number of characters read at a time
+    :param spans: bool
+        True iff you want offset and length (bytes) of each record in file
+        too
+    :return: generator of {} (or of ({}, tuple (int, int)) with spans)
+        Each record in file
+    """
+
+    stream = JSONStream(input_file, chunk_size)
+    if spans:
+        return (
+            (record, span) for _, record, span in stream.iter_spans()
+        )
+    return iter(stream)
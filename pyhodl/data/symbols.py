@@ -0,0 +1,127 @@
+# !/usr/bin/python3
+# coding: utf_8
+
+
+""" Input/output tables of exchange market symbols (e.g ETHBTC) and their
+base and quote coins, to split symbols without guessing """
+
+import os
+
+from hal.files.parsers import JSONParser
+from hal.files.save_as import write_dicts_to_json
+
+QUOTE_COINS = [
+    "FDUSD", "TUSD", "BUSD", "USDC", "USDT", "BTC", "ETH", "BNB"
+]  # quote coins of markets missing in table (longest match is used)
+QUOTE_LENGTH = 3  # of quote coin when none of the known ones matches
+
+
+def get_symbols_file(folder, exchange):
+    """
+    :param folder: str
+        Folder with exchange data
+    :param exchange: str
+        Exchange name
+    :return: str
+        Path to symbols table of exchange
+    """
+
+    return os.path.join(
+        folder,
+        exchange.title() + "Symbols.json"
+    )
+
+
+def get_symbols_table(exchange_info):
+    """
+    :param exchange_info: {}
+        Exchange info as given by Binance API
+    :return: {} of str -> [str, str]
+        Market symbol -> base and quote coin of each market of exchange
+    """
+
+    return {
+        market["symbol"]: [market["baseAsset"], market["quoteAsset"]]
+        for market in exchange_info.get("symbols", [])
+    }
+
+
+def parse_symbols(input_file):
+    """
+    :param input_file: str
+        Parse symbols table from this file
+    :return: {} of str -> [str, str]
+        Symbols table (empty if there is no file or its content is corrupted)
+    """
+
+    if os.path.exists(input_file):
+        try:
+            content = JSONParser(input_file).get_content()
+            return {
+                symbol: [str(base), str(quote)]
+                for symbol, (base, quote) in content.items()
+            }
+        except:
+            pass
+    return {}
+
+
+def save_symbols(table, output_file):
+    """
+    :param table: {} of str -> [str, str]
+        Symbols table
+    :param output_file: str
+        Path to save data to
+    :return: void
+        Saves symbols table to file, keeping markets no more listed (their
+        trades are still in old data)
+    """
+
+    content = parse_symbols(output_file)
+    content.update(table)
+    write_dicts_to_json(content, output_file)
+
+
+class SymbolsTable:
+    """ Resolves market symbols to their base and quote coin """
+
+    def __init__(self, table=None):
+        """
+        :param table: {} of str -> [str, str]
+            Market symbol -> base and quote coin of each known market
+        """
+
+        self.table = {
+            symbol: tuple(coins) for symbol, coins in (table or {}).items()
+        }
+        quotes = set(QUOTE_COINS)
+        quotes.update(quote for _, quote in self.table.values())
+        self.quotes = sorted(quotes, key=len, reverse=True)
+
+    def get_coins(self, symbol):
+        """
+        :param symbol: str
+            Symbol of market (e.g ETHBTC)
+        :return: tuple (str, str)
+            Base and quote coin of market
+        """
+
+        coins = self.table.get(symbol)
+        if coins is not None:
+            return coins
+
+        for quote in self.quotes:
+            if len(symbol) > len(quote) and symbol.endswith(quote):
+                return symbol[:-len(quote)], quote
+
+        return symbol[:-QUOTE_LENGTH], symbol[-QUOTE_LENGTH:]
+
+    def resolve(self, symbols):
+        """
+        :param symbols: [] of str
+            Symbols of markets
+        :return: {} of str -> tuple (str, str)
+            Base and quote coin of each distinct market
+        """
+
+        return {symbol: self.get_coins(symbol) for symbol in set(symbols)}
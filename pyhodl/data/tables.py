@@ -7,11 +7,12 @@
 import os
 from bisect import bisect
 
+import numpy as np
 from hal.files.parsers import JSONParser
 
 from pyhodl.config import HISTORICAL_DATA_FOLDER, DATE_TIME_KEY, VALUE_KEY, \
     INFINITY, get_coin_historical_data_file, SECONDS_IN_HOUR
-from pyhodl.utils.dates import parse_datetime
+from pyhodl.utils.dates import parse_datetime, dates_to_ns_array
 
 
 class DatetimeTable(JSONParser):
@@ -33,6 +34,7 @@ class DatetimeTable(JSONParser):
             for item in self.get_content()
         }  # date -> raw dict
         self.dates = sorted(self.content.keys())  # sorted list of all dates
+        self.dates_array = dates_to_ns_array(self.dates)  # epoch ns
         self.max_error = float(max_error_search)  # seconds
 
     def get_content(self):
@@ -75,6 +77,19 @@ class DatetimeTable(JSONParser):
         for date in dates:
             yield self.get_values_on(date)
 
+    def get_indexes_on(self, dates):
+        """
+        :param dates: [] of datetime, numpy array of datetime64 or int64
+            List of dates to fetch
+        :return: numpy array of int
+            Index (in sorted dates) of values for each date, i.e the last
+            one not after date (-1 if there is none)
+        """
+
+        return np.searchsorted(
+            self.dates_array, dates_to_ns_array(dates), side="right"
+        ) - 1
+
     def get_values_between(self, since, until):
         """
         :param since: datetime
@@ -100,6 +115,8 @@ class MarketDataTable(DatetimeTable):
             3 * SECONDS_IN_HOUR  # 3 hours
         )
 
+        self.column = None  # market cap on each date (built when needed)
+
     def get_value_on(self, date_time):
         """
         :param date_time: datetime
@@ -111,6 +128,29 @@ class MarketDataTable(DatetimeTable):
         raw_data = self.get_values_on(date_time)
         return raw_data[VALUE_KEY]
 
+    def get_values_on_dates_of(self, dates):
+        """
+        :param dates: [] of datetime, numpy array of datetime64 or int64
+            Dates to fetch
+        :return: numpy array of float
+            Market cap on each date, i.e the last one not after date (NaN if
+            not available)
+        """
+
+        if self.column is None:
+            values = (self.content[date].get(VALUE_KEY) for date in self.dates)
+            self.column = np.array([
+                np.nan if value is None else float(value) for value in values
+            ], dtype=np.float64)
+
+        indexes = self.get_indexes_on(dates)
+        if not len(self.column):
+            return np.full(len(indexes), np.nan)
+
+        return np.where(
+            indexes >= 0, self.column[np.maximum(indexes, 0)], np.nan
+        )
+
 
 class CoinPricesTable(DatetimeTable):
     """ Parse market data files """
@@ -123,6 +163,7 @@ class CoinPricesTable(DatetimeTable):
         )
 
         self.base_currency = currency.upper()
+        self.columns = {}  # coin -> price on each date (built when needed)
 
     def get_value_on(self, coin, date_time):
         """
@@ -143,8 +184,45 @@ class CoinPricesTable(DatetimeTable):
 
         return None
 
+    def get_column(self, coin):
+        """
+        :param coin: str
+            Coin to convert
+        :return: numpy array of float
+            Currency value of coin on each date of table (NaN if missing)
+        """
+
+        coin = coin.upper()
+        if coin not in self.columns:
+            prices = (self.content[date].get(coin) for date in self.dates)
+            self.columns[coin] = np.array([
+                np.nan if price is None else float(price) for price in prices
+            ], dtype=np.float64)
+        return self.columns[coin]
+
+    def get_values_on_dates_of(self, coin, dates):
+        """
+        :param coin: str
+            Coin to convert
+        :param dates: [] of datetime, numpy array of datetime64 or int64
+            Dates of conversion
+        :return: numpy array of float
+            Currency value of coin on each date (NaN if not available)
+        """
+
+        if coin.upper() == self.base_currency:
+            return np.ones(len(dates))
+
+        indexes = self.get_indexes_on(dates)
+        column = self.get_column(coin)
+        if not len(column):
+            return np.full(len(indexes), np.nan)
+
+        return np.where(indexes >= 0, column[np.maximum(indexes, 0)], np.nan)
+
 
 COINS_PRICES_TABLE = CoinPricesTable("USD")
+PRICES_TABLES = {"USD": COINS_PRICES_TABLE}  # currency -> table
 
 
 def get_coin_prices_table(currency="USD"):
@@ -155,7 +233,8 @@ def get_coin_prices_table(currency="USD"):
         Database of price
     """
 
-    if currency == "USD":
-        return COINS_PRICES_TABLE
+    currency = str(currency).upper()
+    if currency not in PRICES_TABLES:
+        PRICES_TABLES[currency] = CoinPricesTable(currency)
 
-    return CoinPricesTable(currency)
+    return PRICES_TABLES[currency]
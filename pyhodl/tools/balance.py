@@ -7,28 +7,46 @@
 from datetime import datetime
 
 import colorama
+import numpy as np
 from colorama import Fore
 from hal.streams.pretty_table import pretty_format_table
 
 from pyhodl.config import VALUE_KEY, DATE_TIME_KEY
+from pyhodl.core.analytics import get_total_returns, get_returns_state
 from pyhodl.core.portfolio import Portfolio
 from pyhodl.data.balance import get_balance_file, parse_balance, save_balance
-from pyhodl.data.parse.build import build_exchanges
+from pyhodl.data.checkpoints import get_checkpoint_file, parse_checkpoint, \
+    save_checkpoint, get_total_checkpoint_file, get_returns_file
+from pyhodl.data.coins import DEFAULT_FIAT
+from pyhodl.data.parse.build import build_file_exchanges
 from pyhodl.utils.misc import get_relative_delta, \
-    get_relative_percentage, print_balance_info, num_to_str
+    get_relative_percentage, print_balance_info, num_to_str, color_number
 
 
 class Balance:
     """ Deal with exchanges, wallets balances """
 
-    def __init__(self, input_folder, color=False):
+    def __init__(self, input_folder, color=False, fixed_point=False,
+                 workers=1):
         """
         :param color: bool
             True iff you want colorful output
+        :param fixed_point: bool
+            True iff you want balances summed exactly as integer units
+        :param workers: int
+            Number of processes parsing exchange files at the same time
         """
 
         self.color = bool(color)
-        self.exchanges = list(build_exchanges(input_folder))
+        self.fixed_point = bool(fixed_point)
+        files = list(
+            build_file_exchanges(input_folder, workers=max(1, int(workers)))
+        )
+        self.files = [input_file for input_file, _ in files]  # of exchanges
+        self.exchanges = [exchange for _, exchange in files]
+        self.wallets = []  # wallets of each exchange (from its checkpoint)
+        self.checkpoints = []  # checkpoint loaded (None if not valid) and
+        # new one of each exchange
 
     def print(self):
         """
@@ -40,8 +58,8 @@ class Balance:
         last_total = 0.0
         last_time = None
 
-        for exchange in self.exchanges:
-            total, last, last_time = self.print_exchange(exchange)
+        for input_file, exchange in zip(self.files, self.exchanges):
+            total, last, last_time = self.print_exchange(exchange, input_file)
             total_value += total
             last_total += last if last else 0.0
 
@@ -51,6 +69,103 @@ class Balance:
         print("\n")  # space between single exchanges and total value
         print_balance_info(total_value, delta, percentage, last_time,
                            color=self.color)
+        self.print_total_returns()
+
+    def _is_valid_total(self, checkpoint):
+        """
+        :param checkpoint: {}
+            Checkpoint of returns of all exchanges
+        :return: bool
+            True iff it has been saved with the checkpoints of exchanges
+            loaded (all valid) and no exchange has transactions between the
+            date of its checkpoint and the one of total
+        """
+
+        if not checkpoint or checkpoint["returns"] is None or \
+                checkpoint["returns"]["currency"] != str(DEFAULT_FIAT) or \
+                len(checkpoint["exchanges"]) != len(self.exchanges):
+            return False
+
+        for input_file, exchange, (loaded, _), saved in zip(
+                self.files, self.exchanges, self.checkpoints,
+                checkpoint["exchanges"]):
+            if loaded is None or saved != [
+                    input_file, loaded["date"], loaded["history"]
+            ]:
+                return False
+
+            dates = exchange.get_dates_index().dates
+            if np.searchsorted(dates, checkpoint["date"], side="right") != \
+                    loaded["count"]:
+                return False
+        return True
+
+    def print_total_returns(self):
+        """
+        :return: void
+            Prints returns of all exchanges, updating the ones saved in their
+            checkpoint with just newer transactions (all exchanges are
+            replayed only if it is not valid)
+        """
+
+        if not self.exchanges:
+            return
+
+        checkpoint_file = get_total_checkpoint_file()
+        checkpoint = parse_checkpoint(checkpoint_file)
+        state = None
+        if self._is_valid_total(checkpoint):
+            state = checkpoint["returns"]
+            wallets = [
+                wallet for wallets in self.wallets for wallet in wallets
+            ]
+        else:  # from first transaction of each exchange
+            wallets = [
+                wallet
+                for exchange, wallets, (loaded, _) in zip(
+                    self.exchanges, self.wallets, self.checkpoints)
+                for wallet in (
+                    wallets if loaded is None else
+                    exchange.build_wallets(self.fixed_point).values()
+                )
+            ]
+
+        date = max(new["date"] for _, new in self.checkpoints)
+        state = get_returns_state(wallets, date, state=state)
+        self.print_returns(wallets, state)
+        if state is None:  # prices are missing: nothing to extend later
+            return
+
+        save_checkpoint({
+            "date": date,
+            "exchanges": [
+                [input_file, new["date"], new["history"]]
+                for input_file, (_, new) in zip(self.files, self.checkpoints)
+            ],
+            "returns": state
+        }, checkpoint_file)
+
+    def print_returns(self, wallets, state=None):
+        """
+        :param wallets: [] of Wallet
+            Wallets to get returns of
+        :param state: {}
+            State of returns wallets start from (see get_returns_state)
+        :return: void
+            Prints time-weighted and money-weighted returns of wallets, i.e
+            without counting deposits and withdrawals as profits
+        """
+
+        twr, irr = get_total_returns(wallets, state=state)
+        if twr is None:
+            return
+
+        twr, irr = num_to_str(twr * 100.0), num_to_str(irr * 100.0)
+        if self.color:  # colorful output
+            twr, irr = color_number(twr), color_number(irr)
+
+        print("Time-weighted return: ~", twr, "%")
+        print("Money-weighted return: ~", irr, "% per year")
 
     def pretty_balances(self, balances, last):
         """
@@ -75,17 +190,26 @@ class Balance:
             ], table
         )
 
-    def print_exchange(self, exchange):
+    def print_exchange(self, exchange, input_file):
         """
         :param exchange: CryptoExchange
             Exchange to get balance of
+        :param input_file: str
+            File exchange has been parsed from (its checkpoint is keyed by
+            it)
         :return: void
             Prints balance of exchange
         """
 
         print("\nExchange:", exchange.exchange_name.title())
 
-        portfolio = Portfolio(exchange.build_wallets().values())
+        checkpoint_file = get_checkpoint_file(input_file)
+        checkpoint = parse_checkpoint(checkpoint_file)
+        if not exchange.is_valid_checkpoint(checkpoint, self.fixed_point):
+            checkpoint = None  # replay all transactions
+
+        wallets = exchange.build_wallets(self.fixed_point, checkpoint)
+        portfolio = Portfolio(wallets.values())
         last_file = get_balance_file(exchange.exchange_name)
         last = parse_balance(last_file) if last_file else None
         last_time = last[DATE_TIME_KEY] if last else None
@@ -95,12 +219,84 @@ class Balance:
 
         print_balance_info(total_value, delta, delta_percentage, last_time,
                            color=self.color)
+        new_checkpoint = exchange.get_checkpoint(
+            wallets, self.fixed_point, checkpoint
+        )
+        wallets = list(wallets.values())
+        returns_file = get_returns_file(input_file)
+        returns = parse_checkpoint(returns_file)
+        if not self._is_valid_returns(returns, checkpoint):
+            returns = None  # compute them again from all transactions
+        returns_wallets, state = self.get_exchange_returns(
+            exchange, wallets, new_checkpoint["date"], checkpoint, returns
+        )
+        self.print_returns(returns_wallets, state)
         print(self.pretty_balances(balances, last))
+        self.wallets.append(wallets)
+        self.checkpoints.append((checkpoint, new_checkpoint))
 
         if last_file:  # save balance
             save_balance(balances, last_file, timestamp=datetime.now())
+            save_checkpoint(new_checkpoint, checkpoint_file)
+            if state is not None:  # prices are missing: nothing to extend
+                save_checkpoint({
+                    "date": new_checkpoint["date"],
+                    "history": new_checkpoint["history"],
+                    "returns": state
+                }, returns_file)
         return total_value, last_total, last_time
 
+    def get_exchange_returns(self, exchange, wallets, date, checkpoint,
+                             returns):
+        """
+        :param exchange: CryptoExchange
+            Exchange wallets are of
+        :param wallets: [] of Wallet
+            Wallets built from checkpoint (or from all transactions)
+        :param date: int
+            Date (epoch ns) of last transaction
+        :param checkpoint: {}
+            Valid checkpoint wallets have been built from (None if they have
+            been built from all transactions)
+        :param returns: {}
+            Valid returns of exchange up to the checkpoint wallets have been
+            built from (None if there are none)
+        :return: tuple ([] of Wallet, {})
+            Wallets returns are computed with and state of returns up to
+            date (see get_returns_state), extended from the saved one. If
+            there is none (e.g prices were missing), it is computed again
+            from all transactions, while balances are still replayed from
+            checkpoint.
+        """
+
+        if returns is not None:
+            return wallets, get_returns_state(
+                wallets, date, state=returns["returns"]
+            )
+
+        if checkpoint is not None:  # recompute just returns
+            wallets = list(exchange.build_wallets(self.fixed_point).values())
+        return wallets, get_returns_state(wallets, date)
+
+    @staticmethod
+    def _is_valid_returns(returns, checkpoint):
+        """
+        :param returns: {}
+            Returns of exchange, as saved along with its checkpoint
+        :param checkpoint: {}
+            Valid checkpoint of exchange (None if there is none)
+        :return: bool
+            True iff returns have been saved with the same checkpoint (i.e up
+            to its date) in default currency
+        """
+
+        if not returns or not checkpoint:
+            return False
+
+        return returns["date"] == checkpoint["date"] and \
+            returns["history"] == checkpoint["history"] and \
+            returns["returns"]["currency"] == str(DEFAULT_FIAT)
+
     @staticmethod
     def _pretty_balance(balance, last):
         current_val = balance[VALUE_KEY]
@@ -4,8 +4,29 @@
 
 """ Get transactions stats """
 
+import numpy as np
+
 from pyhodl.data.parse.build import build_exchanges
 from pyhodl.updater.core import UpdateManager
+from pyhodl.utils.dates import dates_to_ns_array, ns_array_to_dates
+from pyhodl.utils.misc import merge_unique_sorted
+
+
+def get_dates_array(item):
+    """
+    :param item: Exchange, Wallet ...
+        Anything with 'transactions' attr
+    :return: numpy array of int64
+        Sorted dates (epoch ns) of transactions of item
+    """
+
+    if hasattr(item, "dates_array"):  # wallet: already sorted
+        return item.dates_array
+    if hasattr(item, "store"):  # exchange
+        return np.sort(item.store.dates)
+    return np.sort(dates_to_ns_array([
+        transaction.date for transaction in item.transactions
+    ]))
 
 
 def get_transactions_dates(items):
@@ -13,15 +34,12 @@ def get_transactions_dates(items):
     :param items: Exchange, Wallet ...
         Anything with 'transactions' attr
     :return: sorted [] of datetime
-        Sorted list of date and time of all transactions in list
+        Sorted list of distinct date and time of all transactions in list
     """
 
-    dates = []
-    for item in items:
-        dates += [
-            transaction.date for transaction in item.transactions
-        ]
-    return sorted(dates)
+    return ns_array_to_dates(merge_unique_sorted([
+        get_dates_array(item) for item in items
+    ]))
 
 
 def get_all_coins(exchanges):
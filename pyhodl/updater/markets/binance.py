@@ -4,6 +4,8 @@
 
 """ Updates local Binance data """
 
+from pyhodl.data.symbols import get_symbols_file, get_symbols_table, \
+    save_symbols
 from pyhodl.updater.models import ExchangeUpdater
 from pyhodl.utils.network import handle_rate_limits, get_and_sleep
 
@@ -11,6 +13,24 @@ from pyhodl.utils.network import handle_rate_limits, get_and_sleep
 class BinanceUpdater(ExchangeUpdater):
     """ Updates Binance data """
 
+    def __init__(self, api_client, data_folder, rate_limit=1,
+                 rate_limit_wait=60):
+        ExchangeUpdater.__init__(
+            self, api_client, data_folder, rate_limit, rate_limit_wait
+        )
+
+        self.symbols_file = get_symbols_file(self.folder, "binance")
+        self.symbols = {}  # market -> base and quote coin
+
+    @handle_rate_limits
+    def get_symbols_table(self):
+        """
+        :return: {} of str -> [str, str]
+            Market symbol -> base and quote coin of each market
+        """
+
+        return get_symbols_table(self.client.get_exchange_info())
+
     def get_symbols_list(self):
         """
         :return: [] of str
@@ -70,6 +90,7 @@ class BinanceUpdater(ExchangeUpdater):
         """
 
         super().get_transactions()
+        self.symbols = self.get_symbols_table()
         transactions = get_and_sleep(
             self.get_symbols_list(),
             self.get_all_transactions,
@@ -78,3 +99,13 @@ class BinanceUpdater(ExchangeUpdater):
         )
         self.transactions = \
             transactions + self.get_deposits() + self.get_withdraw()
+
+    def save_data(self):
+        """
+        :return: void
+            Saves transactions and symbols table (next to them) to file
+        """
+
+        super().save_data()
+        if self.symbols:
+            save_symbols(self.symbols, self.symbols_file)
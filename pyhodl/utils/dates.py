@@ -7,10 +7,13 @@
 import time
 from datetime import timedelta, datetime
 
+import numpy as np
 import pytz
 
 from pyhodl.config import DATE_TIME_FORMAT, SECONDS_IN_HOUR
 
+EPOCH = datetime(1970, 1, 1, tzinfo=pytz.utc)
+
 
 def generate_dates(since, until, hours):
     """
@@ -77,6 +80,29 @@ def unix_timestamp_s_to_datetime(seconds):
     return localize(date_time)  # utc as default time zone
 
 
+def datetime_to_unix_timestamp_ns(date_time):
+    """
+    :param date_time: datetime
+        Date and time (UTC if not localized)
+    :return: int
+        Unix timestamp (nanoseconds)
+    """
+
+    delta = localize(date_time) - EPOCH
+    return (delta // timedelta(microseconds=1)) * 1000
+
+
+def unix_timestamp_ns_to_datetime(nanoseconds):
+    """
+    :param nanoseconds: int
+        Unix timestamp (nanoseconds)
+    :return: datetime
+        Date and time (UTC)
+    """
+
+    return EPOCH + timedelta(microseconds=int(nanoseconds) // 1000)
+
+
 def parse_datetime(raw):
     """
     :param raw: str
@@ -167,6 +193,60 @@ def floats_to_dates(lst):
     ]
 
 
+def dates_to_ns_array(lst):
+    """
+    :param lst: [] of datetime, numpy array of datetime64 or int64
+        List of dates
+    :return: numpy array of int64
+        Unix timestamps (nanoseconds)
+    """
+
+    if isinstance(lst, np.ndarray):
+        if np.issubdtype(lst.dtype, np.datetime64):
+            return lst.astype("datetime64[ns]").view(np.int64)
+        if np.issubdtype(lst.dtype, np.integer):
+            return lst.astype(np.int64, copy=False)
+
+    return np.array([
+        datetime_to_unix_timestamp_ns(date_time) for date_time in lst
+    ], dtype=np.int64)
+
+
+def ns_array_to_dates(lst):
+    """
+    :param lst: numpy array of int64
+        Unix timestamps (nanoseconds)
+    :return: [] of datetime
+        List of dates (UTC)
+    """
+
+    return [
+        unix_timestamp_ns_to_datetime(nanoseconds)
+        for nanoseconds in lst.tolist()
+    ]
+
+
+def get_buckets(since, until, freq):
+    """
+    :param since: int
+        First date (epoch ns)
+    :param until: int
+        Last date (epoch ns)
+    :param freq: str
+        Width of each bucket, written in short format (e.g 1h, 1d, 1w)
+    :return: numpy array of int64
+        Start date (epoch ns) of each bucket, aligned to width, covering
+        dates from since to until
+    """
+
+    step = parse_timedelta(freq) // timedelta(microseconds=1) * 1000
+    if step <= 0:
+        raise ValueError("Cannot resample with interval", freq)
+
+    first = since // step * step
+    return np.arange(first, until + 1, step, dtype=np.int64)
+
+
 def parse_timedelta(raw):
     """
     :param raw: str
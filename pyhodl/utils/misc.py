@@ -15,6 +15,8 @@ from .dates import datetime_to_str, get_delta_hours
 
 LONG_DEC_FORMAT = "{0:.5f}"
 SHORT_DEC_FORMAT = "{0:.3f}"
+MAX_EXACT_UNITS = 2 ** 51  # floats below it (times 10^decimals) round back
+# to the same integer units they have been parsed from
 
 
 def get_actual_class_name(class_name):
@@ -80,6 +82,55 @@ def is_nan(candidate):
     return str(candidate) == "nan"
 
 
+def is_exact_units(amounts, decimals):
+    """
+    :param amounts: float or numpy array
+        Amounts of coin
+    :param decimals: int or numpy array
+        Decimals of smallest unit of coin (e.g 8 for satoshi)
+    :return: bool or numpy array of bool
+        True iff amount is finite and its number of smallest units is below
+        MAX_EXACT_UNITS, so that the float parsed from a decimal string with
+        up to decimals digits is rounded back to the same integer
+    """
+
+    scaled = np.asarray(amounts, dtype=np.float64) * np.power(10.0, decimals)
+    exact = np.abs(scaled) < MAX_EXACT_UNITS  # False for NaN and inf
+    return exact if exact.ndim else bool(exact)
+
+
+def to_units(amounts, decimals):
+    """
+    :param amounts: float or numpy array
+        Amounts of coin
+    :param decimals: int or numpy array
+        Decimals of smallest unit of coin (e.g 8 for satoshi)
+    :return: int or numpy array of int64
+        Amounts as integer number of smallest units (rounded)
+    """
+
+    if not np.all(is_exact_units(amounts, decimals)):
+        raise ValueError("Amounts cannot be converted exactly to units")
+
+    units = np.rint(np.asarray(amounts, dtype=np.float64) *
+                    np.power(10.0, decimals)).astype(np.int64)
+    return units if units.ndim else int(units)
+
+
+def from_units(units, decimals):
+    """
+    :param units: int or numpy array
+        Integer number of smallest units of coin
+    :param decimals: int or numpy array
+        Decimals of smallest unit of coin (e.g 8 for satoshi)
+    :return: float or numpy array of float64
+        Amounts of coin
+    """
+
+    amounts = np.asarray(units, dtype=np.float64) / np.power(10.0, decimals)
+    return amounts if amounts.ndim else float(amounts)
+
+
 def remove_same_coordinates(x_data, y_val):
     """
     :param x_data: [] of *
@@ -226,6 +277,58 @@ def print_balance_info(total_value, delta, percentage, last_time, color=False):
     print("Difference: ~", delta, "$ (" + percentage + " %)")
 
 
+def merge_unique_sorted(arrays):
+    """
+    :param arrays: [] of numpy array
+        Sorted arrays
+    :return: numpy array
+        Sorted array with all distinct values of arrays. Arrays are merged
+        pairwise (k-way merge in log k rounds), each merge is linear.
+    """
+
+    arrays = [np.asarray(array) for array in arrays if len(array)]
+    if not arrays:
+        return np.empty(0, dtype=np.int64)
+
+    while len(arrays) > 1:
+        merged = []
+        for first, second in zip(arrays[::2], arrays[1::2]):
+            positions = np.searchsorted(first, second, side="right")
+            merged.append(np.insert(first, positions, second))
+        if len(arrays) % 2:
+            merged.append(arrays[-1])
+        arrays = merged
+
+    merged = arrays[0]
+    is_new = np.ones(len(merged), dtype=bool)
+    is_new[1:] = merged[1:] != merged[:-1]
+    return merged[is_new]
+
+
+def get_ohlc(dates, values, starts):
+    """
+    :param dates: numpy array of int64
+        Date of each sample (sorted)
+    :param values: numpy array of float
+        Value of each sample
+    :param starts: numpy array of int64
+        Start date of each bucket (sorted). Each bucket must have at least
+        a sample (e.g on its start date)
+    :return: {} of str -> numpy array of float
+        Open, high, low and close value of samples in each bucket (NaN
+        values are skipped by high and low)
+    """
+
+    firsts = np.searchsorted(dates, starts, side="left")
+    lasts = np.append(firsts[1:], len(dates)) - 1
+    return {
+        "open": values[firsts],
+        "high": np.fmax.reduceat(values, firsts),
+        "low": np.fmin.reduceat(values, firsts),
+        "close": values[lasts]
+    }
+
+
 def color_number(number, low_color=Fore.RED,
                  high_color=Fore.GREEN, default_color=Fore.WHITE, eps=1e-3):
     """
@@ -0,0 +1,695 @@
+# !/usr/bin/python3
+# coding: utf_8
+
+
+""" Test pyhodl.core module """
+
+import json
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+
+import numpy as np
+import pytz
+
+from pyhodl.core.analytics import get_rolling_std, get_drawdowns, \
+    get_returns, get_beta, get_period_returns, solve_irr, get_analytics, \
+    get_total_returns, get_returns_state, get_values_on
+from pyhodl.core.exchanges import CryptoExchange
+from pyhodl.core.lots import match_lots, CostBasisMethod, get_wallet_lots
+from pyhodl.core.portfolio import Portfolio
+from pyhodl.core.transactions import Transaction, CoinAmount, Commission, \
+    TransactionType, RawRecords
+from pyhodl.core.wallets import Wallet
+
+START_DATE = datetime(2018, 1, 1)
+
+
+def build_trade(coin_buy, amount_buy, coin_sell, amount_sell, hours,
+                fee=None):
+    """
+    :param coin_buy: str
+        Coin bought
+    :param amount_buy: float
+        Amount bought
+    :param coin_sell: str
+        Coin sold
+    :param amount_sell: float
+        Amount sold
+    :param hours: int
+        Hours since start date
+    :param fee: tuple (str, float)
+        Coin and amount of fee (if any)
+    :return: Transaction
+        Trade
+    """
+
+    date = START_DATE + timedelta(hours=hours)
+    raw = {"id": hours, "symbol": coin_buy + coin_sell}
+    commission = Commission(raw, CoinAmount(fee[0], fee[1], False), date) \
+        if fee else None
+    return Transaction(
+        raw,
+        CoinAmount(coin_buy, amount_buy, True),
+        CoinAmount(coin_sell, amount_sell, False),
+        date,
+        commission=commission
+    )
+
+
+def build_transactions():
+    """
+    :return: [] of Transaction
+        Small history of deposits and trades
+    """
+
+    deposit = Transaction(
+        {"id": 0, "txId": "0xabc"},
+        CoinAmount("BTC", 2.0, True),
+        None,
+        START_DATE,
+        trans_type=TransactionType.DEPOSIT
+    )
+    return [
+        build_trade("ETH", 10.0, "BTC", 1.0, 3, fee=("BNB", 0.5)),
+        deposit,
+        build_trade("BNB", 4.0, "BTC", 0.5, 2),
+        build_trade("BTC", 0.25, "ETH", 2.0, 5, fee=("BTC", 0.01))
+    ]
+
+
+class TestTransaction(unittest.TestCase):
+    """ Test pyhodl.core.transactions module """
+
+    def test_raw_records(self):
+        """ Raw data is read back from its file only when needed """
+
+        raw = {"id": 7, "txId": "0xabc", "network": {"hash": "0xdef"}}
+        content = '[{"id": 1}, ' + json.dumps(raw) + "]"
+        with tempfile.TemporaryDirectory() as folder:
+            input_file = os.path.join(folder, "records.json")
+            with open(input_file, "w") as stream:
+                stream.write(content)
+
+            records = RawRecords(input_file)
+            index = records.add(
+                len('[{"id": 1}, '), len(content) - len('[{"id": 1}, ]')
+            )
+            self._assert_raw_record(records, index, raw)
+
+            records = RawRecords(input_file)
+            first = records.add(1, len('{"id": 1}'))
+            index = records.add(
+                len('[{"id": 1}, '), len(content) - len('[{"id": 1}, ]')
+            )
+            with mock.patch("builtins.open", side_effect=open) as opened:
+                for _ in range(3):
+                    self.assertEqual(records.get(first), {"id": 1})
+                    self.assertEqual(records.get(index, "id"), 7)
+            self.assertEqual(opened.call_count, 1)  # kept open
+
+            records._decoded.clear()
+            with open(input_file, "w") as stream:
+                stream.write(content.replace("0xabc", "0xabcdef"))
+            with self.assertRaises(ValueError):
+                records.get(index)  # offsets are no more valid
+
+    def _assert_raw_record(self, records, index, raw):
+        """
+        :param records: RawRecords
+            Raw records
+        :param index: int
+            Index of raw record in records
+        :param raw: {}
+            Raw record
+        :return: void
+            Checks transaction built from raw record
+        """
+
+        commission = Commission.from_record(
+            records, index, CoinAmount("BNB", 0.1, False), START_DATE,
+            key="network"
+        )
+        transaction = Transaction.from_record(
+            records, index, CoinAmount("BTC", 1.5, True), None, START_DATE,
+            trans_type=TransactionType.DEPOSIT, commission=commission
+        )
+
+        self.assertEqual(len(records), 1)  # same record is stored once
+        self.assertEqual(transaction.raw, raw)
+        self.assertEqual(transaction["txId"], "0xabc")
+        self.assertEqual(commission.get_attrs(), ["hash"])
+        self.assertTrue(transaction.has("0xab"))
+        self.assertFalse(hasattr(transaction, "__dict__"))
+
+    def test_deltas(self):
+        """ Delta of each coin is computed once at construction """
+
+        for transaction in build_transactions():
+            for coin in transaction.get_coins():
+                expected = transaction.get_amount_traded(coin) + \
+                           transaction.get_amount_commission(coin) + \
+                           transaction.get_amount_moved(coin)
+                self.assertEqual(transaction.get_amount(coin), expected)
+
+        trade = build_trade("BTC", 0.25, "ETH", 2.0, 5, fee=("BTC", 0.01))
+        self.assertEqual(trade.get_coins(), {"BTC", "ETH"})
+        self.assertAlmostEqual(trade.get_amount("btc"), 0.24)
+        self.assertEqual(trade.get_amount("XRP"), 0.0)
+
+
+class TestWallet(unittest.TestCase):
+    """ Test pyhodl.core.wallets module """
+
+    def test_missing_prices(self):
+        """ Coins are converted to NaN where prices cannot be looked up """
+
+        wallet = Wallet("BTC")
+        wallet.add_transaction(build_trade("BTC", 1.0, "EUR", 1.0, 1))
+        dates = [START_DATE, START_DATE + timedelta(hours=2)]
+        with mock.patch("pyhodl.core.wallets.get_coin_prices_table",
+                        side_effect=ValueError("corrupted prices")):
+            self.assertTrue(np.isnan(wallet.convert_many(dates, "USD")).all())
+            self.assertTrue(np.isnan(wallet.convert_to(dates[1], "USD")))
+
+        table = mock.Mock()
+        table.get_value_on.side_effect = KeyError("BTC")  # not on date
+        with mock.patch("pyhodl.core.wallets.get_coin_prices_table",
+                        return_value=table):
+            self.assertTrue(np.isnan(wallet.balance_at(dates[1], "USD")))
+
+    def test_add_transaction(self):
+        """ Transactions are kept sorted with running balance """
+
+        hours = [5, 1, 7, 1, 9, 0, 3]
+        transactions = [
+            build_trade("BTC", hour + 1.0, "EUR", 1.0, hour) for hour in hours
+        ]
+        wallet = Wallet("BTC")
+        for i, transaction in enumerate(transactions):
+            wallet.add_transaction(transaction)
+            added = sorted(
+                transactions[:i + 1], key=lambda x: x.date
+            )  # stable, as wallet
+            self.assertEqual(wallet.transactions, added)
+            self.assertEqual(wallet.balance(), sum(hours[:i + 1]) + i + 1.0)
+
+        subtotals = [
+            balance["val"] for balance in wallet.get_balance_by_transaction()
+        ]
+        self.assertEqual(subtotals, [1.0, 3.0, 5.0, 9.0, 15.0, 23.0, 33.0])
+        self.assertEqual(list(wallet.totals), subtotals)
+
+    def test_fill_missing_data(self):
+        """ Values are carried forward to dates with no data """
+
+        dates = np.array([10, 20, 20, 40], dtype=np.int64)
+        all_dates = np.array([0, 10, 15, 20, 30, 40, 50], dtype=np.int64)
+        value_dates, values = Wallet.fill_missing_data(
+            [1.0, 2.0, 3.0, 4.0], dates, all_dates
+        )
+        self.assertEqual(list(values), [0.0, 1.0, 1.0, 3.0, 3.0, 4.0, 4.0])
+        self.assertEqual(list(value_dates), [0, 10, 10, 20, 20, 40, 40])
+
+    def test_balance_at(self):
+        """ Balance on any date is looked up in running balance """
+
+        transactions = build_transactions()
+        wallets = CryptoExchange(transactions, "test").build_wallets()
+        btc = wallets["BTC"]
+        for hours in range(-1, 7):
+            date = START_DATE + timedelta(hours=hours)
+            expected = sum(
+                transaction.get_amount("BTC") for transaction in transactions
+                if transaction.date <= pytz.utc.localize(date)
+            )
+            self.assertAlmostEqual(btc.balance_at(date), expected)
+            self.assertAlmostEqual(btc.balances_on([date])[0], expected)
+
+        dates, balances = btc.balances_between(
+            START_DATE + timedelta(hours=2), START_DATE + timedelta(hours=3)
+        )
+        self.assertEqual(len(dates), 2)
+        self.assertEqual(list(balances), [1.5, 0.5])
+
+        portfolio = Portfolio(list(wallets.values()) + [btc])
+        self.assertAlmostEqual(
+            portfolio.balance_at(START_DATE + timedelta(hours=4))["BTC"], 1.0
+        )
+        dates, balances = portfolio.balances_between(
+            START_DATE, START_DATE + timedelta(hours=5)
+        )["BTC"]
+        self.assertEqual(len(dates), 4)
+        self.assertAlmostEqual(balances[-1], 2 * 0.74)
+
+    def test_resample(self):
+        """ Balances are grouped in regular buckets """
+
+        transactions = build_transactions()
+        wallets = CryptoExchange(transactions, "test").build_wallets()
+        hourly = wallets["BTC"].resample("1h")
+        self.assertEqual(len(hourly["date"]), 6)
+        self.assertEqual(
+            list(np.diff(hourly["date"])), [3600 * 10 ** 9] * 5
+        )
+        self.assertAlmostEqual(hourly["balance"]["close"][-1], 0.74)
+        self.assertEqual(list(hourly["balance"]["open"][3:5]), [0.5, 0.5])
+
+        daily = wallets["BTC"].resample("1d")["balance"]
+        self.assertEqual(len(daily["open"]), 1)
+        self.assertEqual(daily["open"][0], 2.0)
+        self.assertEqual(daily["high"][0], 2.0)
+        self.assertEqual(daily["low"][0], 0.5)
+        self.assertAlmostEqual(daily["close"][0], 0.74)
+
+
+class TestPortfolio(unittest.TestCase):
+    """ Test pyhodl.core.portfolio module """
+
+    @mock.patch("pyhodl.core.portfolio.get_price_on_date")
+    def test_current_balance(self, get_price):
+        """ Live prices of all coins are fetched at once """
+
+        get_price.return_value = {"BTC": 10000.0, "ETH": 500.0}
+        wallets = CryptoExchange(build_transactions(), "test").build_wallets()
+        balances = Portfolio(list(wallets.values())).get_current_balance()
+
+        get_price.assert_called_once()
+        self.assertEqual(set(get_price.call_args[0][0]), {"BTC", "ETH", "BNB"})
+        balances = {balance["symbol"]: balance for balance in balances}
+        self.assertAlmostEqual(balances["BTC"]["val"], 7400.0)
+        self.assertAlmostEqual(balances["ETH"]["price"], 500.0)
+        self.assertTrue(np.isnan(balances["BNB"]["val"]))
+
+    def test_timeline(self):
+        """ Dates of all wallets are merged once, without duplicates """
+
+        transactions = build_transactions()
+        wallets = CryptoExchange(transactions, "test").build_wallets()
+        portfolio = Portfolio(list(wallets.values()))
+        timeline = portfolio.get_timeline()
+        self.assertEqual(
+            portfolio.get_transactions_dates(),
+            sorted({transaction.date for transaction in transactions})
+        )
+        self.assertIs(portfolio.get_timeline(), timeline)  # cached
+
+        wallets["BNB"].add_transaction(
+            build_trade("BNB", 1.0, "ETH", 0.1, 24)
+        )
+        self.assertEqual(len(portfolio.get_timeline()), len(timeline) + 1)
+
+
+class TestLots(unittest.TestCase):
+    """ Test pyhodl.core.lots module """
+
+    def test_match_lots(self):
+        """ Same disposals realize different gains by method """
+
+        dates = list(range(4))
+        amounts = [1.0, 1.0, -1.5, 0.0]
+        fees = [0.0, 0.0, 0.0, 0.25]
+        prices = [100.0, 300.0, 200.0, 250.0]
+        expected = {
+            CostBasisMethod.FIFO: ([100.0, -125.0], [0.0, 0.25]),
+            CostBasisMethod.LIFO: ([25.0, -100.0], [0.25, 0.0]),
+            CostBasisMethod.HIFO: ([25.0, -100.0], [0.25, 0.0])
+        }
+
+        for method, (realized, remaining) in expected.items():
+            lots = match_lots(dates, amounts, fees, prices, method=method)
+            self.assertEqual(list(lots["realized"]), realized)
+            self.assertEqual(list(lots["remaining"]), remaining)
+            self.assertEqual(lots["unmatched"], 0.0)
+
+    def test_wallet_lots(self):
+        """ Lots cost what was paid for them, or NaN if price is missing """
+
+        transactions = [
+            build_trade("BTC", 2.0, "EUR", 1000.0, 0),
+            Transaction(
+                {"id": 1}, CoinAmount("BTC", 1.0, True), None,
+                START_DATE + timedelta(hours=1),
+                trans_type=TransactionType.DEPOSIT
+            ),
+            build_trade("EUR", 3000.0, "BTC", 2.5, 2)
+        ]
+        wallet = CryptoExchange(transactions, "test").build_wallets()["BTC"]
+
+        def convert_many(wallet, dates, currency, amounts=1.0):
+            return np.full(len(dates), np.nan)  # no price in table
+
+        with mock.patch.object(Wallet, "convert_many", convert_many):
+            lots = get_wallet_lots(wallet, "EUR")
+
+        self.assertEqual(lots["price"][0], 500.0)  # paid in trade
+        self.assertTrue(np.isnan(lots["price"][1]))
+        self.assertEqual(lots["realized"][0], 2.0 * (1200.0 - 500.0))
+        self.assertTrue(np.isnan(lots["realized"][1]))  # cost is missing
+        self.assertEqual(len(lots["missing"]), 1)
+
+
+class TestAnalytics(unittest.TestCase):
+    """ Test pyhodl.core.analytics module """
+
+    def test_rolling_std(self):
+        """ Rolling deviation matches the one of each window """
+
+        values = np.random.RandomState(0).normal(1e6, 1.0, 100)
+        values[10] = np.nan
+        window = 7
+        stds = get_rolling_std(values, window)
+        for i in range(window - 1, len(values)):
+            expected = values[i - window + 1: i + 1]
+            expected = np.std(expected[~np.isnan(expected)], ddof=1)
+            self.assertAlmostEqual(stds[i], expected, places=6)
+        self.assertTrue(np.isnan(stds[:window - 1]).all())
+
+    def test_drawdowns(self):
+        """ Drawdowns are measured from highest value so far """
+
+        values = np.array([0.0, 100.0, 50.0, 200.0, 150.0, 300.0])
+        drawdowns = get_drawdowns(values)
+        self.assertTrue(np.isnan(drawdowns[0]))
+        self.assertEqual(list(drawdowns[1:]), [0.0, -0.5, 0.0, -0.25, 0.0])
+
+        returns = get_returns(values)
+        self.assertTrue(np.isnan(returns[:2]).all())
+        self.assertEqual(list(returns[2:]), [-0.5, 3.0, -0.25, 1.0])
+        self.assertAlmostEqual(get_beta(returns, 2 * returns), 0.5)
+
+    def test_period_returns(self):
+        """ Deposits are not counted as profits """
+
+        deposits = [
+            Transaction(
+                {"id": day}, CoinAmount("BTC", 1.0, True), None,
+                START_DATE + timedelta(days=day),
+                trans_type=TransactionType.DEPOSIT
+            ) for day in range(2)
+        ]
+        exchange = CryptoExchange(deposits, "test")
+        wallets = list(exchange.build_wallets().values())
+        day = 24 * 3600 * 10 ** 9
+        start = exchange.store.dates[0]
+        bounds = start + np.arange(3) * day
+
+        def convert_many(wallet, dates, currency, amounts=1.0):
+            prices = np.where(dates == start + day, 200.0, 100.0)
+            return prices * amounts  # price doubles, then halves
+
+        with mock.patch.object(Wallet, "convert_many", convert_many):
+            returns = get_period_returns(wallets, bounds, "USD")
+            total = get_period_returns(wallets, bounds[::2], "USD")
+
+        self.assertEqual(list(returns["twr"]), [1.0, -0.5])
+        self.assertEqual(list(returns["start"]), [100.0, 400.0])
+        self.assertEqual(list(returns["end"]), [200.0, 200.0])
+        self.assertEqual(list(total["twr"]), [0.0])
+        self.assertEqual(list(total["flows"]), [200.0])
+        self.assertLess(total["irr"][0], 0.0)  # bought more before drop
+
+        times = np.array([[0.0, 1.0, 2.0], [0.0, 0.5, 1.0]])
+        cash_flows = np.array([[-100.0, 0.0, 121.0], [-100.0, -50.0, 0.0]])
+        rates = solve_irr(times, cash_flows)
+        self.assertAlmostEqual(rates[0], 0.1)
+        self.assertTrue(np.isnan(rates[1]))  # no money returned
+
+    def test_returns_state(self):
+        """ Returns saved in a checkpoint are updated with newer flows """
+
+        deposits = [
+            Transaction(
+                {"id": day}, CoinAmount("BTC", 1.0 + day, True), None,
+                START_DATE + timedelta(days=day),
+                trans_type=TransactionType.DEPOSIT
+            ) for day in range(4)
+        ]
+        until = START_DATE + timedelta(days=5)
+        exchange = CryptoExchange(deposits, "test")
+        start, day = exchange.store.dates[0], 24 * 3600 * 10 ** 9
+
+        def convert_many(wallet, dates, currency, amounts=1.0):
+            prices = 100.0 * 1.5 ** ((dates - start) // day)
+            return np.where((dates - start) // day == 2, 50.0, prices) * \
+                amounts  # grows, but drops on 3rd day
+
+        with mock.patch.object(Wallet, "convert_many", convert_many):
+            expected = get_total_returns(
+                list(exchange.build_wallets().values()), until=until
+            )
+
+            exchange = CryptoExchange(deposits[:2], "test")
+            wallets = exchange.build_wallets()
+            checkpoint = exchange.get_checkpoint(wallets)
+            state = get_returns_state(
+                list(wallets.values()), checkpoint["date"]
+            )
+
+            exchange = CryptoExchange(deposits, "test")
+            wallets = exchange.build_wallets(checkpoint=checkpoint)
+            self.assertEqual(len(wallets["BTC"].transactions), 2)
+            returns = get_total_returns(
+                list(wallets.values()), until=until, state=state
+            )
+
+        self.assertEqual(len(state["flows"]), 2)
+        self.assertAlmostEqual(returns[0], expected[0])
+        self.assertAlmostEqual(returns[1], expected[1])
+
+    def test_missing_prices(self):
+        """ Wallets are not valued as worth 0 when prices are missing """
+
+        deposits = [
+            Transaction(
+                {"id": day}, CoinAmount("BTC", 1.0, True), None,
+                START_DATE + timedelta(days=day),
+                trans_type=TransactionType.DEPOSIT
+            ) for day in range(2)
+        ]
+        exchange = CryptoExchange(deposits, "test")
+        wallets = list(exchange.build_wallets().values())
+        until = exchange.store.dates[-1]
+
+        def convert_many(wallet, dates, currency, amounts=1.0):
+            return np.full(len(dates), np.nan)  # no price in table
+
+        with mock.patch.object(Wallet, "convert_many", convert_many):
+            self.assertTrue(np.isnan(
+                get_values_on(wallets, np.array([until]), "USD")
+            ).all())
+            self.assertIsNone(get_returns_state(wallets, until))
+            self.assertEqual(
+                get_total_returns(wallets, until=START_DATE + timedelta(3)),
+                (None, None)
+            )
+
+    def test_analytics(self):
+        """ Holdings are valued with prices at the end of each period """
+
+        deposits = [
+            Transaction(
+                {"id": day}, CoinAmount("BTC", 1.0, True), None,
+                START_DATE + timedelta(days=day),
+                trans_type=TransactionType.DEPOSIT
+            ) for day in [0, 5]
+        ]
+        exchange = CryptoExchange(deposits, "test")
+        portfolio = Portfolio(list(exchange.build_wallets().values()))
+        day = 24 * 3600 * 10 ** 9
+        start = exchange.store.dates[0]
+
+        def convert_many(wallet, dates, currency, amounts=1.0):
+            days = (np.asarray(dates) - start) // day
+            return 1000.0 * 2.0 ** days * amounts  # price doubles daily
+
+        market = mock.Mock()
+        market.get_values_on_dates_of.side_effect = \
+            lambda dates: np.ones(len(dates))
+        with mock.patch.object(Wallet, "convert_many", convert_many):
+            analytics = get_analytics(portfolio, "USD", market=market)
+
+        self.assertEqual(
+            list(analytics["value"]),
+            [1000.0 * 2.0 ** i for i in range(5)] + [64000.0]
+        )
+        self.assertEqual(list(analytics["returns"][1:5]), [1.0] * 4)
+
+
+class TestExchange(unittest.TestCase):
+    """ Test pyhodl.core.exchanges module """
+
+    def test_build_wallets(self):
+        """ Wallets built from columnar store match single transactions """
+
+        transactions = build_transactions()
+        exchange = CryptoExchange(transactions, "test")
+        wallets = exchange.build_wallets()
+        self.assertEqual(set(wallets.keys()), {"BTC", "ETH", "BNB"})
+
+        for coin, wallet in wallets.items():
+            expected = sum(
+                transaction.get_amount(coin) for transaction in transactions
+            )
+            self.assertAlmostEqual(wallet.balance(), expected)
+            self.assertEqual(wallet.dates(), sorted(wallet.dates()))
+
+        self.assertAlmostEqual(wallets["BTC"].balance(), 0.74)
+        self.assertAlmostEqual(exchange.get_balances()["BNB"], 3.5)
+        self.assertEqual(
+            wallets["ETH"].transactions, [transactions[0], transactions[3]]
+        )
+        self.assertEqual(list(wallets["BTC"].get_flows()[1]), [2.0])
+
+    def test_fixed_point(self):
+        """ Integer units sum dust exactly """
+
+        transactions = [
+            build_trade("BTC", 0.1, "EUR", 700.3, hours)
+            for hours in range(10)
+        ]
+        exchange = CryptoExchange(transactions, "test")
+        wallets = exchange.build_wallets(fixed_point=True)
+        self.assertEqual(wallets["BTC"].balance(), 1.0)
+        self.assertEqual(wallets["EUR"].balance(), -7003.0)
+        self.assertEqual(exchange.get_balances(fixed_point=True)["BTC"], 1.0)
+        self.assertNotEqual(exchange.build_wallets()["BTC"].balance(), 1.0)
+
+        transactions = [
+            build_trade("BTC", 0.001, "USD", 10.0, hours, fee=("USD", 0.004))
+            for hours in range(1000)
+        ]
+        exchange = CryptoExchange(transactions, "test")
+        self.assertAlmostEqual(
+            exchange.get_balances(fixed_point=True)["USD"], -10004.0
+        )  # fiat fees below cents are not rounded
+
+        transactions = [
+            build_trade("SHIB", 4e8, "BTC", 0.1, 0),
+            build_trade("SHIB", 1e8, "BTC", 0.1, 1)
+        ]
+        exchange = CryptoExchange(transactions, "test")
+        wallets = exchange.build_wallets(fixed_point=True)
+        self.assertIsNone(wallets["SHIB"].decimals)  # out of exact range
+        self.assertEqual(wallets["SHIB"].balance(), 5e8)
+        self.assertEqual(wallets["BTC"].decimals, 8)
+        self.assertEqual(
+            exchange.get_balances(fixed_point=True),
+            {"SHIB": 5e8, "BTC": -0.2}
+        )
+        with self.assertRaises(ValueError):
+            wallets["BTC"].add_transaction(
+                build_trade("BTC", float("nan"), "SHIB", 1.0, 2)
+            )
+
+    def test_checkpoint(self):
+        """ Wallets replay only transactions newer than checkpoint """
+
+        transactions = build_transactions()
+        exchange = CryptoExchange(transactions, "test")
+        checkpoint = exchange.get_checkpoint(exchange.build_wallets())
+        self.assertTrue(exchange.is_valid_checkpoint(checkpoint))
+        self.assertFalse(exchange.is_valid_checkpoint(checkpoint, True))
+
+        newer = build_trade("ETH", 1.0, "BTC", 0.1, 8, fee=("BNB", 0.1))
+        exchange = CryptoExchange(transactions + [newer], "test")
+        self.assertTrue(exchange.is_valid_checkpoint(checkpoint))
+        wallets = exchange.build_wallets(checkpoint=checkpoint)
+        self.assertEqual(len(wallets["BTC"].transactions), 1)
+        for coin, balance in exchange.get_balances().items():
+            self.assertAlmostEqual(wallets[coin].balance(), balance)
+
+        extended = exchange.get_checkpoint(wallets, checkpoint=checkpoint)
+        self.assertEqual(
+            extended, exchange.get_checkpoint(exchange.build_wallets())
+        )  # hash of newer transactions is added to the one of checkpoint
+        self.assertTrue(exchange.is_valid_checkpoint(extended))
+
+        older = build_trade("ETH", 1.0, "BTC", 0.1, 4)
+        exchange = CryptoExchange(transactions + [older], "test")
+        self.assertFalse(exchange.is_valid_checkpoint(checkpoint))
+
+        corrected = build_trade("BNB", 4.0, "BTC", 0.6, 2)  # same ids
+        exchange = CryptoExchange(
+            transactions[:2] + [corrected] + transactions[3:], "test"
+        )
+        self.assertFalse(exchange.is_valid_checkpoint(checkpoint))
+
+    def test_search(self):
+        """ Transactions are found by raw values through the index """
+
+        transactions = build_transactions()
+        exchange = CryptoExchange(transactions, "test")
+        self.assertEqual(exchange.search("0xABC"), [transactions[1]])
+        self.assertEqual(exchange.search("ethbtc"), [transactions[0]])
+        self.assertEqual(exchange.search_prefix("bnb"), [transactions[2]])
+        self.assertEqual(exchange.search_prefix("0X"), [transactions[1]])
+        self.assertEqual(exchange.search("0xab"), [])
+
+    def test_take(self):
+        """ Rows of transactions are taken without building missing index """
+
+        transactions = build_transactions()
+        exchange = CryptoExchange(list(transactions), "test")
+        taken = exchange.take([3, 1])
+        self.assertEqual(taken.transactions, [transactions[3], transactions[1]])
+        self.assertIsNone(taken.index)  # not built just to be taken
+        self.assertEqual(
+            taken.get_balances(),
+            CryptoExchange(
+                [transactions[3], transactions[1]], "test"
+            ).get_balances()
+        )
+
+        exchange.get_index()
+        taken = exchange.take([2, 1])
+        self.assertIsNotNone(taken.index)
+        self.assertEqual(taken.search("bnbbtc"), [transactions[2]])
+
+    def test_dates_index(self):
+        """ Transactions by date, coin and type stay sorted when appended """
+
+        transactions = build_transactions()
+        exchange = CryptoExchange(list(transactions), "test")
+        trade, deposit, bnb_trade, eth_trade = transactions
+        self.assertEqual(exchange.get_first_transaction(), deposit)
+        self.assertEqual(exchange.get_last_transaction(), eth_trade)
+        self.assertEqual(
+            exchange.transactions_between(
+                START_DATE + timedelta(hours=1),
+                START_DATE + timedelta(hours=3)
+            ), [bnb_trade, trade]
+        )
+        self.assertEqual(exchange.transactions_for("ETH"), [trade, eth_trade])
+        self.assertEqual(
+            exchange.transactions_for("BTC"),
+            [deposit, bnb_trade, trade, eth_trade]
+        )
+        self.assertEqual(
+            exchange.transactions_of_type(TransactionType.DEPOSIT), [deposit]
+        )
+        self.assertEqual(exchange.search("bnbbtc"), [bnb_trade])
+
+        older = build_trade("BNB", 1.0, "ETH", 0.1, 1)
+        exchange.add_transactions([older])
+        self.assertEqual(
+            exchange.transactions_between(
+                until=START_DATE + timedelta(hours=2)
+            ), [deposit, older, bnb_trade]
+        )
+        self.assertEqual(
+            exchange.transactions_for("ETH"), [older, trade, eth_trade]
+        )
+        self.assertEqual(exchange.get_last_transaction(), eth_trade)
+        self.assertEqual(exchange.search("bnbeth"), [older])
+        self.assertEqual(exchange.transactions_for("XRP"), [])
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
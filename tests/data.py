@@ -4,9 +4,56 @@
 
 """ Test pyhodl.data module """
 
+import io
+import json
+import os
+import tempfile
 import unittest
+from datetime import datetime, timedelta
+from unittest import mock
 
-from pyhodl.data.coins import Coin, CryptoCoin, FIAT_COINS
+import numpy as np
+import pytz
+
+from pyhodl.core.exchanges import CryptoExchange
+from pyhodl.core.store import TransactionsTable
+from pyhodl.core.wallets import Wallet
+from pyhodl.data import cache
+from pyhodl.data.checkpoints import save_checkpoint, parse_checkpoint
+from pyhodl.data.coins import Coin, CryptoCoin, FIAT_COINS, COINS_REGISTRY, \
+    CRYPTO_COINS, is_crypto
+from pyhodl.data.dedup import get_fingerprints, get_exchange_fingerprints
+from pyhodl.data.parse.build import build_exchanges, build_file_exchange, \
+    parse_file_content, PARSERS
+from pyhodl.data.parse.markets.binance import BinanceParser
+from pyhodl.data.parse.markets.bitfinex import BitfinexParser
+from pyhodl.data.parse.markets.coinbase import CoinbaseParser
+from pyhodl.data.parse.markets.gdax import GdaxParser
+from pyhodl.data.parse.stream import iter_records
+from pyhodl.data.symbols import SymbolsTable, get_symbols_file, \
+    get_symbols_table, save_symbols
+from pyhodl.data.tables import CoinPricesTable
+from pyhodl.tools.balance import Balance
+from pyhodl.utils.dates import dates_to_ns_array
+
+
+def build_deposit(tx_id, amount):
+    """
+    :param tx_id: str
+        Id of deposit
+    :param amount: float
+        Amount of BTC deposited
+    :return: {}
+        Raw Binance deposit
+    """
+
+    return {
+        "insertTime": 1514764800000 + int(amount * 1000),
+        "amount": amount,
+        "asset": "BTC",
+        "txId": tx_id,
+        "status": 1
+    }
 
 
 class TestCoins(unittest.TestCase):
@@ -42,8 +89,28 @@ class TestCoins(unittest.TestCase):
         self.assertTrue(btc == btc_very_malformed)
         self.assertTrue(btc_malformed == btc_very_malformed)
 
-        btc_malformed.symbol = "btcccccc"
-        self.assertTrue(btc_malformed == btc_very_malformed)
+        with self.assertRaises(AttributeError):
+            btc_malformed.symbol = "btcccccc"  # hashed by id
+        self.assertTrue(CryptoCoin(
+            "btcccccc", name="bitcoin", other_names=["bitcoin"]
+        ) == btc_very_malformed)
+
+        coins = {coin.symbol: coin for coin in CRYPTO_COINS}
+        self.assertNotEqual(
+            coins["XOT"], coins["MIOTA"]
+        )  # coins with same names but different symbols are different
+        self.assertEqual(len({btc, btc_malformed, btc_very_malformed}), 1)
+
+        found = CryptoCoin("ZZZQ", name="bitcoin")
+        self.assertTrue(found == btc)
+        self.assertFalse(Coin("ZZZQ") == "BTC")  # symbol is not an alias
+        self.assertTrue(CryptoCoin("ZZZQ", name="bitcoin") == btc)
+        self.assertTrue(
+            CryptoCoin("ZZZQ", name="bitcoin") == found
+        )  # same whether symbol has been interned before or not
+        self.assertFalse(
+            CryptoCoin("ZZZA", name="zzz") == CryptoCoin("ZZZB", name="zzz")
+        )
 
     def test_in(self):
         self.assertTrue("usd" in FIAT_COINS)
@@ -52,6 +119,683 @@ class TestCoins(unittest.TestCase):
         self.assertTrue("BTC" == Coin("BTC"))
         self.assertTrue("BTC" == CryptoCoin("BTC"))
 
+    def test_registry(self):
+        btc = CryptoCoin("BTC")
+        self.assertEqual(btc.id, COINS_REGISTRY.find_id("btc"))
+        self.assertEqual(hash(btc), hash(CryptoCoin("btc", "bitcoin")))
+        self.assertEqual(len({Coin("eth"), CryptoCoin("ETH")}), 1)
+        self.assertIs(
+            COINS_REGISTRY.get_coin("eur"),
+            COINS_REGISTRY.get_coin("EUR")
+        )
+        self.assertFalse(is_crypto("eur"))
+        self.assertTrue(is_crypto(btc))
+
+        size = len(COINS_REGISTRY)
+        self.assertTrue(is_crypto("not a coin symbol either"))
+        self.assertFalse(COINS_REGISTRY.is_fiat("not a coin symbol either"))
+        self.assertEqual(COINS_REGISTRY.get_decimals("nor this one"), 8)
+        self.assertEqual(len(COINS_REGISTRY), size)  # not interned
+        self.assertIsNone(COINS_REGISTRY.find_id("not a coin symbol"))
+
+
+class TestDedup(unittest.TestCase):
+    """ Test pyhodl.data.dedup module """
+
+    def test_build_exchanges(self):
+        """ Transactions found in overlapping dumps are counted once """
+
+        dumps = [
+            [build_deposit("0xa", 1.0), build_deposit("0xb", 2.0)],
+            [build_deposit("0xb", 2.0), build_deposit("0xc", 4.0)],
+            [build_deposit("0xa", 1.0)]
+        ]
+        with tempfile.TemporaryDirectory() as folder, \
+                tempfile.TemporaryDirectory() as data_folder, \
+                mock.patch("pyhodl.data.cache.CACHE_FOLDER",
+                           os.path.join(data_folder, "cache")):
+            for i, dump in enumerate(dumps):
+                with open(os.path.join(folder, str(i) + ".json"), "w") as out:
+                    json.dump(dump, out)
+
+            exchanges = list(build_exchanges(folder))
+            self.assertEqual(len(exchanges), 2)
+            balance = sum(
+                exchange.get_balances()["BTC"] for exchange in exchanges
+            )
+            self.assertEqual(balance, 7.0)
+            searched = [
+                len(exchange.search(tx_id)) for exchange in exchanges
+                for tx_id in ["0xa", "0xb", "0xc"]
+            ]
+            self.assertEqual(sum(searched), 3)  # duplicates are not indexed
+
+            exchanges = list(build_exchanges(folder, deduplicate=False))
+            self.assertEqual(len(exchanges), 3)
+
+    def test_appended_fingerprints(self):
+        """ Just fingerprints of transactions appended to a file are computed
+        """
+
+        with tempfile.TemporaryDirectory() as folder, \
+                mock.patch("pyhodl.data.cache.CACHE_FOLDER",
+                           os.path.join(folder, "cache")):
+            input_file = os.path.join(folder, "dump.json")
+            deposits = [
+                build_deposit("0x" + str(i), i + 1.0) for i in range(3)
+            ]
+            with open(input_file, "w") as out:
+                json.dump(deposits[:2], out)
+            build_file_exchange(input_file)
+
+            with open(input_file, "w") as out:
+                json.dump(deposits, out)
+            with mock.patch("pyhodl.data.dedup.get_fingerprints",
+                            side_effect=get_fingerprints) as hashed:
+                exchange = build_file_exchange(input_file)
+            hashed.assert_called_once_with(mock.ANY, 2)
+            self.assertEqual(
+                list(exchange.fingerprints), list(get_fingerprints(exchange))
+            )
+
+            with mock.patch("pyhodl.data.dedup.get_fingerprints") as hashed:
+                cached = build_file_exchange(input_file)
+                fingerprints = get_exchange_fingerprints(cached)
+            hashed.assert_not_called()
+            self.assertEqual(
+                list(fingerprints), list(exchange.fingerprints)
+            )
+
+
+class TestParallel(unittest.TestCase):
+    """ Test parallel parsing of pyhodl.data.parse.build module """
+
+    def test_parallel(self):
+        """ Exchanges parsed in many processes are the same as serial """
+
+        with tempfile.TemporaryDirectory() as folder:
+            for i in range(4):
+                dump = [build_deposit("0x" + str(i), i + 1.0)]
+                with open(os.path.join(folder, str(i) + ".json"), "w") as out:
+                    json.dump(dump, out)
+
+            serial, parallel = [
+                [
+                    (exchange.get_balances(), exchange.transactions[0].raw)
+                    for exchange in build_exchanges(
+                        folder, workers=workers, use_cache=False
+                    )
+                ] for workers in [1, 2]
+            ]
+            self.assertEqual(len(serial), 4)
+            self.assertEqual(serial, parallel)
+
+            metadata, arrays, parser = parse_file_content(
+                os.path.join(folder, "0.json"), use_cache=False
+            )  # what is sent back from other processes
+            self.assertEqual(metadata["exchange"], "binance")
+            self.assertTrue(all(
+                isinstance(array, np.ndarray) for array in arrays.values()
+            ))
+            self.assertIs(parser, BinanceParser)
+
+
+class TestStream(unittest.TestCase):
+    """ Test pyhodl.data.parse.stream module """
+
+    def test_iter_records(self):
+        """ Records are the same as the ones of whole file """
+
+        records = [
+            build_deposit("0x" + str(i), i * 1.5) for i in range(20)
+        ] + [{"nested": {"list": [1, 2.5e-3, "]}"]}, "empty": []}, 1234567]
+        layouts = [
+            records,
+            {"BTC": records[:10], "ETH": [], "EUR": records[10:]},
+            []
+        ]
+        with tempfile.TemporaryDirectory() as folder:
+            input_file = os.path.join(folder, "dump.json")
+            for layout in layouts:
+                with open(input_file, "w") as out:
+                    json.dump(layout, out, indent=1)
+
+                expected = records if layout else []
+                for chunk_size in [1, 7, 1 << 16]:
+                    self.assertEqual(
+                        list(iter_records(input_file, chunk_size)), expected
+                    )
+
+            with open(input_file, "w") as out:
+                out.write(json.dumps(records)[:-20])
+            with self.assertRaises(ValueError):
+                list(iter_records(input_file, 7))
+
+    def test_single_read(self):
+        """ Each file is read just once, detection of parser included """
+
+        with tempfile.TemporaryDirectory() as folder:
+            for i in range(2):
+                dump = [build_deposit("0x" + str(i), i + 1.0)] * 3
+                with open(os.path.join(folder, str(i) + ".json"), "w") as out:
+                    json.dump(dump, out)
+
+            with mock.patch(
+                    "pyhodl.data.parse.core.iter_records",
+                    side_effect=iter_records) as reads:
+                exchanges = list(build_exchanges(
+                    folder, deduplicate=False, use_cache=False
+                ))
+            self.assertEqual(reads.call_count, 2)
+            self.assertEqual(
+                [len(exchange.transactions) for exchange in exchanges], [3, 3]
+            )
+
+
+class TestParsers(unittest.TestCase):
+    """ Test pyhodl.data.parse module """
+
+    def assert_same_parsed(self, parser, records):
+        """
+        :param parser: CryptoParser
+            Parser to test
+        :param records: [] of {}
+            Raw records
+        :return: void
+            Asserts records parsed in batch, and the ones of exchange built
+            from a file with them, are the same as parsed one by one
+        """
+
+        def get_fields(transaction):
+            coins = [
+                (str(coin.coin), coin.amount, coin.is_in) if coin else None
+                for coin in [transaction.coin_buy, transaction.coin_sell]
+            ]
+            commission = transaction.commission
+            return coins + [
+                transaction.date, transaction.transaction_type,
+                transaction.successful, transaction.raw,
+                (str(commission.coin.coin), commission.coin.amount,
+                 commission.date, commission.successful, commission.raw)
+                if commission else None
+            ]
+
+        expected = [
+            get_fields(parser.parse_transaction(raw)) for raw in records
+        ]
+        self.assertEqual(
+            [get_fields(t) for t in parser.parse_transactions(records)],
+            expected
+        )
+        with tempfile.TemporaryDirectory() as folder:
+            input_file = os.path.join(folder, "dump.json")
+            with open(input_file, "w") as out:
+                json.dump(records, out)
+            exchange = type(parser)(input_file).build_exchange()
+            self.assertEqual(
+                [get_fields(t) for t in exchange.transactions], expected
+            )
+
+    def test_parse_transactions(self):
+        """ Records parsed in batch are the same as parsed one by one """
+
+        self.assert_same_parsed(BinanceParser("dump.json"), [
+            build_deposit("0xa", 1.0),
+            {
+                "symbol": "ETHBTC", "id": 1, "orderId": 2, "price": "0.05",
+                "qty": "2.0", "commission": "0.00000000",
+                "commissionAsset": "BNB", "time": 1514764900000,
+                "isBuyer": False
+            },
+            {
+                "amount": "0.5", "asset": "BTC", "txId": "0xb", "status": 6,
+                "applyTime": 1514765000000, "successTime": 1514765100000
+            },
+            build_deposit("0xc", 0.0)
+        ])
+
+    def test_parse_columns(self):
+        """ Records are parsed into columns of table, building no object """
+
+        with tempfile.TemporaryDirectory() as folder:
+            input_file = os.path.join(folder, "dump.json")
+            with open(input_file, "w") as out:
+                json.dump([
+                    build_deposit("0xa", 1.0), build_deposit("0xb", 2.0)
+                ], out)
+            with mock.patch("pyhodl.core.transactions.Transaction.__init__",
+                            side_effect=AssertionError) as built:
+                exchange = BinanceParser(input_file).build_exchange()
+                balances = exchange.get_balances()
+            built.assert_not_called()
+            self.assertEqual(balances, {"BTC": 3.0})
+            self.assertEqual(exchange.transactions[1].coin_buy.amount, 2.0)
+
+    def test_parse_bitfinex(self):
+        """ Bitfinex records parsed in batch are the same as one by one """
+
+        self.assert_same_parsed(BitfinexParser("dump.json"), [
+            {
+                "type": "Sell", "symbol": "iotusd", "amount": "8.0324",
+                "price": "1.170527", "fee_currency": "USD",
+                "fee_amount": "-0.000059", "timestamp": "1516848003.0",
+                "tid": 0
+            },
+            {
+                "type": "Buy", "symbol": "dshbtc", "amount": "3.9637",
+                "price": "0.731652", "fee_currency": "USD",
+                "fee_amount": "-0.009487", "timestamp": "1519854104.7",
+                "tid": 1
+            },
+            {
+                "type": "WITHDRAWAL", "currency": "BTC", "amount": "8.8227",
+                "fee": "0.00842", "status": "COMPLETED",
+                "timestamp": "1518994868.0", "id": 2, "txid": "ftx2"
+            },
+            {
+                "type": "DEPOSIT", "currency": "ETH", "amount": "1.7639",
+                "fee": "0.00856", "status": "CANCELED",
+                "timestamp": "1520754525.0", "id": 8, "txid": "ftx8"
+            }
+        ])
+
+    def test_parse_coinbase(self):
+        """ Coinbase records parsed in batch are the same as one by one """
+
+        self.assert_same_parsed(CoinbaseParser("dump.json"), [
+            {
+                "id": "BTC-0", "type": "send", "status": "completed",
+                "amount": {"amount": "-0.011395", "currency": "BTC"},
+                "native_amount": {"amount": "-11.40", "currency": "EUR"},
+                "instant_exchange": False,
+                "updated_at": "2018-03-12T10:57:00Z",
+                "network": {
+                    "status": "confirmed", "hash": "hBTC0",
+                    "transaction_fee": {"amount": "0.0001", "currency": "BTC"}
+                }
+            },
+            {
+                "id": "BTC-1", "type": "send", "status": "completed",
+                "amount": {"amount": "0.5", "currency": "BTC"},
+                "native_amount": {"amount": "500.00", "currency": "EUR"},
+                "instant_exchange": False,
+                "updated_at": "2018-03-13T10:57:00Z",
+                "network": {"status": "off_blockchain"}
+            },
+            {
+                "id": "BTC-2", "type": "buy", "status": "completed",
+                "amount": {"amount": "0.099741", "currency": "BTC"},
+                "native_amount": {"amount": "99.74", "currency": "EUR"},
+                "instant_exchange": False,
+                "updated_at": "2018-02-17T10:17:00Z"
+            },
+            {
+                "id": "BTC-12", "type": "sell", "status": "pending",
+                "amount": {"amount": "0.248280", "currency": "BTC"},
+                "native_amount": {"amount": "248.28", "currency": "EUR"},
+                "instant_exchange": False,
+                "updated_at": "2018-04-15T10:49:00Z"
+            }
+        ])
+
+    def test_parse_gdax(self):
+        """ GDAX records parsed in batch are the same as one by one """
+
+        self.assert_same_parsed(GdaxParser("dump.json"), [
+            {
+                "id": 0, "amount": "-0.882028", "currency": "BTC",
+                "type": "transfer", "created_at": "2018-07-19T11:01:00Z",
+                "details": {"transfer_type": "withdraw", "transfer_id": "t0"}
+            },
+            {
+                "id": 1, "amount": "1.5", "currency": "ETH",
+                "type": "transfer", "created_at": "2018-07-20T11:01:00Z",
+                "details": {"transfer_type": "deposit", "transfer_id": "t1"}
+            },
+            {
+                "id": 2, "amount": "-0.092878", "currency": "BTC",
+                "type": "match", "created_at": "2018-03-17T11:33:00Z",
+                "details": {"product_id": "BTC-EUR", "order_id": "o2"}
+            },
+            {
+                "id": 3, "amount": "120.5", "currency": "EUR",
+                "type": "match", "created_at": "2018-03-17T11:33:00Z",
+                "details": {"product_id": "BTC-EUR", "order_id": "o2"}
+            }
+        ])
+
+
+class TestCache(unittest.TestCase):
+    """ Test pyhodl.data.cache module """
+
+    def test_parse_exchange(self):
+        """ Transactions are parsed again only if file or parser change """
+
+        with tempfile.TemporaryDirectory() as folder, \
+                mock.patch("pyhodl.data.cache.CACHE_FOLDER",
+                           os.path.join(folder, "cache")):
+            input_file = os.path.join(folder, "dump.json")
+            with open(input_file, "w") as out:
+                json.dump([build_deposit("0xa", 1.0)], out)
+
+            parsed = build_file_exchange(input_file)
+            with mock.patch("pyhodl.data.parse.build.build_parser") as parse:
+                cached = build_file_exchange(input_file)
+            parse.assert_not_called()
+            self.assertEqual(cached.get_balances(), parsed.get_balances())
+            self.assertEqual(
+                cached.transactions[0].raw, parsed.transactions[0].raw
+            )
+            self.assertEqual(
+                cached.transactions[0].date, parsed.transactions[0].date
+            )
+            self.assertEqual(cached.index.find("0xa"), [0])  # saved index
+            with mock.patch.object(TransactionsTable, "__getitem__") as get:
+                wallets = cached.build_wallets()
+            get.assert_not_called()  # built only when indexed
+            self.assertEqual(
+                wallets["BTC"].transactions[0].raw, parsed.transactions[0].raw
+            )
+            self.assertIs(
+                wallets["BTC"].transactions[0], cached.transactions[0]
+            )  # built once, shared by all wallets of row
+            self.assertEqual(len(list(cached.transactions)), 1)
+            self.assertEqual(
+                len(cached.transactions._built), 0
+            )  # not kept once no more used
+
+            with mock.patch.object(BinanceParser, "VERSION", 0):
+                self.assertIsNone(
+                    cache.parse_exchange(input_file, {
+                        "BinanceParser": BinanceParser
+                    })
+                )
+
+            stat = os.stat(input_file)
+            os.utime(input_file, (stat.st_atime, stat.st_mtime + 10))
+            self.assertIsNotNone(cache.parse_exchange(input_file, PARSERS))
+            with mock.patch("pyhodl.data.cache.get_file_hash") as get_hash:
+                self.assertIsNotNone(
+                    cache.parse_exchange(input_file, PARSERS)
+                )
+            get_hash.assert_not_called()  # new modification time is saved
+
+            cache_file = cache.get_cache_file(input_file)
+            with open(cache_file, "rb") as stream:
+                content = stream.read()
+            with open(cache_file, "wb") as out:
+                out.write(content[:len(content) // 2])  # interrupted run
+            self.assertIsNone(cache.parse_exchange(input_file, PARSERS))
+
+            with open(input_file, "w") as out:
+                json.dump([build_deposit("0xb", 2.0)], out)
+            self.assertEqual(
+                build_file_exchange(input_file).get_balances(), {"BTC": 2.0}
+            )
+            self.assertEqual(os.listdir(os.path.dirname(cache_file)),
+                             [os.path.basename(cache_file)])  # no temp file
+
+    def test_add_transactions(self):
+        """ Transactions added to an exchange parsed from file are appended
+        to its table """
+
+        with tempfile.TemporaryDirectory() as folder, \
+                mock.patch("pyhodl.data.cache.CACHE_FOLDER",
+                           os.path.join(folder, "cache")):
+            input_file = os.path.join(folder, "dump.json")
+            with open(input_file, "w") as out:
+                json.dump([build_deposit("0xa", 1.0)], out)
+            exchange = build_file_exchange(input_file)
+            added = BinanceParser(input_file).parse_transaction(
+                build_deposit("0xb", 2.0)
+            )
+
+            with mock.patch.object(TransactionsTable, "__getitem__") as get:
+                exchange.add_transactions([added])
+            get.assert_not_called()  # not turned into a list
+            self.assertIsInstance(exchange.transactions, TransactionsTable)
+            self.assertEqual(exchange.get_transactions_count(), 2)
+            self.assertEqual(exchange.get_balances(), {"BTC": 3.0})
+            self.assertEqual(exchange.transactions[1].raw, added.raw)
+            self.assertEqual(
+                exchange.get_last_transaction().raw["txId"], "0xb"
+            )
+            self.assertEqual(len(exchange.search("0xb")), 1)
+            self.assertFalse(cache.save_exchange(
+                exchange, input_file, BinanceParser(input_file)
+            ))  # raw data of added one is not in file
+
+
+class TestCheckpoints(unittest.TestCase):
+    """ Test pyhodl.data.checkpoints module """
+
+    def test_parse_checkpoint(self):
+        """ Corrupted checkpoints are discarded """
+
+        checkpoint = {
+            "exchange": "binance",
+            "date": 1514764800000000000,
+            "count": 3,
+            "last": {"id": 7},
+            "fixed_point": False,
+            "balances": {"BTC": 0.1 + 0.2}
+        }
+        with tempfile.TemporaryDirectory() as folder:
+            output_file = os.path.join(folder, "checkpoint.json")
+            self.assertIsNone(parse_checkpoint(output_file))
+
+            save_checkpoint(checkpoint, output_file)
+            parsed = parse_checkpoint(output_file)
+            self.assertEqual(parsed["balances"], checkpoint["balances"])
+
+            parsed["count"] = 4
+            with open(output_file, "w") as out:
+                json.dump(parsed, out)
+            self.assertIsNone(parse_checkpoint(output_file))
+
+    def print_balances(self, folder, app_folder, price, runs=2):
+        """
+        :param folder: str
+            Folder with exchange files
+        :param app_folder: str
+            Folder to save cache, checkpoints and balances to
+        :param price: float
+            Price of each coin (NaN if missing)
+        :param runs: int
+            Number of times balance is printed
+        :return: [] of tuple ([] of {}, int)
+            Checkpoint wallets of each exchange are built from in each run
+            (None if built from all transactions) and number of times they
+            are built again from all transactions just to get returns
+        """
+
+        def convert_many(wallet, dates, currency, amounts=1.0):
+            return np.full(len(dates), price) * amounts
+
+        checkpoints = []
+        with mock.patch("pyhodl.data.cache.CACHE_FOLDER",
+                        os.path.join(app_folder, "cache")), \
+                mock.patch("pyhodl.data.checkpoints.CHECKPOINTS_FOLDER",
+                           os.path.join(app_folder, "checkpoints")), \
+                mock.patch("pyhodl.tools.balance.get_balance_file",
+                           return_value=os.path.join(
+                               app_folder, "Balance.json")), \
+                mock.patch("pyhodl.core.portfolio.get_price_on_date",
+                           return_value={"BTC": price}), \
+                mock.patch.object(Wallet, "convert_many", convert_many), \
+                mock.patch("sys.stdout", new_callable=io.StringIO):
+            for _ in range(runs):
+                with mock.patch.object(
+                        CryptoExchange, "build_wallets", autospec=True,
+                        side_effect=CryptoExchange.build_wallets) as build:
+                    Balance(folder).print()
+                calls = [call[0] for call in build.call_args_list]
+                checkpoints.append((
+                    [args[2] for args in calls if len(args) > 2],
+                    len([args for args in calls if len(args) <= 2])
+                ))
+        return checkpoints
+
+    def test_same_exchange_files(self):
+        """ Dumps of the same exchange are replayed from their own checkpoint
+        """
+
+        with tempfile.TemporaryDirectory() as folder, \
+                tempfile.TemporaryDirectory() as app_folder:
+            for i in range(2):
+                dump = [build_deposit("0x" + str(i), i + 1.0)]
+                with open(os.path.join(folder, str(i) + ".json"), "w") as out:
+                    json.dump(dump, out)
+
+            for run, (checkpoints, rebuilt) in enumerate(
+                    self.print_balances(folder, app_folder, 10000.0)):
+                self.assertEqual(len(checkpoints), 2)
+                self.assertEqual(
+                    [checkpoint is not None for checkpoint in checkpoints],
+                    [run > 0] * 2
+                )  # loaded from second run on
+                self.assertEqual(rebuilt, 0)  # returns extended
+
+            checkpoints_folder = os.path.join(app_folder, "checkpoints")
+            self.assertEqual(len([
+                name for name in os.listdir(checkpoints_folder)
+                if name.endswith(".json")
+            ]), 3)  # one for each file, and the total one
+            self.assertEqual(len(os.listdir(
+                os.path.join(checkpoints_folder, "returns")
+            )), 2)
+            self.assertFalse(any(
+                name.endswith("Checkpoint.json") for name in os.listdir(folder)
+            ))  # not in folder with exchange files
+
+    def test_missing_prices(self):
+        """ Balances are replayed from checkpoint even if returns could not
+        be computed (prices are missing) """
+
+        with tempfile.TemporaryDirectory() as folder, \
+                tempfile.TemporaryDirectory() as app_folder:
+            with open(os.path.join(folder, "0.json"), "w") as out:
+                json.dump([
+                    build_deposit("0xa", 1.0), build_deposit("0xb", 2.0)
+                ], out)
+
+            (cold, _), (warm, rebuilt) = \
+                self.print_balances(folder, app_folder, float("nan"))
+            self.assertEqual(cold, [None])
+            self.assertEqual(len(warm), 1)
+            self.assertIsNotNone(warm[0])  # not replayed from scratch
+            self.assertEqual(warm[0]["balances"], {"BTC": 3.0})
+            self.assertNotIn("returns", warm[0])  # kept apart
+            self.assertEqual(rebuilt, 2)  # just returns, of exchange and total
+            self.assertFalse(os.path.exists(
+                os.path.join(app_folder, "checkpoints", "returns")
+            ))  # not saved as missing
+
+
+class TestSymbols(unittest.TestCase):
+    """ Test pyhodl.data.symbols module """
+
+    def test_parse_symbols(self):
+        """ Markets are split by saved table, once per symbol in file """
+
+        table = get_symbols_table({"symbols": [
+            {"symbol": "WBTCBTC", "baseAsset": "WBTC", "quoteAsset": "BTC"},
+            {"symbol": "ETHFDUSD", "baseAsset": "ETH", "quoteAsset": "FDUSD"}
+        ]})
+        symbols = SymbolsTable(table)
+        self.assertEqual(symbols.get_coins("WBTCBTC"), ("WBTC", "BTC"))
+        self.assertEqual(symbols.get_coins("BNBBUSD"), ("BNB", "BUSD"))
+        self.assertEqual(symbols.get_coins("SOLFDUSD"), ("SOL", "FDUSD"))
+        self.assertEqual(symbols.get_coins("ETHUSDT"), ("ETH", "USDT"))
+        self.assertEqual(symbols.get_coins("XRPEUR"), ("XRP", "EUR"))
+
+        trades = [{
+            "symbol": symbol, "id": i, "orderId": i, "price": "2.0",
+            "qty": "1.0", "commission": "0.001", "commissionAsset": "BNB",
+            "time": 1514764800000 + i, "isBuyer": True
+        } for i, symbol in enumerate(["WBTCBTC", "ETHFDUSD"] * 50)]
+        with tempfile.TemporaryDirectory() as folder:
+            save_symbols(table, get_symbols_file(folder, "binance"))
+            input_file = os.path.join(folder, "BinanceUpdater.json")
+            with open(input_file, "w") as out:
+                json.dump(trades, out)
+
+            with mock.patch.object(
+                    SymbolsTable, "get_coins", autospec=True,
+                    side_effect=SymbolsTable.get_coins) as get_coins:
+                parser = BinanceParser(input_file)
+                transactions = list(parser.get_transactions_list())
+            self.assertEqual(get_coins.call_count, 2)
+            self.assertEqual(
+                {str(transaction.coin_buy.coin) for transaction in
+                 transactions}, {"WBTC", "ETH"}
+            )
+            self.assertEqual(
+                {str(transaction.coin_sell.coin) for transaction in
+                 transactions}, {"BTC", "FDUSD"}
+            )
+
+    def test_cached_symbols(self):
+        """ Files are parsed again only when markets traded there are split
+        differently by symbols table """
+
+        trade = {
+            "symbol": "BTCBIDR", "id": 1, "orderId": 1, "price": "2.0",
+            "qty": "1.0", "commission": "0.001", "commissionAsset": "BNB",
+            "time": 1514764800000, "isBuyer": True
+        }
+        with tempfile.TemporaryDirectory() as folder, \
+                mock.patch("pyhodl.data.cache.CACHE_FOLDER",
+                           os.path.join(folder, "cache")):
+            input_file = os.path.join(folder, "BinanceUpdater.json")
+            with open(input_file, "w") as out:
+                json.dump([trade], out)
+            key = BinanceParser.get_key(input_file)
+            self.assertEqual(
+                str(build_file_exchange(input_file).transactions[0]
+                    .coin_buy.coin), "BTCB"  # guessed
+            )
+
+            symbols_file = get_symbols_file(folder, "binance")
+            save_symbols({"ETHBTC": ["ETH", "BTC"]}, symbols_file)
+            with mock.patch("pyhodl.data.parse.build.build_parser") as parse:
+                build_file_exchange(input_file)
+            parse.assert_not_called()  # not traded here
+
+            save_symbols({"BTCBIDR": ["BTC", "BIDR"]}, symbols_file)
+            self.assertEqual(BinanceParser.get_key(input_file), key)
+            self.assertEqual(
+                str(build_file_exchange(input_file).transactions[0]
+                    .coin_buy.coin), "BTC"
+            )
+
+
+class TestTables(unittest.TestCase):
+    """ Test pyhodl.data.tables module """
+
+    def test_values_on_dates(self):
+        """ Prices of many dates are looked up at once """
+
+        start = datetime(2018, 1, 1, tzinfo=pytz.utc)
+        table = CoinPricesTable("EUR")
+        table.content = {
+            start: {"BTC": 10000.0, "ETH": 600.0},
+            start + timedelta(days=1): {"ETH": 700.0}
+        }
+        table.dates = sorted(table.content.keys())
+        table.dates_array = dates_to_ns_array(table.dates)
+
+        dates = [start + timedelta(hours=hours) for hours in [-1, 0, 23, 30]]
+        btc = table.get_values_on_dates_of("btc", dates)
+        eth = table.get_values_on_dates_of("ETH", dates)
+        self.assertTrue(np.isnan(btc[[0, 3]]).all())
+        self.assertEqual(list(btc[1:3]), [10000.0, 10000.0])
+        self.assertEqual(list(eth[1:]), [600.0, 600.0, 700.0])
+        for date, price in zip(dates[1:], eth[1:]):
+            self.assertEqual(table.get_value_on("ETH", date), price)
+        self.assertEqual(list(table.get_values_on_dates_of("eur", dates)),
+                         [1.0] * 4)
+
 
 def main():
     unittest.main()